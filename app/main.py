@@ -1,6 +1,8 @@
 from flask import Flask
 from app.routes.routes import main_bp
 from app.routes.auth import auth_bp
+from app.services import ensure_schema
+from app.services import neo4j_driver
 
 from cryptography.hazmat.primitives import serialization, hashes
 from cryptography.hazmat.primitives.asymmetric import padding
@@ -44,6 +46,12 @@ def create_app():
     app.secret_key = "change_me_secret"  # à mettre en variable d'env
     app.register_blueprint(main_bp)
     app.register_blueprint(auth_bp)
+    neo4j_driver.init_app(app)
+    try:
+        ensure_schema(neo4j_driver.get_driver())
+    except Exception as e:
+        # la base peut ne pas etre encore disponible (docker) : init_neo4j.py rejoue le schema
+        print("Schéma Neo4j non vérifié au démarrage :", e)
     return app
 
 app = create_app()
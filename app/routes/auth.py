@@ -1,23 +1,34 @@
 from flask import Blueprint, render_template, request, redirect, url_for, session
 from werkzeug.security import generate_password_hash, check_password_hash
-from neo4j import GraphDatabase
-import os
+from werkzeug.local import LocalProxy
 from functools import wraps
+from app.services.neo4j_driver import get_driver
+from app.services.sequences import incrementer_sequence
+from app.services.neo4j_services import get_role, get_role_version, REQUETE_UTILISATEUR
 
 
-# Connection Neo4j (reprend tes variables d'env)
-NEO4J_URI = "bolt://localhost:7687"
-NEO4J_USER = "neo4j"
-NEO4J_PASSWORD = os.getenv("NEO4J_PASS")
+# Connection Neo4j : même pool que les routes principales
 NEO4J_DB = "neo4j"
 
-driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+driver = LocalProxy(get_driver)
 
 # Blueprint Auth
 auth_bp = Blueprint("auth", __name__, url_prefix="/auth")
 
 
 
+def _role_session():
+    """
+    Rôle de l'utilisateur connecté. Il est porté par le cookie de session
+    (signé) avec la version des rôles ; on ne relit la base que si un
+    update_roles a eu lieu depuis.
+    """
+    version = get_role_version(driver, NEO4J_DB)
+    if session.get("role_version") != version or "role" not in session:
+        session["role"] = get_role(driver, session["user_id"], NEO4J_DB)
+        session["role_version"] = version
+    return session["role"]
+
 def role_required(*required_role):
     def decorator(f):
         @wraps(f)
@@ -25,15 +36,8 @@ def role_required(*required_role):
             if "user_id" not in session:
                 return redirect(url_for("auth.login"))
 
-            with driver.session(database=NEO4J_DB) as neo_session:
-                result = neo_session.run("""
-                    MATCH (u:Auth)
-                    WHERE u.pk = $id
-                    RETURN u.role AS role
-                """, id=session["user_id"]).single()
-
-                if not result or result["role"] not in required_role:
-                    return redirect(url_for("auth.unauthorized"))
+            if _role_session() not in required_role:
+                return redirect(url_for("auth.unauthorized"))
 
             return f(*args, **kwargs)
         return decorated_function
@@ -67,32 +71,31 @@ def create_user_in_neo4j(username, password, confirm_password):
         if existing:
             return False,"Nom d'utilisater déjà pris"  # déjà pris
 
-        # Création avec PK incrémentée
-        result = session.run("""
-            MATCH (n:Auth) 
-            WITH coalesce(max(n.pk) + 1, 1) AS maximum
-            CREATE (u:Auth {
-                user: $username,
-                password: $password_hash,
-                pk: maximum,
-                created_at: datetime(),
-                role: 'nobody'
-                             
-            })
-            RETURN u
-        """, username=username, password_hash=password_hash)
+        # Création avec PK tirée de la séquence, dans la même transaction
+        result = session.execute_write(_creer_auth_tx, username, password_hash)
 
-        return result.single() is not None, "Ok"
+        return result is not None, "Ok"
+
+
+def _creer_auth_tx(tx, username, password_hash):
+    pk = incrementer_sequence(tx, 'auth_pk')
+    return tx.run("""
+        CREATE (u:Auth {
+            user: $username,
+            password: $password_hash,
+            pk: $pk,
+            created_at: datetime(),
+            role: 'nobody'
+        })
+        RETURN u
+    """, username=username, password_hash=password_hash, pk=pk).single()
 
 
 
 def verify_user_in_neo4j(username, password):
     """Vérifie si un utilisateur existe et si le mot de passe est correct."""
     with driver.session(database=NEO4J_DB) as session:
-        result = session.run("""
-            MATCH (u:Auth {user: $username})
-            RETURN u.password AS password_hash, u.pk AS id
-        """, username=username)
+        result = session.run(REQUETE_UTILISATEUR, username=username)
         record = result.single()
         if record and check_password_hash(record["password_hash"], password):
             return {"id": record["id"], "username": username}
@@ -110,6 +113,7 @@ def login():
         if user:
             session["user_id"] = user["id"]
             session["username"] = user["username"]
+            session.pop("role", None)
             return redirect(url_for("main.journee"))
         else:
             return render_template("login.html", error="Nom d'utilisateur ou mot de passe invalide")
@@ -1,9 +1,5 @@
 
-from neo4j import GraphDatabase
 import os
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from io import BytesIO
 import plotly.io as pio
 import pandas as pd
 import pdfkit
@@ -24,52 +20,65 @@ from flask import (
     url_for)
 from app.services import (
     extract_form_data,
-    insert_rendez_vous,
-    create_rappels,
-    get_residents,
+    insert_rendez_vous_bulk,
     get_residents_chambre,
     get_medecins,
     get_service,
-    get_resident_properties,
-    get_rendez_vous,
+    get_profil_resident,
+    get_page_rdv,
     get_rdv_types,
     get_all_rdv_events,
+    evenement_calendrier,
     add_resident_to_db,
-    get_rendez_vous_jour,
+    delete_resident,
+    marquer_depart,
+    stats_cache,
+    stats_cache_pdf,
+    contenu_fiche,
+    empreinte_fiche,
+    rendre_fiche_pdf,
+    get_donnees_journee,
     ajout_note,
-    enregistrer_valeur_selles,
-    maj_last_check_selles,
-    selles_non_enregistrees,
-    get_selles_du_jour,
-    get_plusieurs_jours_selles,
-    get_infos_rdv,
+    synchroniser_selles,
+    get_tableau_selles,
+    get_matrice_selles,
+    OPTIONS_SELLES,
+    get_detail_rdv,
     get_all_users,
     update_roles,
     supprimer_rdv,
     supprimer_rdv_chaine,
+    modifier_chaine,
+    surcharger_rdv,
+    get_attributs_resident_rdv,
     get_next_id,
-    create_rappel_infini,
+    creer_recurrences,
+    est_id_occurrence,
+    maj_status_rappel,
     imprimerMultiJours,
-    get_personnel,
     ajouter_note_persistante,
-    get_recent_rdv,
     get_graph,
     infosResidentRDV,
     update_resident,
     get_unique_filename
 
 )
+from app.services.neo4j_driver import get_driver, pool_stats
+from app.services.neo4j_services import REQUETE_MAJ_STATUT
 from app.routes.auth import login_required, role_required
+from werkzeug.local import LocalProxy
 
-NEO4J_URI = "bolt://localhost:7687"
-NEO4J_USER = "neo4j"
-NEO4J_PASSWORD = os.getenv("NEO4J_PASS")
 NEO4J_DB = "neo4j"
-driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+# driver partage (pool unique par processus, voir app/services/neo4j_driver.py)
+driver = LocalProxy(get_driver)
 
 
 main_bp = Blueprint('main', __name__)
 
+FENETRE_TABLEAU = timedelta(days=31)
+FENETRE_MAX_CALENDRIER = timedelta(days=93)
+FENETRE_MAX_SELLES = timedelta(days=31)
+
 
 @main_bp.route("/resident/edit", methods=["POST"])
 def edit_resident():
@@ -116,15 +125,12 @@ def update_status():
     row_id = data["id"]
     new_status = data["status"]
     print(f"ID de la ligne : {row_id}, Nouveau statut : {new_status}")
-    cypher = """
-    MATCH ()-[r]->()
-    WHERE ID(r) = $rid
-    SET r.status = $status
-    RETURN ID(r) AS id, r.status AS new_status
-    """
-
+    if est_id_occurrence(row_id):
+        # rappel d'une recurrence : le statut est stocke sur la regle
+        maj_status_rappel(driver, row_id, new_status, NEO4J_DB)
+        return jsonify({"id": row_id, "new_status": new_status})
     with driver.session() as session:
-        result = session.run(cypher, rid=int(row_id), status=new_status)
+        result = session.run(REQUETE_MAJ_STATUT, rid=str(row_id), status=new_status)
         record = result.single()
     print(record)
     return jsonify({"id": record["id"], "new_status": record["new_status"]})
@@ -134,13 +140,45 @@ def graphique_selles():
     pk = request.args.get('pk') or request.args.get('resident_id')
     print("l utilisateur est : ", pk)
     fig=get_graph(pk, driver)
-    fig_dict = fig.to_dict()  # Convertir en dict JSON
-    print("on envoie le graphique")
-    return jsonify(fig_dict)
+    # to_plotly_json : seulement data et layout, sans la validation de to_dict
+    return jsonify(fig.to_plotly_json())
     #graph_html = fig.to_html(full_html=False, include_plotlyjs='cdn')
     #print('graph_html : ', graph_html)
     #return graph_html
 
+@main_bp.route('/selles/sync', methods=['POST'])
+@login_required
+def sync_selles():
+    """
+    Reçoit la file de saisies de selles du navigateur (voir selles.js) et
+    l'applique en une transaction. Corps : {"entrees": [{cle, pk, date,
+    nuit, matin, apres_midi, commentaire}, ...]}.
+    """
+    data = request.get_json(silent=True) or {}
+    entrees = data.get('entrees')
+    if not isinstance(entrees, list) or not all(isinstance(e, dict) for e in entrees):
+        return jsonify({'error': "Liste 'entrees' attendue"}), 400
+    resultats = synchroniser_selles(driver, entrees, NEO4J_DB)
+    return jsonify({'resultats': resultats})
+
+@main_bp.route('/selles/matrice', methods=['GET'])
+@login_required
+@role_required("infirmiere","admin")
+def matrice_selles():
+    """
+    Selles de tous les résidents (d'un étage) sur une fenêtre de jours, pour la relève.
+    Paramètres : debut, fin (AAAA-MM-JJ, par défaut les 7 derniers jours), etage.
+    """
+    try:
+        fin = date.fromisoformat(request.args['fin']) if request.args.get('fin') else date.today()
+        debut = date.fromisoformat(request.args['debut']) if request.args.get('debut') else fin - timedelta(days=6)
+    except ValueError:
+        return jsonify({'error': "Dates debut et fin au format AAAA-MM-JJ"}), 400
+    if fin < debut or fin - debut >= FENETRE_MAX_SELLES:
+        return jsonify({'error': "Fenêtre de dates invalide"}), 400
+    return jsonify(get_matrice_selles(driver, debut, fin,
+                                      request.args.get('etage') or None, NEO4J_DB))
+
 # Nouvelle route pour la popup ALT
 @main_bp.route('/popup_row_alt', methods=['POST'])
 def popup_row_alt():
@@ -148,6 +186,15 @@ def popup_row_alt():
     Génère le contenu HTML pour la nouvelle popup personnalisée (colonne alt).
     """
     data = request.get_json(force=True)
+    pk = data.pop('pk', None)
+    id_rdv = data.pop('Id', None)
+    if pk:
+        # attributs actuels du resident, surcharges du rdv comprises
+        attributs = get_attributs_resident_rdv(driver, pk, id_rdv, NEO4J_DB)
+        if attributs:
+            data['oxygen'] = 'Oui' if str(attributs['oxygen']) == '1' else 'Non'
+            data['diabete'] = 'Oui' if str(attributs['diabete']) == '1' else 'Non'
+            data['deplacement'] = attributs['deplacement']
     html = '<h3 class="noselect" style="margin-top:0; color:#5A8DEE; font-weight:bold;">Informations complémentaires</h3>'
     html += '<table class="noselect" style="width:100%; border-collapse:collapse;">'
 
@@ -167,7 +214,8 @@ def popup_row_alt():
         "Medecin": "Médecin",
         "Lieu": "Lieu",
         "diabete": "Diabète",
-        "oxygen": "O₂"
+        "oxygen": "O₂",
+        "deplacement": "Déplacement"
     }
 
     for key, value in data.items():
@@ -203,15 +251,17 @@ def form():
             upload_path = os.path.join(upload_folder, filename)
             uploaded.save(upload_path)
             form_data['uploaded'] = upload_path
-        print('piece jointe : ')
-        print(upload_path, filename)
         next_id = get_next_id(driver)
-        for individu_pk in form_data['pk']:
-            insert_rendez_vous(driver,form_data,individu_pk, next_id, NEO4J_DB)
-            create_rappels(driver,form_data,individu_pk, next_id)
-        if not form_data.get('fin') : ## si boolean fin est False, on cree un rappel apres 365 jours
-            create_rappel_infini(driver,form_data,individu_pk,next_id, NEO4J_DB) # quand il n'y a paz de date de fin, on cree sur 365 jours et ensuite on met un rappel pour qu'ils recréent apres un an
-        return "Rendez-vous créés:"
+        try:
+            if not form_data.get('fin') : ## sans date de fin, on stocke la regle de recurrence (occurrences calculees a la lecture)
+                nb_rdv = creer_recurrences(driver, form_data, form_data['pk'], next_id, NEO4J_DB)
+            else:
+                # toutes les occurrences (et leurs rappels) de tous les residents en une seule transaction
+                nb_rdv = insert_rendez_vous_bulk(driver, form_data, form_data['pk'], next_id, NEO4J_DB)
+        except ValueError as e:
+            # transaction annulee : aucun rendez-vous n'a ete cree
+            return f"Aucun rendez-vous créé : {e}", 400
+        return f"Rendez-vous créés: {nb_rdv}"
     else:
         pks,residents = get_residents_chambre(driver)
         medecins = get_medecins(driver)
@@ -231,10 +281,6 @@ def impression():
 @login_required
 @role_required("infirmiere","admin")
 def journee():
-    manquants=[x['nom'] for x in selles_non_enregistrees(driver)]
-    plusieurs_jours= get_plusieurs_jours_selles(driver)
-    liste_service= get_personnel(driver)
-    print('plusieurs_jours : \n#####\n',plusieurs_jours)
     if request.method == 'POST':
         service=request.form.get('service_for_form')
         print('## Service : ',service)
@@ -246,23 +292,10 @@ def journee():
             ajout_note(driver,note, date_note, heure_note,service)
         else:
             ajouter_note_persistante(driver,note,service)
-    
-    rendez_vous,notes=get_rendez_vous_jour(driver, NEO4J_DB)
-    print('notes : \n#####\n',notes)
-    nouveau_rdv,nom_resident,date_heure=get_recent_rdv(driver)
-    #nouveau_rdv=['Medecin','Dentiste','Coiffeur','Kinésithérapeute','Pédicure']
-    #nom_resident=['Jean-Louis','Marie-Claire','Sophie','Paul','Lucie']
-    return render_template(
-        'recap_jour.html',
-        rdv=rendez_vous,
-        notes=notes,
-        manquants=manquants,
-        plusieurs_jours=plusieurs_jours,
-        liste_service=liste_service,
-        nouveau_rdv=nouveau_rdv,
-        nom_resident=nom_resident,
-        date_heure=date_heure
-    )
+
+    # requetes des widgets lancees en parallele (voir app/services/tableau_bord.py)
+    donnees = get_donnees_journee(get_driver(), NEO4J_DB)
+    return render_template('recap_jour.html', **donnees)
 
 
 @main_bp.route("/download", methods=["POST"])
@@ -282,111 +315,30 @@ def download_file():
 @main_bp.route('/enregistre_selles', methods=['GET','POST'])
 def enregistre_selles():
     if request.method == 'POST':
-        data = request.get_json()
+        data = request.get_json(silent=True)
         #print("### Données reçues :", data)
-
-        enregistrer_valeur_selles(driver,data)
-        maj_last_check_selles(driver,data)
+        if not isinstance(data, dict) or not all(isinstance(v, dict) for v in data.values()):
+            return jsonify({'status': 'error', 'message': "Saisies {nom complet: valeurs} attendues"}), 400
+
+        # selles et verification dans la meme transaction
+        aujourdhui = date.today().isoformat()
+        resultats = synchroniser_selles(driver, [{**valeurs, 'date': valeurs.get('date') or aujourdhui}
+                                                 for valeurs in data.values()], NEO4J_DB)
+        erreurs = [{'resident': nom_complet, 'message': resultat['message']}
+                   for nom_complet, resultat in zip(data, resultats)
+                   if resultat['statut'] == 'erreur']
+        if erreurs:
+            return jsonify({'status': 'error',
+                            'message': f"{len(erreurs)} saisie(s) refusée(s), les autres sont enregistrées",
+                            'erreurs': erreurs}), 400
 
         return jsonify({'status': 'success', 'message': 'Données enregistrées avec succès'})
 
     # Sinon, méthode GET → on renvoie le tableau HTML
-    df_selles_du_jour = pd.DataFrame(get_selles_du_jour(driver))
-    aujourdhui = pd.Timestamp.today().normalize()  # sans l'heure
-    cols_dates = ['nuit', 'matin', 'apres_midi']  # tes colonnes de dates
-    try:
-        df_selles_du_jour[cols_dates] = df_selles_du_jour[cols_dates].where(df_selles_du_jour[cols_dates] == aujourdhui, None)
-    except :
-        df_selles_du_jour=pd.DataFrame(columns=['nom', 'prenom', 'pk', 'moment', 'caracteristique', 'commentaire','nuit','matin','apres_midi'])
-    if df_selles_du_jour.empty:
-        print('il est broke ton df')
-        df_selles_du_jour=pd.DataFrame(columns=['nom', 'prenom', 'pk', 'moment', 'caracteristique', 'commentaire','nuit','matin','apres_midi'])
-    else :
-        print('df ok')
-        for col in ['nuit', 'matin', 'apres_midi']:
-            df_none = df_selles_du_jour[df_selles_du_jour[col].isna()].copy()
-
-            # On modifie leur 'caracteristique'
-            df_none["caracteristique"] = "--"
-            df_none["moment"] = col
-
-            # On concatène les lignes originales avec les nouvelles
-            df_selles_du_jour = pd.concat([df_selles_du_jour, df_none], ignore_index=True)
-            print("nouveau df")
-            print(df_selles_du_jour)
-    noms,prenoms,pks = get_residents(driver)
-
-    def options_html(selected_value):
-        options = ['--', 'Normale', 'Liquide', 'Mou', 'Dur', 'Absence']
-        return '\n'.join([
-            f'<option value="{opt}"{" selected" if opt == selected_value else ""}>{opt}</option>'
-            for opt in options
-        ])
-
-    def get_val(nom_famille, prenom, pk, moment):
-        print(df_selles_du_jour)
-        val = df_selles_du_jour.loc[
-            (df_selles_du_jour['pk'] == pk) &
-            (df_selles_du_jour['moment'] == moment),
-            'caracteristique'
-        ].values
-        if len(val) > 0:
-            return val[0]
-        #elif f"{pk}" not in [x['pk'] for x in selles_non_enregistrees(driver)]:
-        #    return 'Absence'
-        else:
-            return "--"
-
-    table_html = '''
-    <div id="sellesPopupContentInner" style="background:#fff; border-radius:18px; box-shadow:0 8px 32px rgba(35,41,70,0.18); padding:32px; max-width:90vw; max-height:80vh; overflow:auto; position:relative;">
-        <button onclick="closeSellesPopup()" style="position:absolute; top:18px; right:18px;">Fermer</button>
-        <h2>Selles</h2>
-        <table style="width:100%; border-collapse:collapse;">
-            <thead>
-                <tr>
-                    <th>Nom</th><th>Nuit</th><th>Matin</th><th>Après-Midi</th><th>Note</th><th style="display:none;">pk</th>
-                </tr>
-            </thead>
-            <tbody>
-    '''
-
-    for nom,prenom,pk in zip(noms,prenoms,pks):
-        valeur_nuit = get_val(nom, prenom, pk, 'nuit')
-        valeur_matin = get_val(nom, prenom, pk, 'matin')
-        valeur_apres_midi = get_val(nom, prenom, pk, 'apres_midi')
-
-        commentaire = df_selles_du_jour.loc[
-            (df_selles_du_jour['nom'] == nom) &
-            (df_selles_du_jour['prenom'] == prenom),
-            'commentaire'
-        ].values
-        commentaire = commentaire[0] if len(commentaire) > 0 else ""
-        commentaire =commentaire if commentaire !=None else ""
-        nom_complet = f"{nom.replace(' ', '-')} {prenom.replace(' ', '-')}"
-        safe_nom = pk.replace(' ', '_')
-
-        table_html += f'''
-        <tr>
-            <td>{nom_complet}</td>
-            <td><select id="{safe_nom}-nuit-select">{options_html(valeur_nuit)}</select></td>
-            <td><select id="{safe_nom}-matin-select">{options_html(valeur_matin)}</select></td>
-            <td><select id="{safe_nom}-apres_midi-select">{options_html(valeur_apres_midi)}</select></td>
-            <td><input type="text" value="{commentaire}" placeholder="Note..."></td>
-            <td style="display:none;">{pk}</td>
-        </tr>
-        '''
-
-    table_html += '''
-            </tbody>
-        </table>
-        <div style="text-align:right; margin-top:18px;">
-            <button id="validerSellesBtn" onclick="enregistre_selles()">Valider</button>
-        </div>
-    </div>
-    '''
-
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-        return table_html
+        return render_template('selles_popup.html',
+                               lignes=get_tableau_selles(driver),
+                               options=OPTIONS_SELLES)
     # Otherwise, return nothing (or a simple message)
     return ''
 
@@ -395,57 +347,110 @@ def enregistre_selles():
 @role_required("infirmiere","admin")
 def client_file():
     pks,residents = get_residents_chambre(driver)
+    # la fiche d'un resident parti reste consultable (historique conserve)
+    pks_fiches, residents_fiches = get_residents_chambre(driver, partis=True)
     name = ''
-    results = pd.DataFrame()
+    resident = {}
     node_result = []
+    curseur_passe = curseur_a_venir = None
 
     if request.method == 'POST':
         pk = request.form.get('nomPatientEDT', '').strip()
         if pk:
-            
-            results = get_resident_properties(driver, NEO4J_DB,
-                                                  pk)
-            node_result = get_rendez_vous(driver, NEO4J_DB, pk)
-        else:
-            results = pd.DataFrame()
-            node_result = []
+            profil = get_profil_resident(driver, pk, NEO4J_DB=NEO4J_DB)
+            if profil is not None:
+                resident = profil['resident']
+                # ordre chronologique, comme avant la pagination
+                node_result = profil['passes'][::-1] + profil['a_venir']
+                curseur_passe = profil['curseur_passe']
+                curseur_a_venir = profil['curseur_a_venir']
 
-    print("dict : ",node_result)
     return render_template(
         'client_file.html',
         name=name,
-        results=results,
+        resident=resident,
         residents=residents,
         nodes=node_result,
-        pks=pks
+        pks=pks,
+        residents_fiches=residents_fiches,
+        pks_fiches=pks_fiches,
+        curseur_passe=curseur_passe,
+        curseur_a_venir=curseur_a_venir
 
     )
 
 
+@main_bp.route('/client_file/rdv', methods=['GET'])
+@login_required
+@role_required("infirmiere","admin")
+def page_rdv_resident():
+    """Page suivante du planning d'un résident, chargée au défilement."""
+    pk = request.args.get('pk', '').strip()
+    sens = request.args.get('sens', '')
+    curseur = request.args.get('curseur', '')
+    if not pk or not curseur:
+        return jsonify({'error': 'pk et curseur requis'}), 400
+    try:
+        lignes, suivant = get_page_rdv(driver, pk, sens, curseur, NEO4J_DB=NEO4J_DB)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({
+        'html': render_template('planning_lignes.html', nodes=lignes),
+        'nodes': lignes,
+        'curseur': suivant
+    })
+
+
 @main_bp.route('/emploi_collectif', methods=['GET'])
 @login_required
 @role_required("infirmiere","admin")
 def emploi_collectif():
     rdv_types = get_rdv_types(driver, NEO4J_DB)
-    events = get_all_rdv_events(driver, NEO4J_DB)
-    events2= [ {"title": x["Nom"], "start" : x["Date"], "description":f"{x['Rendez-vous']} ({x['Type_Evt']}) : {x['Note']}", "Etage":x['Etage']} for x in events]
-
+    # le tableau ne montre que les prochaines semaines, le calendrier charge ses dates via /emploi_collectif/evenements
+    debut = date.today()
+    events = get_all_rdv_events(driver, NEO4J_DB, debut, debut + FENETRE_TABLEAU)
 
     return render_template('emploi_collectif.html', nodes=events,
-                           RDVTypes=rdv_types,events=events2)
+                           RDVTypes=rdv_types)
+
+
+@main_bp.route('/emploi_collectif/evenements', methods=['GET'])
+@login_required
+@role_required("infirmiere","admin")
+def emploi_collectif_evenements():
+    """
+    Evénements du calendrier pour la fenêtre [start, end], au format FullCalendar.
+    Filtres optionnels (séparés par des virgules) : etage, type, service.
+    """
+    try:
+        debut = date.fromisoformat(request.args['start'][:10])
+        fin = date.fromisoformat(request.args['end'][:10])
+    except (KeyError, ValueError):
+        return jsonify({'error': "Paramètres start et end (AAAA-MM-JJ) obligatoires"}), 400
+    if fin < debut or fin - debut > FENETRE_MAX_CALENDRIER:
+        return jsonify({'error': "Fenêtre de dates invalide"}), 400
+
+    def liste(nom):
+        valeur = request.args.get(nom, '')
+        return [v for v in valeur.split(',') if v] or None
+
+    events = get_all_rdv_events(driver, NEO4J_DB, debut, fin,
+                                etages=liste('etage'), types=liste('type'),
+                                services=liste('service'))
+    return jsonify([evenement_calendrier(x) for x in events])
 
 
 @main_bp.route('/delete_resident', methods=['POST'])
-def delete_resident():
+def remove_resident():
     print("Je passe par la suppression ......")
     pk = request.form.get('nomPatientEDT')
     print("PK à supprimer :", pk)
     try:
-        with driver.session(database=NEO4J_DB) as session:
-            session.run(
-                "MATCH (r:Resident {pk: $pk}) DETACH DELETE r",
-                pk=pk
-            )
+        if request.form.get('supprimer_historique') == '1':
+            delete_resident(driver, pk, NEO4J_DB)
+        else:
+            # depart : le resident est masque et ses rdv a venir annules, l'historique reste
+            marquer_depart(driver, pk, NEO4J_DB=NEO4J_DB)
         print("ca a a marché")
         return jsonify({'success': True, 'redirect': url_for('main.client_file')})
     except Exception as e:
@@ -481,63 +486,38 @@ def popup_content():
         '<h2 style="margin-top:0;">Rendez-vous</h2>'
         '<p>Ce contenu est chargé depuis Flask !</p>'
     )
-@main_bp.route('/popup_row_pdf', methods=['POST'])
+@main_bp.route('/popup_row_pdf', methods=['GET', 'POST'])
 def popup_row_pdf():
-    data = request.get_json(force=True)
-
-    # Récupérer les informations du rendez-vous
-    date_parts = data.get("Date_Fr", "")
-    heure_parts = data.get("Heure", "")
-    nom_reserv = data.get("nom_resident", "")
-    rdv = data.get("Rendez-vous", "")
-    transport = data.get("Transport", "")
-    medecin = data.get("Medecin", "")
-    lieu = data.get("Lieu", "")
-    note= data.get("Note", "")
-
-    # Création du PDF en mémoire
-    buffer = BytesIO()
-    pdf = canvas.Canvas(buffer, pagesize=A4)
-    width, height = A4
-    y = height - 100
-
-    pdf.setFont("Helvetica-Bold", 22)
-    pdf.drawString(50, y, nom_reserv)
-    y -= 60
-
-    pdf.setFont("Helvetica", 18)
-    pdf.drawString(50, y, f"Vous avez rendez-vous le : {date_parts} à {heure_parts}.")
-    y -= 50
-    pdf.drawString(50, y, f"Motif : {rdv} ")
-    y -= 50
-    if medecin:
-        pdf.drawString(50, y, f"Avec : {medecin}")
-        y -= 50
-
-    if transport != "---":
-        pdf.setFont("Helvetica", 18)
-        pdf.drawString(50, y, f"Transport : {transport}")
+    """
+    Fiche PDF d'un rendez-vous : en GET par son id (?id=, relu en base,
+    le navigateur peut la garder et la revalider par ETag), en POST depuis
+    les données JSON d'une ligne du planning.
+    """
+    if request.method == 'GET':
+        data = get_detail_rdv(driver, request.args.get('id', ''), NEO4J_DB)
+        if data is None:
+            abort(404)
+    else:
+        data = request.get_json(force=True)
+        if data.get("Id"):
+            detail = get_detail_rdv(driver, data["Id"], NEO4J_DB)
+            if detail is None:
+                abort(404)
+            data = {**data, **detail}
+
+    contenu = contenu_fiche(data)
+    empreinte = empreinte_fiche(contenu)
+    if request.if_none_match.contains(empreinte):
+        # fiche inchangee depuis la derniere impression : rien a rendre
+        response = make_response('', 304)
     else:
-        pdf.setFont("Helvetica", 18)
-        pdf.drawString(50, y, "Transport : Aucun transport n'est prévu.")
-    y -= 40
-
-    if lieu:
-        pdf.setFont("Helvetica", 18)
-        pdf.drawString(50, y, f"Lieu du rendez-vous : {lieu}")
-        y -= 40
-
-    if lieu:
-        pdf.setFont("Helvetica", 18)
-        pdf.drawString(50, y, f"Note : {note}")
-
-    #pdf.showPage()
-    pdf.save()
-
-    buffer.seek(0)
-    response = make_response(buffer.read())
-    response.headers['Content-Type'] = 'application/pdf'
-    response.headers['Content-Disposition'] = 'inline; filename=impression.pdf'
+        pdf, _ = rendre_fiche_pdf(contenu, empreinte)
+        response = make_response(pdf)
+        response.headers['Content-Type'] = 'application/pdf'
+        response.headers['Content-Disposition'] = 'inline; filename=impression.pdf'
+    response.set_etag(empreinte)
+    # le detail d'un rdv peut changer : le navigateur revalide a chaque fois
+    response.headers['Cache-Control'] = 'private, no-cache'
     return response
 
 @main_bp.route('/popup_row', methods=['POST'])
@@ -550,15 +530,21 @@ def popup_row():
     html = '<h1 style="margin-top:20px;">Détail du rendez-vous</h1>'
     html += '<table style="width:100%; border-collapse:collapse;">'
 
+    if not data.get("Id"):
+        return jsonify({'error': "Identifiant du rendez-vous ('Id') manquant"}), 400
+    # ligne du planning : lecture directe par id (en cache)
+    detail = get_detail_rdv(driver, data["Id"], NEO4J_DB)
+    if detail is None:
+        abort(404)
+    data = {**data, **detail}
+
     date_parts = data["Date_Fr"]
     heure_parts = data["Heure"]
     nom_reserv = data["nom_resident"]
     rdv = data["Rendez-vous"]
     transport = data["Transport"]
-    infos = get_infos_rdv(driver,date_parts,heure_parts, nom_reserv, rdv)
 
-    print('infos : ', infos)
-    medecin=infos[0].get('medecin', '') if infos[0].get('medecin', '') != None else ''
+    medecin = detail['Medecin']
     html += f"<strong><p style='font-size: 24px'>{nom_reserv}</p></strong><br>"
     intro= f"""<p style='font-size: 24px'>Vous avez un rendez vous  "<strong>{rdv}</strong>" prévu le <strong>{date_parts}</strong> à <strong>{heure_parts}</strong></p>"""
     if medecin != '':
@@ -570,56 +556,11 @@ def popup_row():
     else:
         transport_html = f"""<p style="color: #232946; font-size: 24px; font-weight: bold;">Aucun transport n'est prévu pour ce rendez-vous.</p>"""
         html += transport_html
-    if len(infos) > 0:
-        lieu= infos[0].get('lieu', 'Non spécifié')
-        lieu_html = f"""<p style="color: #232946; font-size: 32px;">Lieu du rendez-vous : <strong>{lieu}</strong></p>"""
-        html += lieu_html
+    lieu = detail['Lieu']
+    lieu_html = f"""<p style="color: #232946; font-size: 32px;">Lieu du rendez-vous : <strong>{lieu}</strong></p>"""
+    html += lieu_html
     html += '</table>'
 
-    buffer = BytesIO()
-    pdf = canvas.Canvas(buffer, pagesize=A4)
-    width, height = A4
-    y = height - 50  # position verticale de départ
-
-    pdf.setFont("Helvetica-Bold", 24)
-    pdf.drawString(50, y, nom_reserv)
-    y -= 40
-
-    pdf.setFont("Helvetica", 18)
-    pdf.drawString(50, y, f"Vous avez un rendez-vous '{rdv}' prévu le {date_parts} à {heure_parts}.")
-    y -= 30
-
-    # Médecin si présent
-    medecin = data.get("medecin", "")
-    if medecin:
-        pdf.drawString(50, y, f"Avec : {medecin}")
-        y -= 30
-
-    # Transport
-    if transport != "---":
-        pdf.setFont("Helvetica-Bold", 18)
-        pdf.drawString(50, y, f"Un transport est prévu pour vous emmener : {transport}")
-    else:
-        pdf.setFont("Helvetica-Bold", 18)
-        pdf.drawString(50, y, "Aucun transport n'est prévu pour ce rendez-vous.")
-    y -= 40
-
-    # Lieu si présent
-    lieu = data.get("lieu", "")
-    if lieu:
-        pdf.setFont("Helvetica-Bold", 20)
-        pdf.drawString(50, y, f"Lieu du rendez-vous : {lieu}")
-
-    pdf.showPage()
-    pdf.save()
-
-    buffer.seek(0)
-    response = make_response(buffer.read())
-    response.headers['Content-Type'] = 'application/pdf'
-    response.headers['Content-Disposition'] = 'inline; filename=impression.pdf'
-
-    
-
     return make_response(html)
 
 @main_bp.route('/admin', methods=['GET', 'POST'])
@@ -654,15 +595,59 @@ def admin():
         users_roles=users_dico.values()
     )
 
+@main_bp.route('/admin/pool', methods=['GET'])
+@login_required
+@role_required("admin")
+def admin_pool():
+    """
+    Etat du pool de connexions Neo4j et des caches (référence, fiches PDF)
+    du worker qui répond.
+    """
+    return jsonify({**pool_stats(), 'cache': stats_cache(), 'cache_pdf': stats_cache_pdf()})
+
 @main_bp.route('/supp_one', methods=['GET','POST'])
 def supp_one():
     if request.method == 'POST':
         id_one= request.form.get('id_one')
-        id_one= int(id_one) if id_one.isdigit() else id_one
         print('id_one : ', id_one)
         supprimer_rdv(driver,id_one)
     return redirect(url_for('main.emploi_collectif'))
 
+@main_bp.route('/chaine/modifier', methods=['POST'])
+@login_required
+@role_required("infirmiere","admin")
+def modif_chaine():
+    """
+    Modifie une chaîne de rendez-vous à partir d'une date. Corps :
+    {"id_chain": 12, "date": "AAAA-MM-JJ", "modifications": {"heure": "10:30", "lieu": ...}}.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        id_chain = int(data['id_chain'])
+        date_iso = date.fromisoformat(data['date']).isoformat()
+        resultat = modifier_chaine(driver, id_chain, date_iso, data.get('modifications') or {},
+                                   NEO4J_DB=NEO4J_DB)
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({'success': True, **resultat})
+
+@main_bp.route('/rdv/surcharges', methods=['POST'])
+@login_required
+@role_required("infirmiere","admin")
+def surcharges_rdv():
+    """
+    Attributs propres à un seul rendez-vous. Corps : {"id": ..., "surcharges":
+    {"oxygen": "1"}} ; une valeur vide rend l'attribut du résident.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        trouve = surcharger_rdv(driver, data['id'], data.get('surcharges') or {}, NEO4J_DB)
+    except (KeyError, ValueError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    if not trouve:
+        return jsonify({'success': False, 'error': "Rendez-vous introuvable ou déjà modifié"}), 404
+    return jsonify({'success': True})
+
 @main_bp.route('/supp_all', methods=['GET','POST'])
 def supp_all():
     if request.method == 'POST':
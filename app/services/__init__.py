@@ -1,75 +1,189 @@
 from .neo4j_services import (
     extract_form_data,
     insert_rendez_vous,
-    create_rappels,
+    insert_rendez_vous_bulk,
+    modifier_chaine,
+    surcharger_rdv,
+    CHAMPS_CHAINE,
     get_residents,
     get_medecins,
     get_rendez_vous,
     get_resident_properties,
     get_rdv_types,
     get_all_rdv_events,
+    evenement_calendrier,
     add_resident_to_db,
     get_rendez_vous_jour,
+    get_rdv_jour,
+    get_notes_service_jour,
+    get_rappels_jour,
     ajout_note,
     get_service,
     generate_smart_weekday_recurrence,
     enregistrer_valeur_selles,
     maj_last_check_selles,
+    synchroniser_selles,
     selles_non_enregistrees,
     get_selles_du_jour,
+    get_tableau_selles,
+    get_matrice_selles,
+    lignes_tableau_selles,
+    OPTIONS_SELLES,
     get_residents_chambre,
     get_plusieurs_jours_selles,
-    get_infos_rdv,
+    get_detail_rdv,
+    get_rdv_version,
     get_all_users,
     update_roles,
-    supprimer_rdv,
-    supprimer_rdv_chaine,
+    get_role,
+    get_role_version,
     get_next_id,
-    create_rappel_infini,
     imprimerMultiJours,
     get_personnel,
     ajouter_note_persistante,
     get_recent_rdv,
     get_graph,
+    get_historique_selles,
+    get_selles_version,
     infosResidentRDV,
+    get_attributs_resident_rdv,
     update_resident,
     get_unique_filename
 )
+from .recurrences import (
+    creer_recurrences,
+    get_occurrences_recurrences,
+    get_rappels_recurrences,
+    est_id_occurrence,
+    get_occurrence,
+    annuler_occurrence,
+    modifier_occurrence,
+    maj_status_rappel,
+    tronquer_recurrences,
+    scinder_recurrences
+)
+from .schema import (
+    ensure_schema,
+    rapport_plans,
+    afficher_rapport_plans
+)
+from .sequences import (
+    incrementer_sequence,
+    valeur_sequence,
+    AllocateurSequence
+)
+from .cache import (
+    invalider_cache,
+    stats_cache
+)
+from .tableau_bord import (
+    get_donnees_journee
+)
+from .suppressions import (
+    supprimer_rdv,
+    supprimer_rdv_chaine,
+    annuler_chaine,
+    marquer_depart,
+    delete_resident
+)
+from .profil_resident import (
+    get_profil_resident,
+    get_page_rdv
+)
+from .fiche_rdv import (
+    contenu_fiche,
+    empreinte_fiche,
+    rendre_fiche_pdf,
+    stats_cache_pdf
+)
+from .neo4j_driver import (
+    get_driver,
+    fermer_driver,
+    pool_stats
+)
 
 __all__ = [
     'extract_form_data',
     'insert_rendez_vous',
-    'create_rappels',
+    'insert_rendez_vous_bulk',
+    'modifier_chaine',
+    'surcharger_rdv',
+    'CHAMPS_CHAINE',
     'get_residents',
     'get_medecins',
     'get_rendez_vous',
     'get_resident_properties',
     'get_rdv_types',
     'get_all_rdv_events',
+    'evenement_calendrier',
     'add_resident_to_db',
+    'delete_resident',
     'get_rendez_vous_jour',
+    'get_rdv_jour',
+    'get_notes_service_jour',
+    'get_rappels_jour',
+    'get_donnees_journee',
+    'get_profil_resident',
+    'get_page_rdv',
+    'contenu_fiche',
+    'empreinte_fiche',
+    'rendre_fiche_pdf',
+    'stats_cache_pdf',
+    'invalider_cache',
+    'stats_cache',
     'ajout_note',
     'get_service',
     'generate_smart_weekday_recurrence',
     'enregistrer_valeur_selles',
     'maj_last_check_selles',
+    'synchroniser_selles',
     'selles_non_enregistrees',
     'get_selles_du_jour',
+    'get_tableau_selles',
+    'get_matrice_selles',
+    'lignes_tableau_selles',
+    'OPTIONS_SELLES',
     'get_residents_chambre',
     'get_plusieurs_jours_selles',
-    'get_infos_rdv',
+    'get_detail_rdv',
+    'get_rdv_version',
     'get_all_users',
     'update_roles',
+    'get_role',
+    'get_role_version',
     'supprimer_rdv',
     'supprimer_rdv_chaine',
+    'annuler_chaine',
+    'marquer_depart',
     'get_next_id',
-    'create_rappel_infini',
     'imprimerMultiJours',
     'get_personnel',
     'ajouter_note_persistante',
     'get_recent_rdv',
     'get_graph',
+    'get_historique_selles',
+    'get_selles_version',
     'infosResidentRDV',
+    'get_attributs_resident_rdv',
     'update_resident',
     'get_unique_filename',
+    'creer_recurrences',
+    'get_occurrences_recurrences',
+    'get_rappels_recurrences',
+    'est_id_occurrence',
+    'get_occurrence',
+    'annuler_occurrence',
+    'modifier_occurrence',
+    'maj_status_rappel',
+    'tronquer_recurrences',
+    'scinder_recurrences',
+    'ensure_schema',
+    'rapport_plans',
+    'afficher_rapport_plans',
+    'incrementer_sequence',
+    'valeur_sequence',
+    'AllocateurSequence',
+    'get_driver',
+    'fermer_driver',
+    'pool_stats',
 ]
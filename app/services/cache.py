@@ -0,0 +1,153 @@
+"""
+Cache en mémoire (par processus) des données de référence : catégories,
+services, liste des résidents, historique des selles et détail des
+rendez-vous.
+
+Chaque entrée appartient à un groupe ; les fonctions d'écriture invalident
+explicitement le groupe qu'elles modifient, le TTL borne la durée pendant
+laquelle un autre worker peut servir une valeur périmée. Les données à TTL
+long (historique des selles, détail des rendez-vous) portent en plus dans
+leur clé une version lue en base, relue au plus toutes les quelques
+secondes. Le nombre
+d'entrées est borné (éviction de la moins récemment utilisée).
+"""
+import copy
+import functools
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from app.services.sequences import incrementer_sequence
+
+
+TTL_REFERENTIEL = float(os.getenv("CACHE_TTL_REFERENTIEL", "3600"))
+TTL_RESIDENTS = float(os.getenv("CACHE_TTL_RESIDENTS", "300"))
+# delai max avant qu'un changement de role fait par un autre worker soit vu
+TTL_ROLES = float(os.getenv("CACHE_TTL_ROLES", "5"))
+TTL_SELLES = float(os.getenv("CACHE_TTL_SELLES", "86400"))
+# delai max avant qu'une saisie de selles faite par un autre worker soit vue
+TTL_VERSION_SELLES = float(os.getenv("CACHE_TTL_VERSION_SELLES", "5"))
+TTL_RDV = float(os.getenv("CACHE_TTL_RDV", "600"))
+# delai max avant qu'une ecriture de rdv faite par un autre worker soit vue
+TTL_VERSION_RDV = float(os.getenv("CACHE_TTL_VERSION_RDV", "5"))
+
+GROUPE_REFERENTIEL = 'referentiel'
+GROUPE_RESIDENTS = 'residents'
+GROUPE_ROLES = 'roles'
+GROUPE_VERSION_SELLES = 'selles_version'
+# detail des rendez-vous (une entree par id), vide a chaque ecriture de Rdv
+GROUPE_RDV = 'rdv'
+GROUPE_VERSION_RDV = 'rdv_version'
+
+SEQUENCE_RDV = 'rdv_version'
+
+
+def groupe_selles(pk, *args, **kwargs):
+    """Groupe de cache de l'historique des selles d'un résident."""
+    return f"selles:{pk}"
+
+
+class CacheTTL:
+    """
+    Cache clé -> valeur avec expiration (TTL) et taille maximale (LRU).
+    """
+
+    def __init__(self, taille_max=256):
+        self.taille_max = taille_max
+        self._entrees = OrderedDict()  # cle -> (groupe, expiration, valeur)
+        self._verrou = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lire(self, cle):
+        """
+        Returns:
+            tuple: (trouvé (bool), valeur).
+        """
+        with self._verrou:
+            entree = self._entrees.get(cle)
+            if entree is None or entree[1] < time.monotonic():
+                if entree is not None:
+                    del self._entrees[cle]
+                self.misses += 1
+                return False, None
+            self._entrees.move_to_end(cle)
+            self.hits += 1
+            return True, entree[2]
+
+    def ecrire(self, cle, valeur, ttl, groupe=None):
+        with self._verrou:
+            self._entrees[cle] = (groupe, time.monotonic() + ttl, valeur)
+            self._entrees.move_to_end(cle)
+            while len(self._entrees) > self.taille_max:
+                self._entrees.popitem(last=False)
+                self.evictions += 1
+
+    def invalider(self, *groupes):
+        """Supprime les entrées des groupes donnés (toutes si aucun groupe)."""
+        with self._verrou:
+            if not groupes:
+                self._entrees.clear()
+                return
+            for cle in [c for c, e in self._entrees.items() if e[0] in groupes]:
+                del self._entrees[cle]
+
+    def stats(self):
+        with self._verrou:
+            total = self.hits + self.misses
+            return {
+                'entrees': len(self._entrees),
+                'taille_max': self.taille_max,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'taux_hit': round(self.hits / total, 3) if total else 0.0,
+            }
+
+
+cache_reference = CacheTTL(int(os.getenv("CACHE_TAILLE_MAX", "256")))
+
+
+def en_cache(groupe, ttl):
+    """
+    Décorateur pour les lectures de type f(driver, *args) : le résultat est
+    mis en cache selon les arguments autres que le driver. Une copie est
+    renvoyée, l'appelant peut donc modifier les listes sans toucher au cache.
+
+    `groupe` peut être une fonction des arguments (hors driver) pour
+    pouvoir invalider une seule partie du cache (ex. un résident).
+    """
+    def decorateur(fonction):
+        @functools.wraps(fonction)
+        def wrapper(driver, *args, **kwargs):
+            cle = (fonction.__name__, args, tuple(sorted(kwargs.items())))
+            trouve, valeur = cache_reference.lire(cle)
+            if not trouve:
+                valeur = fonction(driver, *args, **kwargs)
+                cache_reference.ecrire(cle, valeur, ttl,
+                                       groupe(*args, **kwargs) if callable(groupe) else groupe)
+            return copy.deepcopy(valeur)
+        wrapper.sans_cache = fonction
+        return wrapper
+    return decorateur
+
+
+def invalider_cache(*groupes):
+    cache_reference.invalider(*groupes)
+
+
+def invalider_rdv(driver, NEO4J_DB="neo4j"):
+    """
+    A appeler après une écriture de rendez-vous : vide le détail des rdv de
+    ce processus et incrémente la version des rdv, ce qui périme celui des
+    autres workers (voir get_rdv_version).
+    """
+    with driver.session(database=NEO4J_DB) as session:
+        session.execute_write(incrementer_sequence, SEQUENCE_RDV)
+    invalider_cache(GROUPE_RDV, GROUPE_VERSION_RDV)
+
+
+def stats_cache():
+    return cache_reference.stats()
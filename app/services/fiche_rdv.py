@@ -0,0 +1,154 @@
+"""
+Fiche de rendez-vous imprimable (PDF) remise au résident.
+
+Le PDF ne dépend que du contenu de la fiche : il est rendu une seule fois
+par contenu et gardé en mémoire (par processus), la clé étant l'empreinte
+SHA-256 du contenu. Cette empreinte sert aussi d'ETag, le navigateur qui
+réimprime une fiche inchangée reçoit un 304 sans que rien ne soit rendu.
+Le cache est borné en octets (éviction de la fiche la moins récemment
+imprimée).
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+
+CHAMPS_FICHE = ('nom_resident', 'Date_Fr', 'Heure', 'Rendez-vous',
+                'Medecin', 'Transport', 'Lieu', 'Note')
+
+SANS_TRANSPORT = '---'
+
+
+class CachePDF:
+    """
+    Cache empreinte -> PDF, borné par la taille totale des PDF (LRU).
+    """
+
+    def __init__(self, octets_max):
+        self.octets_max = octets_max
+        self._entrees = OrderedDict()  # empreinte -> pdf (bytes)
+        self._octets = 0
+        self._verrou = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lire(self, empreinte):
+        with self._verrou:
+            pdf = self._entrees.get(empreinte)
+            if pdf is None:
+                self.misses += 1
+                return None
+            self._entrees.move_to_end(empreinte)
+            self.hits += 1
+            return pdf
+
+    def ecrire(self, empreinte, pdf):
+        if len(pdf) > self.octets_max:
+            return
+        with self._verrou:
+            ancien = self._entrees.pop(empreinte, None)
+            if ancien is not None:
+                self._octets -= len(ancien)
+            self._entrees[empreinte] = pdf
+            self._octets += len(pdf)
+            while self._octets > self.octets_max:
+                _, evince = self._entrees.popitem(last=False)
+                self._octets -= len(evince)
+                self.evictions += 1
+
+    def stats(self):
+        with self._verrou:
+            total = self.hits + self.misses
+            return {
+                'entrees': len(self._entrees),
+                'octets': self._octets,
+                'octets_max': self.octets_max,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'taux_hit': round(self.hits / total, 3) if total else 0.0,
+            }
+
+
+cache_fiches = CachePDF(int(os.getenv("CACHE_PDF_OCTETS", str(16 * 1024 * 1024))))
+
+
+def contenu_fiche(data):
+    """
+    Ne garde que les champs imprimés, en chaînes : deux lignes du planning
+    qui s'impriment pareil ont le même contenu (et la même empreinte).
+    """
+    contenu = {champ: str(data.get(champ) or '').strip() for champ in CHAMPS_FICHE}
+    contenu['Transport'] = contenu['Transport'] or SANS_TRANSPORT
+    return contenu
+
+
+def empreinte_fiche(contenu):
+    forme = json.dumps(contenu, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(forme.encode('utf-8')).hexdigest()
+
+
+def _dessiner_fiche(contenu):
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+    y = height - 100
+
+    pdf.setFont("Helvetica-Bold", 22)
+    pdf.drawString(50, y, contenu['nom_resident'])
+    y -= 60
+
+    pdf.setFont("Helvetica", 18)
+    pdf.drawString(50, y, f"Vous avez rendez-vous le : {contenu['Date_Fr']} à {contenu['Heure']}.")
+    y -= 50
+    pdf.drawString(50, y, f"Motif : {contenu['Rendez-vous']} ")
+    y -= 50
+    if contenu['Medecin']:
+        pdf.drawString(50, y, f"Avec : {contenu['Medecin']}")
+        y -= 50
+
+    if contenu['Transport'] != SANS_TRANSPORT:
+        pdf.drawString(50, y, f"Transport : {contenu['Transport']}")
+    else:
+        pdf.drawString(50, y, "Transport : Aucun transport n'est prévu.")
+    y -= 40
+
+    if contenu['Lieu']:
+        pdf.drawString(50, y, f"Lieu du rendez-vous : {contenu['Lieu']}")
+        y -= 40
+
+    if contenu['Note']:
+        pdf.drawString(50, y, f"Note : {contenu['Note']}")
+
+    pdf.save()
+    return buffer.getvalue()
+
+
+def rendre_fiche_pdf(contenu, empreinte=None):
+    """
+    PDF de la fiche, rendu seulement s'il n'est pas déjà en cache.
+
+    Args:
+        contenu (dict): Contenu normalisé par contenu_fiche.
+        empreinte (str, optional): empreinte_fiche(contenu), si déjà calculée.
+
+    Returns:
+        tuple: (pdf (bytes), empreinte).
+    """
+    empreinte = empreinte or empreinte_fiche(contenu)
+    pdf = cache_fiches.lire(empreinte)
+    if pdf is None:
+        pdf = _dessiner_fiche(contenu)
+        cache_fiches.ecrire(empreinte, pdf)
+    return pdf, empreinte
+
+
+def stats_cache_pdf():
+    return cache_fiches.stats()
@@ -0,0 +1,169 @@
+"""
+Migrations de données, exécutées par lots et reprenables : chaque lot ne
+sélectionne que les éléments pas encore migrés, on peut donc interrompre
+la commande et la relancer.
+
+Les migrations de MIGRATIONS_DEMARRAGE sont aussi rejouées par
+ensure_schema à chaque démarrage (rien à faire quand tout est migré).
+
+Usage :
+    python -m app.services.migrations dates [taille_lot]
+    python -m app.services.migrations selles_modele [taille_lot]
+    python -m app.services.migrations selles [taille_lot]   (après selles_modele)
+    python -m app.services.migrations rappels [taille_lot]
+"""
+import sys
+
+from app.services.neo4j_driver import get_driver, fermer_driver
+
+
+TAILLE_LOT = 5000
+
+
+def _par_lots(driver, cypher_query, taille_lot, nom, NEO4J_DB="neo4j"):
+    """
+    Rejoue `cypher_query` (qui doit traiter au plus $taille_lot éléments et
+    renvoyer leur nombre dans `nb`) jusqu'à ce qu'il n'y ait plus rien à migrer.
+
+    Returns:
+        int: Nombre total d'éléments migrés.
+    """
+    total = 0
+    with driver.session(database=NEO4J_DB) as session:
+        while True:
+            nb = session.execute_write(
+                lambda tx: tx.run(cypher_query, taille_lot=taille_lot).single()['nb'])
+            total += nb
+            if nb:
+                print(f"{nom} : {total} éléments migrés")
+            if nb < taille_lot:
+                return total
+
+
+def migrer_dates(driver, taille_lot=TAILLE_LOT, NEO4J_DB="neo4j"):
+    """
+    Ramène les dates des Rdv, Rappel et Note à la représentation canonique :
+    `date` de type DATE, `heure` de type LOCAL TIME (ou absente), et pour
+    les Rdv la clé de tri indexée `debut` (LOCAL DATETIME).
+
+    Returns:
+        int: Nombre de relations réécrites.
+    """
+    total = _par_lots(driver, """
+        MATCH ()-[r:Rdv]->()
+        WHERE r.debut IS NULL AND r.date IS NOT NULL
+        WITH r LIMIT $taille_lot
+        WITH r, (r.date IS :: ZONED DATETIME OR r.date IS :: LOCAL DATETIME) AS avec_heure
+        SET r.heure = CASE WHEN avec_heure THEN coalesce(r.heure, localtime(r.date)) ELSE r.heure END,
+            r.date = date(r.date)
+        SET r.debut = localdatetime({date: r.date, time: coalesce(r.heure, localtime('00:00'))})
+        RETURN count(r) AS nb
+    """, taille_lot, "Rdv", NEO4J_DB)
+    total += _par_lots(driver, """
+        MATCH ()-[r:Rappel|Note]->()
+        WHERE (r.date IS NOT NULL AND NOT r.date IS :: DATE)
+           OR (r.date_evt IS NOT NULL AND NOT r.date_evt IS :: DATE)
+        WITH r LIMIT $taille_lot
+        SET r.date = date(r.date),
+            r.date_evt = date(r.date_evt)
+        RETURN count(r) AS nb
+    """, taille_lot, "Rappel/Note", NEO4J_DB)
+    return total
+
+
+def migrer_modele_selles(driver, taille_lot=TAILLE_LOT, NEO4J_DB="neo4j"):
+    """
+    Passe les anciens noeuds Selles (partagés entre résidents, clé
+    date/moment/commentaire, caractéristique sur la relation Par) au modèle
+    un noeud par (pk, date, moment_date) portant caracteristique et commentaire.
+
+    Returns:
+        int: Nombre d'anciens noeuds remplacés.
+    """
+    return _par_lots(driver, """
+        MATCH (m:Selles) WHERE m.pk IS NULL
+        WITH m LIMIT $taille_lot
+        CALL {
+            WITH m
+            MATCH (m)-[r:Par]->(n:Resident)
+            MERGE (s:Selles {pk: n.pk, date: m.date, moment_date: m.moment_date})
+            ON CREATE SET s.create_date = datetime()
+            SET s.caracteristique = r.caracteristique,
+                s.commentaire = m.commentaire
+            MERGE (s)-[:Par]->(n)
+        }
+        DETACH DELETE m
+        RETURN count(*) AS nb
+    """, taille_lot, "Selles", NEO4J_DB)
+
+
+def migrer_derniere_selle(driver, taille_lot=TAILLE_LOT, NEO4J_DB="neo4j"):
+    """
+    Calcule derniere_selle_date et selles_7j des résidents à partir de
+    l'historique des Selles (les enregistrements suivants les tiennent à jour).
+
+    Returns:
+        int: Nombre de résidents traités.
+    """
+    return _par_lots(driver, """
+        MATCH (n:Resident)
+        WHERE n.selles_7j IS NULL
+        WITH n LIMIT $taille_lot
+        OPTIONAL MATCH (p:Selles {pk: n.pk})
+        WHERE p.caracteristique <> 'Absence'
+        WITH n, max(p.date) AS derniere,
+             collect(DISTINCT CASE WHEN p.date > date() - duration('P7D') THEN p.date END) AS recentes
+        SET n.derniere_selle_date = derniere,
+            n.selles_7j = recentes
+        RETURN count(n) AS nb
+    """, taille_lot, "Resident", NEO4J_DB)
+
+
+def migrer_id_rappels(driver, taille_lot=TAILLE_LOT, NEO4J_DB="neo4j"):
+    """
+    Remplace l'ID() numérique du Rdv stocké dans Rappel.id_rdv par son
+    elementId. Un rappel dont le Rdv n'existe plus perd son id_rdv.
+
+    Returns:
+        int: Nombre de rappels traités.
+    """
+    return _par_lots(driver, """
+        MATCH ()-[s:Rappel]->()
+        WHERE s.id_rdv IS :: INTEGER NOT NULL
+        WITH s LIMIT $taille_lot
+        OPTIONAL MATCH ()-[r:Rdv]->()
+        WHERE ID(r) = s.id_rdv
+        SET s.id_rdv = elementId(r)
+        RETURN count(s) AS nb
+    """, taille_lot, "Rappel", NEO4J_DB)
+
+
+MIGRATIONS = {
+    'dates': migrer_dates,
+    'selles_modele': migrer_modele_selles,
+    'selles': migrer_derniere_selle,
+    'rappels': migrer_id_rappels,
+}
+
+# migrations dont dependent les requetes (r.debut pour le tri et la pagination des Rdv)
+MIGRATIONS_DEMARRAGE = ('dates',)
+
+
+def migrer_au_demarrage(driver, NEO4J_DB="neo4j"):
+    """
+    Rejoue les migrations de MIGRATIONS_DEMARRAGE.
+
+    Returns:
+        dict: nom de la migration -> nombre d'éléments migrés.
+    """
+    return {nom: MIGRATIONS[nom](driver, NEO4J_DB=NEO4J_DB) for nom in MIGRATIONS_DEMARRAGE}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in MIGRATIONS:
+        print(f"Usage : python -m app.services.migrations [{'|'.join(MIGRATIONS)}] [taille_lot]")
+        sys.exit(1)
+    driver = get_driver()
+    taille = int(sys.argv[2]) if len(sys.argv) > 2 else TAILLE_LOT
+    print(f"Migration '{sys.argv[1]}' terminée : {MIGRATIONS[sys.argv[1]](driver, taille)} éléments")
+    fermer_driver()
@@ -0,0 +1,267 @@
+"""
+Fournisseur unique du driver Neo4j (pool de connexions partagé par les
+routes, l'authentification et les scripts).
+
+Le driver est créé à la première utilisation dans chaque processus : un
+worker gunicorn forké après le chargement de l'application ne réutilise
+donc jamais les sockets du processus parent.
+
+Configuration (app.config ou variables d'environnement) :
+    NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD (ou NEO4J_PASS),
+    NEO4J_POOL_SIZE, NEO4J_ACQUISITION_TIMEOUT (s),
+    NEO4J_CONNECTION_LIFETIME (s), NEO4J_KEEP_ALIVE (1/0),
+    NEO4J_LIVENESS_TIMEOUT (s, vide = pas de test de connexion inactive).
+"""
+import os
+import threading
+import time
+
+from neo4j import GraphDatabase
+
+
+_PARAMETRES = {
+    "NEO4J_URI": "bolt://localhost:7687",
+    "NEO4J_USER": "neo4j",
+    "NEO4J_PASSWORD": None,
+    "NEO4J_POOL_SIZE": "50",
+    "NEO4J_ACQUISITION_TIMEOUT": "60",
+    "NEO4J_CONNECTION_LIFETIME": "3600",
+    "NEO4J_KEEP_ALIVE": "1",
+    "NEO4J_LIVENESS_TIMEOUT": "",
+}
+
+_verrou = threading.Lock()
+_config = {}
+_driver = None
+_pid = None
+
+
+class _StatsAcquisition:
+    """
+    Temps d'obtention d'une connexion, cumulé par processus. Il est mesuré
+    autour de l'API publique des sessions (voir _SessionInstrumentee) : du
+    premier appel de la session jusqu'à ce que le serveur ait accepté la
+    transaction, l'aller-retour BEGIN/RUN est donc compris.
+    """
+
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self.reinitialiser()
+
+    def reinitialiser(self):
+        self.sessions = 0
+        self.ouvertes = 0
+        self.acquisitions = 0
+        self.attente_totale = 0.0
+        self.attente_max = 0.0
+
+    def ouvrir(self):
+        with self._verrou:
+            self.sessions += 1
+            self.ouvertes += 1
+
+    def fermer(self):
+        with self._verrou:
+            self.ouvertes -= 1
+
+    def enregistrer(self, attente):
+        with self._verrou:
+            self.acquisitions += 1
+            self.attente_totale += attente
+            self.attente_max = max(self.attente_max, attente)
+
+
+_stats = _StatsAcquisition()
+
+
+def configurer(**parametres):
+    """
+    Fixe la configuration du driver (clés de _PARAMETRES). Le driver
+    existant est fermé pour que la nouvelle configuration s'applique.
+    """
+    global _driver
+    with _verrou:
+        _config.update({cle: valeur for cle, valeur in parametres.items()
+                        if cle in _PARAMETRES and valeur is not None})
+        if _driver is not None and _pid == os.getpid():
+            _driver.close()
+        _driver = None
+
+
+def init_app(app):
+    """Branche le driver sur l'application Flask (appelé dans create_app)."""
+    configurer(**{cle: app.config.get(cle) for cle in _PARAMETRES})
+    app.extensions["neo4j_driver"] = get_driver
+
+
+def _parametre(cle):
+    if cle in _config:
+        return _config[cle]
+    if cle == "NEO4J_PASSWORD":
+        return os.getenv("NEO4J_PASSWORD", os.getenv("NEO4J_PASS"))
+    return os.getenv(cle, _PARAMETRES[cle])
+
+
+def _creer_driver():
+    options = {
+        "max_connection_pool_size": int(_parametre("NEO4J_POOL_SIZE")),
+        "connection_acquisition_timeout": float(_parametre("NEO4J_ACQUISITION_TIMEOUT")),
+        "max_connection_lifetime": float(_parametre("NEO4J_CONNECTION_LIFETIME")),
+        "keep_alive": str(_parametre("NEO4J_KEEP_ALIVE")) == "1",
+    }
+    if _parametre("NEO4J_LIVENESS_TIMEOUT"):
+        options["liveness_check_timeout"] = float(_parametre("NEO4J_LIVENESS_TIMEOUT"))
+    return _DriverInstrumente(GraphDatabase.driver(
+        _parametre("NEO4J_URI"),
+        auth=(_parametre("NEO4J_USER"), _parametre("NEO4J_PASSWORD")),
+        **options))
+
+
+def get_driver():
+    """
+    Retourne le driver du processus courant (créé au premier appel,
+    et recréé dans un processus fils après un fork).
+    """
+    global _driver, _pid
+    if _driver is None or _pid != os.getpid():
+        with _verrou:
+            if _driver is None or _pid != os.getpid():
+                # apres un fork on abandonne le driver du parent sans le fermer :
+                # ses sockets appartiennent toujours au processus parent
+                _stats.reinitialiser()
+                _driver = _creer_driver()
+                _pid = os.getpid()
+    return _driver
+
+
+def fermer_driver():
+    global _driver
+    with _verrou:
+        if _driver is not None and _pid == os.getpid():
+            _driver.close()
+        _driver = None
+
+
+def _apres_fork():
+    global _driver
+    _driver = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_apres_fork)
+
+
+class _SessionInstrumentee:
+    """
+    Enveloppe d'une session : la connexion est prise dans le pool au premier
+    run / begin_transaction / execute_*, on chronomètre donc ce premier appel
+    (jusqu'à l'entrée dans la fonction de transaction pour execute_*).
+    """
+
+    def __init__(self, session):
+        self._session = session
+        self._debut = None
+        self._ouverte = True
+        _stats.ouvrir()
+
+    def __getattr__(self, nom):
+        return getattr(self._session, nom)
+
+    def __enter__(self):
+        self._session.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            return self._session.__exit__(*exc)
+        finally:
+            self._fermer()
+
+    def close(self):
+        try:
+            self._session.close()
+        finally:
+            self._fermer()
+
+    def _fermer(self):
+        if self._ouverte:
+            self._ouverte = False
+            _stats.fermer()
+
+    def _demarrer(self):
+        if self._debut is None:
+            self._debut = time.perf_counter()
+            return True
+        return False
+
+    def _chronometre(self, premier, appel, *args, **kwargs):
+        try:
+            return appel(*args, **kwargs)
+        finally:
+            if premier:
+                _stats.enregistrer(time.perf_counter() - self._debut)
+
+    def run(self, *args, **kwargs):
+        return self._chronometre(self._demarrer(), self._session.run, *args, **kwargs)
+
+    def begin_transaction(self, *args, **kwargs):
+        return self._chronometre(self._demarrer(), self._session.begin_transaction, *args, **kwargs)
+
+    def _executer(self, executer, fonction, *args, **kwargs):
+        if not self._demarrer():
+            return executer(fonction, *args, **kwargs)
+        premier_essai = True
+
+        def fonction_chronometree(tx, *a, **k):
+            # execute_* rejoue la fonction en cas d'erreur transitoire : seul le premier essai compte
+            nonlocal premier_essai
+            if premier_essai:
+                premier_essai = False
+                _stats.enregistrer(time.perf_counter() - self._debut)
+            return fonction(tx, *a, **k)
+        return executer(fonction_chronometree, *args, **kwargs)
+
+    def execute_read(self, fonction, *args, **kwargs):
+        return self._executer(self._session.execute_read, fonction, *args, **kwargs)
+
+    def execute_write(self, fonction, *args, **kwargs):
+        return self._executer(self._session.execute_write, fonction, *args, **kwargs)
+
+
+class _DriverInstrumente:
+    """
+    Enveloppe du driver Neo4j qui mesure le temps d'acquisition des
+    connexions ; tout le reste est délégué au driver réel.
+    """
+
+    def __init__(self, driver):
+        self._driver = driver
+
+    def __getattr__(self, nom):
+        return getattr(self._driver, nom)
+
+    def session(self, **config):
+        return _SessionInstrumentee(self._driver.session(**config))
+
+
+def pool_stats():
+    """
+    Etat du pool de connexions du processus courant, à titre indicatif : le
+    driver n'expose pas son pool, les chiffres sont mesurés autour de l'API
+    publique des sessions (voir _SessionInstrumentee).
+
+    Returns:
+        dict: taille max du pool, sessions ouvertes (chacune tient au plus
+        une connexion), sessions créées, et temps d'acquisition (nombre,
+        moyenne et maximum en millisecondes, aller-retour BEGIN/RUN compris).
+    """
+    return {
+        "pid": os.getpid(),
+        "taille_max": int(_parametre("NEO4J_POOL_SIZE")),
+        "en_cours": _stats.ouvertes,
+        "sessions": _stats.sessions,
+        "acquisitions": _stats.acquisitions,
+        "attente_moyenne_ms": round(1000 * _stats.attente_totale / _stats.acquisitions, 3)
+        if _stats.acquisitions else 0.0,
+        "attente_max_ms": round(1000 * _stats.attente_max, 3),
+    }
@@ -8,8 +8,39 @@ import plotly.graph_objects as go
 import datetime
 import numpy as np
 from werkzeug.utils import secure_filename
-
-
+from app.services.sequences import AllocateurSequence, incrementer_sequence, valeur_sequence
+from app.services.cache import (en_cache, invalider_cache, invalider_rdv,
+                                GROUPE_REFERENTIEL, GROUPE_RESIDENTS, GROUPE_ROLES, GROUPE_RDV,
+                                TTL_REFERENTIEL, TTL_RESIDENTS, TTL_ROLES, TTL_RDV,
+                                GROUPE_VERSION_RDV, TTL_VERSION_RDV, SEQUENCE_RDV,
+                                groupe_selles, TTL_SELLES,
+                                GROUPE_VERSION_SELLES, TTL_VERSION_SELLES)
+from app.services.recurrences import (regle_depuis_formulaire,
+                                      get_occurrences_recurrences,
+                                      get_rappels_recurrences,
+                                      est_id_occurrence,
+                                      get_occurrence,
+                                      modifier_occurrence,
+                                      scinder_recurrences,
+                                      CHAMPS_RESIDENT_RDV)
+
+SEQUENCE_ROLES = 'role_version'
+SEQUENCE_SELLES = 'selles_version'
+
+# horizon de developpement des recurrences sans date de fin pour les vues "a venir"
+HORIZON_RECURRENCES = datetime.timedelta(days=365)
+
+# proprietes modifiables sur toute une chaine, et celles recopiees sur ses rappels
+CHAMPS_CHAINE = ('heure', 'lieu', 'transport', 'medecin', 'commentaire', 'responsable') + CHAMPS_RESIDENT_RDV
+CHAMPS_RAPPEL_CHAINE = ('lieu', 'transport')
+TAILLE_LOT_CHAINE = int(os.getenv("CHAINE_TAILLE_LOT", "5000"))
+
+# taille des blocs d'id_chain reserves par processus (1 = identifiants contigus)
+_ALLOCATEUR_CHAINE = AllocateurSequence('rdv_chain',
+                                        taille_bloc=os.getenv("ID_CHAIN_BLOC", "1"))
+
+
+@en_cache(GROUPE_REFERENTIEL, TTL_REFERENTIEL)
 def get_personnel(driver, NEO4J_DB="neo4j"):
     """
     Récupère la liste du personnel (médecins et infirmières) depuis la base Neo4j.
@@ -27,6 +58,7 @@ def get_personnel(driver, NEO4J_DB="neo4j"):
                 personnel.append(nom)
     return personnel
 
+@en_cache(GROUPE_RESIDENTS, TTL_RESIDENTS)
 def get_residents(driver, NEO4J_DB="neo4j"):
     """
     Récupère la liste des noms complets des résidents depuis la base Neo4j.
@@ -39,7 +71,7 @@ def get_residents(driver, NEO4J_DB="neo4j"):
     residents_prenoms = []
     pks = []
     with driver.session(database=NEO4J_DB) as session:
-        cypher_query = """MATCH (n:Resident) RETURN n.nom, n.prenom, n.pk
+        cypher_query = """MATCH (n:Resident) WHERE n.date_depart IS NULL RETURN n.nom, n.prenom, n.pk
                        ORDER BY n.nom, n.prenom, n.pk"""
         neo4j_results = session.run(cypher_query)
         for record in neo4j_results:
@@ -48,65 +80,123 @@ def get_residents(driver, NEO4J_DB="neo4j"):
                 pks.append(record['n.pk'])
     return residents_noms, residents_prenoms, pks
 
-def get_residents_chambre(driver, NEO4J_DB="neo4j"):
+@en_cache(GROUPE_RESIDENTS, TTL_RESIDENTS)
+def get_residents_chambre(driver, NEO4J_DB="neo4j", partis=False):
     """
     Récupère la liste des noms complets des résidents depuis la base Neo4j.
 
+    Args:
+        partis (bool): Inclut les résidents partis (voir marquer_depart),
+            pour consulter leur historique ; leur date de départ est
+            ajoutée au nom.
+
     Returns:
-        list[str]: Liste des noms complets des résidents,
-        triés par nom puis prénom.
+        tuple: (pks, noms complets), triés par nom puis prénom.
     """
     residents = []
     pks = []
     with driver.session(database=NEO4J_DB) as session:
-        cypher_query = """MATCH (n:Resident) RETURN n.nom, n.prenom, n.chambre, n.pk
+        cypher_query = """MATCH (n:Resident) WHERE $partis OR n.date_depart IS NULL
+                       RETURN n.nom, n.prenom, n.chambre, n.pk, n.date_depart
                        ORDER BY n.nom, n.prenom, n.chambre"""
-        neo4j_results = session.run(cypher_query)
+        neo4j_results = session.run(cypher_query, partis=partis)
         for record in neo4j_results:
             nom = record['n.nom'] + ' ' + record['n.prenom'] + ' (Chambre ' + str(record['n.chambre']) + ')'
+            if record['n.date_depart'] is not None:
+                nom += ' - parti le ' + record['n.date_depart'].to_native().strftime('%d/%m/%Y')
             pk = record['n.pk']
             if nom:
                 residents.append(nom)
                 pks.append(pk)
     return pks,residents
 
-def get_rendez_vous_jour(driver, NEO4J_DB="neo4j"):
+REQUETE_RDV_JOUR = """
+    MATCH (n:Resident)-[r:Rdv]->(m)
+    WHERE r.date = date()
+    RETURN n.nom AS nom, n.prenom AS prenom, n.chambre AS chambre, r.date AS date, r.heure AS heure, r.lieu AS lieu, m.metier AS metier, m.type AS type, r.commentaire AS commentaire, r.responsable AS responsable, 'Note' AS type_element
+    ORDER BY m.metier, n.nom, n.prenom
+"""
+
+
+def get_rdv_jour(driver, NEO4J_DB="neo4j"):
+    """
+    Rendez-vous du jour (relations Rdv et occurrences des récurrences).
+
+    Returns:
+        pd.DataFrame: Une ligne par rendez-vous, triée par métier puis résident.
+    """
     with driver.session(database=NEO4J_DB) as session:
-        cypher_query = """
-                        MATCH (n:Resident)-[r:Rdv]->(m)
-                        WHERE date(r.date) = date()
-                        RETURN n.nom AS nom, n.prenom AS prenom, n.chambre AS chambre, r.date AS date, r.heure AS heure, r.lieu AS lieu, m.metier AS metier, m.type AS type, r.commentaire AS commentaire, r.responsable AS responsable, 'Note' AS type_element
-                        ORDER BY m.metier, n.nom, n.prenom
-                        """
-        neo4j_results = session.run(cypher_query)
+        neo4j_results = session.run(REQUETE_RDV_JOUR)
         data = [record.data() for record in neo4j_results]
+    aujourdhui = datetime.date.today()
+    data += [
+        {'nom': occ['nom'], 'prenom': occ['prenom'], 'chambre': occ['chambre'],
+         'date': occ['date'], 'heure': occ['heure'], 'lieu': occ['lieu'],
+         'metier': occ['metier'], 'type': occ['type'], 'commentaire': occ['commentaire'],
+         'responsable': occ['responsable'], 'type_element': 'Note'}
+        for occ in get_occurrences_recurrences(driver, aujourdhui, aujourdhui, NEO4J_DB=NEO4J_DB)
+    ]
     df_rdv = pd.DataFrame(data)
+    if not df_rdv.empty:
+        df_rdv = df_rdv.sort_values(['metier', 'nom', 'prenom'], ignore_index=True)
+    return df_rdv
+
+def get_notes_service_jour(driver, NEO4J_DB="neo4j"):
+    """
+    Notes des services pour aujourd'hui et notes persistantes non cochées.
 
+    Returns:
+        pd.DataFrame: Une ligne par note.
+    """
     with driver.session(database=NEO4J_DB) as session:
         cypher_query = """
                         MATCH (n:Service )-[r]->(m)
                         WHERE r.date = date() OR (r.date is null and r.status=1)
-                        RETURN n.nom as service, r.date AS date, r.heure AS heure, r.commentaire AS commentaire, m.metier AS metier, ID(r) AS id, r.status AS status, 'PermaNote' AS type_element
+                        RETURN n.nom as service, r.date AS date, r.heure AS heure, r.commentaire AS commentaire, m.metier AS metier, elementId(r) AS id, r.status AS status, 'PermaNote' AS type_element
                         ORDER BY r.date, m.metier
                         """
         neo4j_results = session.run(cypher_query)
         data = [record.data() for record in neo4j_results]
-    df_service = pd.DataFrame(data)
+    return pd.DataFrame(data)
+
+REQUETE_RAPPELS_JOUR = """
+    MATCH (n)-[r:Rappel]->(m)
+    WHERE r.date = date()
+    RETURN r.date AS date, 
+        type(r) + " " + n.nom_affichage + " " + toString(r.date_evt) + " " + m.metier + " : " + r.commentaire AS commentaire, elementId(r) AS id, r.status AS status, r.heure AS heure,
+        m.metier AS metier, 'Rappel' AS type_element
+    ORDER BY r.date, m.metier
+"""
+
+
+def get_rappels_jour(driver, NEO4J_DB="neo4j"):
+    """
+    Rappels du jour (relations Rappel et rappels des récurrences).
+
+    Returns:
+        pd.DataFrame: Une ligne par rappel.
+    """
     with driver.session(database=NEO4J_DB) as session:
-        cypher_query = """
-                        MATCH (n)-[r:Rappel]->(m)
-                        WHERE date(r.date) = date()
-                        RETURN r.date AS date, 
-                            type(r) + " " + n.nom_affichage + " " + r.date_evt + " " + m.metier + " : " + r.commentaire AS commentaire, ID(r) AS id, r.status AS status, r.heure AS heure,
-                            m.metier AS metier, 'Rappel' AS type_element
-                        ORDER BY r.date, m.metier
-                        """
-        neo4j_results = session.run(cypher_query)
+        neo4j_results = session.run(REQUETE_RAPPELS_JOUR)
         data = [record.data() for record in neo4j_results]
-    df_rappel = pd.DataFrame(data)
-    df_service = pd.concat([df_service, df_rappel], ignore_index=True)
+    aujourdhui = datetime.date.today()
+    data += [
+        {'date': rappel['date'],
+         'commentaire': f"Rappel {rappel['nom_affichage']} {rappel['date_evt']} {rappel['metier']} : {rappel['commentaire']}",
+         'id': rappel['id'], 'status': rappel['status'], 'heure': rappel['heure'],
+         'metier': rappel['metier'], 'type_element': 'Rappel'}
+        for rappel in get_rappels_recurrences(driver, aujourdhui, aujourdhui, NEO4J_DB)
+    ]
+    return pd.DataFrame(data)
 
-        
+def get_rendez_vous_jour(driver, NEO4J_DB="neo4j"):
+    """
+    Returns:
+        tuple: (rendez-vous du jour, notes et rappels du jour) en DataFrames.
+    """
+    df_rdv = get_rdv_jour(driver, NEO4J_DB)
+    df_service = pd.concat([get_notes_service_jour(driver, NEO4J_DB),
+                            get_rappels_jour(driver, NEO4J_DB)], ignore_index=True)
     return df_rdv,df_service
 
 def ajouter_note_persistante(driver,note,service='Infirmière', metier='Autre',NEO4J_DB="neo4j"):
@@ -118,6 +208,13 @@ def ajouter_note_persistante(driver,note,service='Infirmière', metier='Autre',N
         """
         session.run(cypher_query,  contenu=note,metier=metier,service=service)
 
+REQUETE_AJOUT_NOTE = """
+    Match (n:Service {nom:$service})
+    match (m:Categorie{metier:$metier})
+    CREATE (n)-[r:Note {date:date($date),heure:$heure, commentaire:$contenu, status:1, create_date:datetime()}]->(m)
+"""
+
+
 def ajout_note(driver,note, date_note, heure_note, service='Infirmière',metier='Autre', NEO4J_DB="neo4j"):
     """
     Ajoute une note à la base de données Neo4j.
@@ -129,13 +226,9 @@ def ajout_note(driver,note, date_note, heure_note, service='Infirmière',metier=
     """
     #date_heure = datetime.fromisoformat(f"{date_note}T{heure_note}")
     with driver.session(database=NEO4J_DB) as session:
-        cypher_query = """
-        Match (n:Service {nom:$service})
-        match (m:Categorie{metier:$metier})
-        CREATE (n)-[r:Note {date:date($date),heure:$heure, commentaire:$contenu, status:1, create_date:datetime()}]->(m)
-        """
-        session.run(cypher_query, date=date_note, heure=heure_note, contenu=note,metier=metier,service=service)
+        session.run(REQUETE_AJOUT_NOTE, date=date_note, heure=heure_note, contenu=note,metier=metier,service=service)
 
+@en_cache(GROUPE_REFERENTIEL, TTL_REFERENTIEL)
 def get_medecins(driver, NEO4J_DB="neo4j"):
 
     """
@@ -157,17 +250,11 @@ def get_medecins(driver, NEO4J_DB="neo4j"):
     return medecins
 
 def get_next_id(driver, NEO4J_DB="neo4j"):
-    with driver.session(database=NEO4J_DB) as session:
-        cypher_query = """
-        MATCH ()-[rel:Rdv]-()
-        RETURN coalesce(max(rel.id_chain), 0) + 1 AS next_id  
-
-        """
-        session.run(
-            cypher_query
-        )
-        result = session.run(cypher_query).single()
-        return result["next_id"] if result else 1
+    """
+    Retourne un nouvel identifiant de chaîne de rendez-vous (id_chain),
+    tiré de la séquence 'rdv_chain'.
+    """
+    return _ALLOCATEUR_CHAINE.suivant(driver, NEO4J_DB)
 
 
 def extract_form_data(form):
@@ -191,6 +278,8 @@ def extract_form_data(form):
             - colonnes_table (dict): Détails des colonnes
             supplémentaires du formulaire,
               avec clé indice et valeurs [nom_colonne, unité, nombre, pk].
+            - fin (bool): False pour une récurrence sans date de fin.
+            - regle (dict | None): Règle de la récurrence sans date de fin.
     """
     recurrence = form.get('fichierCSV', '0')
 
@@ -209,6 +298,7 @@ def extract_form_data(form):
     #rdv_debut = datetime.datetime.combine(date_rdv.date(), heure_rdv) if heure_rdv not in (None, '') else date_rdv
 
     fin=True
+    regle = None
     if recurrence == 'on':
         date_fin = form.get('date_fin', '')
         try:
@@ -217,11 +307,15 @@ def extract_form_data(form):
             #rdv_fin = datetime.datetime.combine(date_fin.date() , heure_rdv) if heure_rdv not in (None, '') else date_fin
             
         except :
-            rdv_fin = rdv_debut + datetime.timedelta(days=365)  # Si pas de date fin, on prend un an par défaut
             fin=False
         type_recurrence = form.get('recurrence')
 
-        if type_recurrence == 'mois':
+        if not fin:
+            # sans date de fin, on ne stocke que la regle : les occurrences
+            # sont calculees a la lecture (cf. app.services.recurrences)
+            regle = regle_depuis_formulaire(form, type_recurrence, rdv_debut)
+            date_rdv_list = []
+        elif type_recurrence == 'mois':
             date_rdv_list = generate_smart_weekday_recurrence(rdv_debut,
                                                               rdv_fin)
         elif type_recurrence == 'jourSpec':
@@ -263,10 +357,226 @@ def extract_form_data(form):
         'service': service,
         'pk': pk,
         'medecin': medecin,
-        'fin': fin
+        'fin': fin,
+        'regle': regle
     }
 
 
+def _separer_date_heure(rdv):
+    """
+    Sépare une occurrence de rendez-vous en partie date et partie heure.
+
+    Returns:
+        tuple: (date, time ou None si le rendez-vous n'a pas d'heure).
+    """
+    if isinstance(rdv, datetime.datetime):
+        return rdv.date(), rdv.time()
+    return rdv, None
+
+
+def _lignes_rendez_vous(data, individu_pks):
+    """
+    Construit la liste des paramètres d'un lot de rendez-vous :
+    une ligne par résident et par occurrence.
+    """
+    lignes = []
+    for individu_pk in individu_pks:
+        for rdv in data['date_rdv_list']:
+            date_part, time_part = _separer_date_heure(rdv)
+            rappels = [
+                {
+                    'date': date_part - datetime.timedelta(days=int(rappel_item[2])),
+                    'commentaire': rappel_item[0]
+                } for rappel_item in data['colonnes_table'].values()
+            ]
+            lignes.append({
+                'pk': individu_pk,
+                'date': date_part,
+                'heure': time_part,
+                'rappels': rappels
+            })
+    return lignes
+
+
+REQUETE_CREER_RDV = """
+    UNWIND $lignes AS ligne
+    MATCH (n:Resident {pk: ligne.pk})
+    MATCH (m:Categorie {metier: $metier})
+    CREATE (n)-[r:Rdv {
+        date: date(ligne.date),
+        heure: localtime(ligne.heure),
+        debut: localdatetime({date: date(ligne.date), time: coalesce(localtime(ligne.heure), localtime('00:00'))}),
+        transport: $transport,
+        lieu: $lieu,
+        commentaire: $commentaire,
+        responsable: $responsable,
+        medecin: $medecin,
+        create_date: datetime(),
+        id_chain: $next_id,
+        piece_jointe: $attachment
+    }]->(m)
+    // les rappels sont crees avec le rendez-vous : id_rdv vient directement de r
+    FOREACH (rappel IN ligne.rappels |
+        CREATE (n)-[:Rappel {
+            date: date(rappel.date),
+            date_evt: r.date,
+            heure: r.heure,
+            status: 1,
+            rdv: $metier,
+            lieu: $lieu,
+            transport: $transport,
+            commentaire: rappel.commentaire,
+            create_date: datetime(),
+            id_chain: $next_id,
+            piece_jointe: $attachment,
+            id_rdv: elementId(r)
+        }]->(m)
+    )
+    RETURN count(r) AS nb
+"""
+
+
+def _creer_rendez_vous_tx(tx, lignes, **params):
+    nb = tx.run(REQUETE_CREER_RDV, lignes=lignes, **params).single()['nb']
+    if nb != len(lignes):
+        # on leve une exception pour annuler la transaction : pas de chaine a moitie creee
+        raise ValueError(f"{nb} rendez-vous créés sur {len(lignes)} attendus "
+                         "(résident ou catégorie introuvable)")
+    return nb
+
+
+def insert_rendez_vous_bulk(driver, data, individu_pks, next_id, NEO4J_DB="neo4j"):
+    """
+    Insère en une seule transaction toutes les occurrences d'un rendez-vous
+    pour tous les résidents concernés, ainsi que leurs rappels (un seul
+    UNWIND, rejoué automatiquement par le driver en cas d'erreur transitoire).
+
+    Args:
+        data (dict): Dictionnaire issu de extract_form_data.
+        individu_pks (list[str]): pk des résidents concernés.
+        next_id (int): Identifiant de la chaîne de rendez-vous.
+
+    Returns:
+        int: Nombre de rendez-vous créés.
+
+    Raises:
+        ValueError: si une ligne n'a pas pu être créée, auquel cas
+        rien n'est écrit.
+    """
+    lignes = _lignes_rendez_vous(data, individu_pks)
+    if not lignes:
+        return 0
+    with driver.session(database=NEO4J_DB) as session:
+        return session.execute_write(
+            _creer_rendez_vous_tx,
+            lignes,
+            commentaire=data['commentaire'],
+            metier=data['metier'],
+            transport=data['transport'],
+            lieu=data['lieu'],
+            responsable=data['service'],
+            medecin=data['medecin'],
+            attachment=data.get('uploaded', ''),
+            next_id=next_id
+        )
+
+
+def _normaliser_surcharges(champs):
+    # surcharge vide -> None : la propriete est retiree et l'attribut du resident s'applique
+    return {cle: (None if cle in CHAMPS_RESIDENT_RDV and valeur in ('', None) else valeur)
+            for cle, valeur in champs.items()}
+
+
+def surcharger_rdv(driver, id_rdv, surcharges, NEO4J_DB="neo4j"):
+    """
+    Fixe (ou retire, si vides) les attributs de CHAMPS_RESIDENT_RDV propres
+    à un seul rendez-vous ; les autres rendez-vous gardent ceux du résident.
+
+    Args:
+        id_rdv (str): elementId du Rdv ou identifiant d'occurrence de récurrence.
+        surcharges (dict): ex. {'oxygen': '1'}.
+
+    Returns:
+        bool: False si le rendez-vous n'existe pas (ou si l'occurrence a
+        déjà été modifiée).
+
+    Raises:
+        ValueError: Attribut non surchargeable.
+    """
+    inconnus = set(surcharges) - set(CHAMPS_RESIDENT_RDV)
+    if inconnus:
+        raise ValueError(f"Attributs non surchargeables : {', '.join(sorted(inconnus))}")
+    surcharges = _normaliser_surcharges(surcharges)
+    if est_id_occurrence(id_rdv):
+        return modifier_occurrence(driver, id_rdv, surcharges, NEO4J_DB) is not None
+    with driver.session(database=NEO4J_DB) as session:
+        nb = session.execute_write(lambda tx: tx.run("""
+            MATCH ()-[r:Rdv]->()
+            WHERE elementId(r) = $id_rdv
+            SET r += $surcharges
+            RETURN count(r) AS nb
+        """, id_rdv=id_rdv, surcharges=surcharges).single()['nb'])
+    if nb:
+        invalider_rdv(driver, NEO4J_DB)
+    return nb > 0
+
+
+def requete_modifier_chaine(taille_lot=TAILLE_LOT_CHAINE):
+    return f"""
+    MATCH ()-[r:Rdv]->()
+    WHERE r.id_chain = $id_chain AND r.date >= date($date)
+    CALL {{
+        WITH r
+        SET r += $patch, r.maj_date = datetime()
+        SET r.heure = CASE WHEN $maj_heure THEN localtime($heure) ELSE r.heure END
+        SET r.debut = localdatetime({{date: r.date, time: coalesce(r.heure, localtime('00:00'))}})
+        WITH r
+        MATCH ()-[s:Rappel]->()
+        WHERE s.id_rdv = elementId(r)
+        SET s += $patch_rappel, s.heure = r.heure
+    }} IN TRANSACTIONS OF {int(taille_lot)} ROWS
+    RETURN count(r) AS nb
+"""
+
+
+def modifier_chaine(driver, id_chain, date_iso, modifications,
+                    taille_lot=TAILLE_LOT_CHAINE, NEO4J_DB="neo4j"):
+    """
+    Modifie tous les rendez-vous d'une chaîne à partir de `date_iso`
+    (incluse), leurs rappels et les récurrences de la chaîne, en une seule
+    requête validée par lots de `taille_lot` rendez-vous.
+
+    Args:
+        id_chain (int): Identifiant de la chaîne.
+        date_iso (str): Date de début AAAA-MM-JJ.
+        modifications (dict): Propriétés de CHAMPS_CHAINE à remplacer
+            ('heure' en HH:MM, vide pour retirer l'heure ; une surcharge
+            de CHAMPS_RESIDENT_RDV vide est retirée).
+
+    Returns:
+        dict: Nombre de Rdv et de règles de récurrence modifiés.
+
+    Raises:
+        ValueError: Propriété non modifiable.
+    """
+    inconnus = set(modifications) - set(CHAMPS_CHAINE)
+    if inconnus:
+        raise ValueError(f"Propriétés non modifiables : {', '.join(sorted(inconnus))}")
+    if modifications.get('heure'):
+        datetime.time.fromisoformat(modifications['heure'])  # ValueError avant toute ecriture
+    modifications = _normaliser_surcharges(modifications)
+    patch = {cle: valeur for cle, valeur in modifications.items() if cle != 'heure'}
+    with driver.session(database=NEO4J_DB) as session:
+        # CALL ... IN TRANSACTIONS : transaction implicite, donc session.run
+        nb = session.run(requete_modifier_chaine(taille_lot), id_chain=id_chain, date=date_iso, patch=patch,
+            patch_rappel={cle: valeur for cle, valeur in patch.items() if cle in CHAMPS_RAPPEL_CHAINE},
+            maj_heure='heure' in modifications,
+            heure=modifications.get('heure') or None).single()['nb']
+    regles = scinder_recurrences(driver, id_chain, date_iso, modifications, NEO4J_DB)
+    invalider_rdv(driver, NEO4J_DB)
+    return {'rdv': nb, 'regles': regles}
+
+
 def insert_rendez_vous(driver,data,individu_pk, next_id, NEO4J_DB="neo4j"):
     """
     Insère un ou plusieurs rendez-vous dans la base Neo4j
@@ -275,61 +585,20 @@ def insert_rendez_vous(driver,data,individu_pk, next_id, NEO4J_DB="neo4j"):
     Args:
         data (dict): Dictionnaire contenant les informations du rendez-vous,
             notamment :
-            - nom (str): Nom du résident.
-            - prenom (str): Prénom du résident.
             - metier (str): Métier/médecin concerné.
             - date_rdv_list (list[datetime]): Liste des dates des rendez-vous.
             - transport (str): Mode de transport.
             - lieu (str): Lieu du rendez-vous.
             - commentaire (str): Commentaire associé.
-            - recurrence (str): Indicateur de récurrence.
-            - colonnes_table (dict): Détails des actions
-              associées au rendez-vous.
+            - colonnes_table (dict): Rappels à créer, avec le nombre
+              de jours avant le rendez-vous.
+
+    Returns:
+        int: Nombre de rendez-vous créés.
     """
-    liste_actions = [x[0] for x in data['colonnes_table'].values()]
-    
-    with driver.session(database=NEO4J_DB) as session:
-        for rdv in data['date_rdv_list']:
-            if isinstance(rdv, datetime.datetime):
-                    date_part = rdv.date()
-                    time_part = rdv.time()
-            elif isinstance(rdv, datetime.date):
-                    date_part = rdv
-                    time_part = None
-            cypher_query = """
-            // Puis utilise next_id dans la création
-            MATCH (n:Resident {pk: $pk})
-            MATCH (m:Categorie {metier: $metier})
-            CREATE (n)-[r:Rdv {
-                date: date($date),
-                heure: localtime($heure),
-                transport: $transport,
-                lieu: $lieu,
-                commentaire: $commentaire,
-                responsable: $responsable,
-                medecin: $medecin,
-                create_date: datetime(),
-                id_chain: $next_id,
-                piece_jointe: $attachment
-            }]->(m)
-            """
-            session.run(
-                cypher_query,
-                date=date_part,
-                heure=time_part,
-                recurrence=data['recurrence'],
-                action=liste_actions,
-                commentaire=data['commentaire'],
-                metier=data['metier'],
-                transport=data['transport'],
-                lieu=data['lieu'],
-                responsable=data['service'],
-                pk= individu_pk,
-                medecin= data['medecin'],
-                attachment=data.get('uploaded',''),
-                next_id=next_id
-            )
+    return insert_rendez_vous_bulk(driver, data, [individu_pk], next_id, NEO4J_DB)
 
+@en_cache(GROUPE_REFERENTIEL, TTL_REFERENTIEL)
 def get_service(driver, NEO4J_DB="neo4j"):
     """
     Récupère la liste des services (médecins) depuis la base Neo4j.
@@ -347,85 +616,6 @@ def get_service(driver, NEO4J_DB="neo4j"):
                 service.append(nom)
     return service
 
-def create_rappels(driver,data,individu_pk, next_id, NEO4J_DB="neo4j"):
-    """
-    Crée des rappels associés aux rendez-vous dans la base Neo4j.
-
-    Args:
-        data (dict): Dictionnaire contenant les informations nécessaires,
-        notamment :
-            - nom (str): Nom du résident.
-            - prenom (str): Prénom du résident.
-            - metier (str): Métier/médecin concerné.
-            - date_rdv_list (list[datetime]): Liste des dates des rendez-vous.
-            - colonnes_table (dict): Détails des rappels à créer,
-              avec le nombre de jours avant le rendez-vous.
-            - transport (str): Mode de transport.
-            - lieu (str): Lieu du rendez-vous.
-    """
-    with driver.session(database=NEO4J_DB) as session:
-        for rdv in data['date_rdv_list']:
-            for rappel_item in data['colonnes_table'].values():
-                #rappel_rdv = rdv - timedelta(days=int(rappel_item[2]))
-                if isinstance(rdv, datetime.datetime):
-                    rappel_date_part = rdv.date() - datetime.timedelta(days=int(rappel_item[2]))
-                    rdv_date_part = rdv.date()
-                    time_part = rdv.time()
-                elif isinstance(rdv, datetime.date):
-                    rappel_date_part = rdv - datetime.timedelta(days=int(rappel_item[2]))
-                    rdv_date_part = rdv
-                    time_part = None
-                commentaire_rappel = rappel_item[0]
-                cypher_query = """
-                MATCH (n:Resident {pk:$pk})-[s:Rdv{date:$date_evt}]-(o:Categorie{metier:$type_rdv})
-                WITH n, o, ID(s) as id_rdv
-                CREATE (n)-[r:Rappel {date:$date_str,
-                                date_evt:$date_evt,
-                                heure:$heure,
-                                status:1,
-                                rdv:$type_rdv,
-                                lieu:$lieu,
-                                transport:$transport,
-                                commentaire:$commentaire,
-                                create_date:datetime(),
-                                id_chain: $next_id,
-                                piece_jointe: $attachment,
-                                id_rdv:id_rdv
-                            }]->(o)
-                """
-                session.run(
-                    cypher_query,
-                    pk=individu_pk,
-                    type_rdv=data['metier'],
-                    date_str=rappel_date_part,
-                    date_evt=rdv_date_part,
-                    heure=time_part,
-                    action=None,
-                    commentaire=commentaire_rappel,
-                    transport=data['transport'],
-                    lieu=data['lieu'],
-                    attachment=data.get('uploaded',''),
-                    next_id=next_id
-                )
-
-def create_rappel_infini(driver, data, individu_pk, next_id, NEO4J_DB="neo4j"):
-    date_fin =data['date_rdv_list'][-1]## on prend la derniere date 
-    pk= individu_pk
-    metier = data['metier']
-
-    with driver.session(database=NEO4J_DB) as session:
-        cypher_query = ("""
-            MATCH (n:Resident {pk:$pk}) 
-            MATCH (m:Categorie {metier: $metier})
-            CREATE (n)-[r:Rappel {date: date($date_fin), 
-                                id_chain: $next_id, 
-                                rdv:$metier,
-                                commentaire:"Fin de la récurrence, recréér un rendez-vous si toujours en vigueur",
-                                create_date:datetime()}]->(m)
-            """
-        )
-        session.run(cypher_query, pk=pk,next_id=next_id,date_fin=date_fin, metier=metier)
-
 def update_resident(driver,resident_id,sexe,etage,chambre,oxygen,diabete,commentaire,deplacement, NEO4J_DB="neo4j"):
     """
     Met à jour les informations d'un résident dans la base Neo4j.
@@ -453,6 +643,9 @@ def update_resident(driver,resident_id,sexe,etage,chambre,oxygen,diabete,comment
             commentaire=commentaire,
             deplacement=deplacement
         )
+    # le detail des rdv affiche les attributs actuels du resident
+    invalider_cache(GROUPE_RESIDENTS)
+    invalider_rdv(driver, NEO4J_DB)
 def get_resident_properties(driver, db_name, pk):
     """
     Récupère les propriétés d'un résident spécifique.
@@ -478,6 +671,19 @@ def get_resident_properties(driver, db_name, pk):
         else:
             return pd.DataFrame()
 
+REQUETE_RDV_RECENTS = """
+    CALL {
+        MATCH (n)-[r:Rdv]->(m)
+        RETURN n, r.date AS date, r.heure AS heure, m, r.create_date AS create_date
+        UNION ALL
+        MATCH (n)-[:Planifie]->(rec:Recurrence)-[:Pour]->(m)
+        RETURN n, rec.debut AS date, rec.heure AS heure, m, rec.create_date AS create_date
+    }
+    RETURN n.nom_affichage as nom_affichage,n.chambre as chambre,date, heure,m.metier as metier order by create_date desc 
+    LIMIT 15
+"""
+
+
 def get_recent_rdv(driver , NEO4J_DB="neo4j"):
     """
     Récupère les rendez-vous récents ajoutés dans la base Neo4j.
@@ -489,12 +695,7 @@ def get_recent_rdv(driver , NEO4J_DB="neo4j"):
     nom_resident = []
     date_heure = []
     with driver.session(database=NEO4J_DB) as session:
-        cypher_query = """
-        MATCH (n)-[r:Rdv]->(m) 
-        RETURN n.nom_affichage as nom_affichage,n.chambre as chambre,r.date as date, r.heure as heure,m.metier as metier order by r.create_date desc 
-        LIMIT 15
-        """
-        neo4j_results = session.run(cypher_query)
+        neo4j_results = session.run(REQUETE_RDV_RECENTS)
         for record in neo4j_results:
             recent_rdv.append(record['metier'])
             nom_resident.append(record['nom_affichage'])
@@ -504,106 +705,93 @@ def get_recent_rdv(driver , NEO4J_DB="neo4j"):
                 date_heure.append(record['date'].to_native().strftime('%d/%m/%Y'))
     return recent_rdv, nom_resident, date_heure
 
-def get_graph(pk,driver):
-    def get_color(value):
-        if value == 'Liquide' or value == 'Dure':
-            return 'red'
-        elif value == 'Mou':
-            return 'orange'
-        elif value == 'Normale' or value == 'Normal':
-            return 'green'
-        else:
-            return 'black'
+JOURS_GRAPHE_SELLES = 28
+ORDRE_MOMENTS = ['nuit', 'matin', 'apres_midi', 'soir']
+PRIORITE_SELLES = {'Liquide': 4, 'Dur': 3, 'Dure': 3, 'Mou': 2, 'Normale': 1, 'Normal': 1}
+COULEURS_SELLES = {'Liquide': 'red', 'Dur': 'red', 'Dure': 'red', 'Mou': 'orange',
+                   'Normale': 'green', 'Normal': 'green'}
 
-    with driver.session(database='neo4j') as session:
-        cypher_query = """
-                    match (n:Resident {pk:$pk})-[r]-(m:Selles) return r.caracteristique, m.date, m.moment_date order by m.date desc
-                    """
-        result=session.run(cypher_query, pk=pk).data()
-    ordre_moment = ['nuit', 'matin', 'apres_midi', 'soir']
-    df=pd.DataFrame(result)
-    print("Liste selles 1 : ", df)
-    df['m.moment_date'] = pd.Categorical(df['m.moment_date'], categories=ordre_moment, ordered=True)
-    df['commentaire'] = df['m.moment_date'].astype(str) + ' : ' + df['r.caracteristique'].astype(str)
-    print("Liste selles 2 : ", df)
-    priorite = {'Liquide': 4, 'Dure':3, 'Mou': 2, 'Normale': 1}
-    df_grouped = (
-        df.groupby('m.date', as_index=False)
-        .agg({
-            'commentaire': lambda x: ' <br>'.join(str(v) for v in x if pd.notna(v) and v != ''),
-            'r.caracteristique': lambda x: (
-                # On garde la valeur avec la plus haute priorité
-                sorted(
-                    [v for v in x if v in priorite],
-                    key=lambda v: priorite[v],
-                    reverse=True
-                )[0] if any(v in priorite for v in x) else None
-            )
-        })
-    )
-    
-    
-    df_grouped['m.date'] = df_grouped['m.date'].apply(
-        lambda d: datetime.date(d.year, d.month, d.day) if hasattr(d, 'year') else d
-    )
-    df_grouped['m.date'] = pd.to_datetime(df_grouped['m.date'])
-    df_grouped = df_grouped.sort_values('m.date', ascending=False)
-    print('########## Date sorted\n', df_grouped['m.date'])
-    full_range = pd.date_range(df_grouped['m.date'].min(), df_grouped['m.date'].max())
-    print('########## Date full range\n', df_grouped['m.date'])
-    df_full = pd.DataFrame({'m.date': full_range})
-    df_full = df_full.merge(df_grouped, on='m.date', how='left')
-    df_full = df_full.fillna("Non-renseigné")
-    df_full['info'] = np.where(
-    (df_full['commentaire'].str.contains('Dur', na=False)) & 
-    (df_full['commentaire'].str.contains('Liquide ', na=False)),
-    'D+L',
-    np.where(
-        df_full['commentaire'].str.contains('Dur', na=False),
-        'D',
-        np.where(
-            df_full['commentaire'].str.contains('Liquide', na=False),
-            'L',
-            ''
-        )
-    )
-)
-    df_full=df_full.sort_values('m.date', ascending=False)
-    print('########## Full DF', df_full)
+REQUETE_HISTORIQUE_SELLES = """
+    MATCH (m:Selles {pk: $pk})
+    WHERE m.date > date($jour) - duration({days: $nb_jours}) AND m.date <= date($jour)
+    RETURN m.date AS date, m.moment_date AS moment, m.caracteristique AS caracteristique
+"""
+
+
+@en_cache(GROUPE_VERSION_SELLES, TTL_VERSION_SELLES)
+def get_selles_version(driver, NEO4J_DB='neo4j'):
+    """
+    Version courante des selles, incrémentée à chaque enregistrement
+    (lue en base au plus une fois par CACHE_TTL_VERSION_SELLES secondes).
+    """
+    return valeur_sequence(driver, SEQUENCE_SELLES, NEO4J_DB)
 
-    dates_formatted = [d.strftime('%d/%m')+'<br>'+ e for d,e in zip(df_full['m.date'],df_full['info'])]
-    texts_hover = [f"{d.strftime('%d/%m/%Y')}<br>{c or 'Aucune donnée'}"
-                for d, c in zip(df_full['m.date'], df_full['commentaire'])]
-    colors = [get_color(v) for v in df_full['r.caracteristique']]
+@en_cache(groupe_selles, TTL_SELLES)
+def get_historique_selles(driver, pk, jour, version, NEO4J_DB='neo4j'):
+    """
+    Historique compact des selles d'un résident sur les 28 jours finissant
+    à `jour` (le plus récent en premier), mis en cache par résident, par
+    jour et par version des selles (get_selles_version) : une saisie faite
+    par un autre worker change la version, donc la clé du cache.
 
+    Returns:
+        dict: listes 'couleurs', 'textes' (date + D/L affichés dans la case)
+        et 'survols' (détail par moment), une entrée par jour.
+    """
+    with driver.session(database=NEO4J_DB) as session:
+        result = session.run(REQUETE_HISTORIQUE_SELLES, pk=pk, jour=jour, nb_jours=JOURS_GRAPHE_SELLES)
+        par_jour = {}
+        for record in result:
+            par_jour.setdefault(record['date'].to_native(), []).append(
+                (record['moment'], record['caracteristique']))
+
+    couleurs, textes, survols = [], [], []
+    for i in range(JOURS_GRAPHE_SELLES):
+        d = jour - datetime.timedelta(days=i)
+        valeurs = sorted(par_jour.get(d, []),
+                         key=lambda v: ORDRE_MOMENTS.index(v[0]) if v[0] in ORDRE_MOMENTS else len(ORDRE_MOMENTS))
+        commentaire = ' <br>'.join(f"{moment} : {car}" for moment, car in valeurs if car)
+        caracteristiques = [car for _, car in valeurs]
+        dominante = max((car for car in caracteristiques if car in PRIORITE_SELLES),
+                        key=PRIORITE_SELLES.get, default=None)
+        dur = any(car in ('Dur', 'Dure') for car in caracteristiques)
+        liquide = 'Liquide' in caracteristiques
+        info = 'D+L' if dur and liquide else 'D' if dur else 'L' if liquide else ''
+        couleurs.append(COULEURS_SELLES.get(dominante, 'black'))
+        textes.append(d.strftime('%d/%m') + '<br>' + info)
+        survols.append(f"{d.strftime('%d/%m/%Y')}<br>{commentaire or 'Non-renseigné'}")
+    return {'couleurs': couleurs, 'textes': textes, 'survols': survols}
+
+def get_graph(pk,driver):
+    """
+    Grille 4 x 7 des 28 derniers jours de selles d'un résident,
+    en une seule trace (une case par jour, le plus récent en haut à gauche).
+
+    Returns:
+        go.Figure
+    """
+    historique = get_historique_selles(driver, pk, datetime.date.today(),
+                                       get_selles_version(driver))
     rows, cols = 4, 7
-    grid_colors = [colors[i*cols:(i+1)*cols] for i in range(rows)]
-    grid_texts_hover = [texts_hover[i*cols:(i+1)*cols] for i in range(rows)]
-    grid_dates = [dates_formatted[i*cols:(i+1)*cols] for i in range(rows)]
-
-    # --- Création du Heatmap ---
-    fig = go.Figure()
-
-    for i in range(rows):
-        for j in range(cols):
-            idx = i * cols + j
-            if idx < len(df_full):
-                fig.add_trace(go.Scatter(
-                    x=[j],
-                    y=[rows - 1 - i],
-                    mode="markers+text",  # ajoute le texte sur le marqueur
-                    marker=dict(
-                        size=70,
-                        color=grid_colors[i][j],
-                        line=dict(color="white", width=2)
-                    ),
-                    text=[grid_dates[i][j]],         # texte affiché sur la case
-                    textposition="middle center",    # centré dans le cercle
-                    textfont=dict(color="white", size=12),
-                    hovertext=grid_texts_hover[i][j],
-                    hoverinfo="text",
-                    showlegend=False
-                ))
+    cases = np.arange(JOURS_GRAPHE_SELLES)
+
+    fig = go.Figure(go.Scatter(
+        # listes simples : plotly-latest (1.x) ne lit pas les tableaux binaires
+        x=(cases % cols).tolist(),
+        y=(rows - 1 - cases // cols).tolist(),
+        mode="markers+text",  # ajoute le texte sur le marqueur
+        marker=dict(
+            size=70,
+            color=historique['couleurs'],
+            line=dict(color="white", width=2)
+        ),
+        text=historique['textes'],       # texte affiché sur la case
+        textposition="middle center",    # centré dans le cercle
+        textfont=dict(color="white", size=12),
+        hovertext=historique['survols'],
+        hoverinfo="text",
+        showlegend=False
+    ))
 
     # --- Mise en forme ---
     fig.update_layout(
@@ -616,6 +804,13 @@ def get_graph(pk,driver):
     )
     return fig
 
+REQUETE_RDV_RESIDENT = """
+    MATCH (n:Resident {pk:$pk})-[r:Rdv]->(m)
+    RETURN n.nom, n.prenom, r.date, r.heure, m.metier, r.commentaire, r.transport , r.medecin, r.lieu, r.piece_jointe
+    ORDER BY r.debut ASC
+"""
+
+
 def get_rendez_vous(driver, db_name, pk):
     """
     Récupère la liste des rendez-vous d'un résident.
@@ -630,13 +825,8 @@ def get_rendez_vous(driver, db_name, pk):
         Liste de dictionnaires avec les infos des rendez-vous.
     """
     with driver.session(database=db_name) as session:
-        cypher_query = ("""
-            MATCH (n:Resident {pk:$pk})-[r:Rdv]->(m) 
-            RETURN n.nom, n.prenom, r.date, r.heure, m.metier, r.commentaire, r.transport , r.medecin, r.lieu, r.piece_jointe
-            ORDER BY r.date ASC"""
-        )
-        results = session.run(cypher_query, pk=pk)
-        return [
+        results = session.run(REQUETE_RDV_RESIDENT, pk=pk)
+        rdv = [
             {
                 'Date_Fr': record['r.date'].to_native().strftime('%d/%m/%Y'),
                 'Date': record['r.date'].to_native().strftime('%Y-%m-%d'),
@@ -649,9 +839,26 @@ def get_rendez_vous(driver, db_name, pk):
                 'Fichier': record['r.piece_jointe']
             } for record in results
         ]
+    rdv += [
+        {
+            'Date_Fr': occ['date'].strftime('%d/%m/%Y'),
+            'Date': occ['date'].strftime('%Y-%m-%d'),
+            'Heure': occ['heure'].strftime('%H:%M') if occ['heure'] else '--:--',
+            'Rendez-vous': occ['metier'],
+            'Transport': occ['transport'],
+            'Note': occ['commentaire'],
+            'Medecin': occ['medecin'],
+            'Lieu': occ['lieu'],
+            'Fichier': occ['piece_jointe']
+        } for occ in get_occurrences_recurrences(
+            driver, datetime.date.min, datetime.date.today() + HORIZON_RECURRENCES,
+            pk=pk, NEO4J_DB=db_name)
+    ]
+    return sorted(rdv, key=lambda x: x['Date'])
 
 
 
+@en_cache(GROUPE_REFERENTIEL, TTL_REFERENTIEL)
 def get_rdv_types(driver, db_name):
     """
     Récupère la liste des types de rendez-vous (métiers).
@@ -674,28 +881,55 @@ def get_rdv_types(driver, db_name):
     return rdv_types
 
 
-def get_all_rdv_events(driver, db_name):
+# une branche par type de relation pour que chacune s'appuie sur son index de date
+REQUETE_EVENEMENTS = """
+    CALL {
+        MATCH (n:Resident)-[r:Rdv]->(m)
+        WHERE r.date >= date($debut) AND r.date <= date($fin)
+        RETURN n, r, m
+        UNION ALL
+        MATCH (n:Resident)-[r:Rappel]->(m)
+        WHERE r.date >= date($debut) AND r.date <= date($fin)
+        RETURN n, r, m
+    }
+    WITH n, r, m
+    WHERE ($etages IS NULL OR toString(n.etage) IN $etages)
+      AND ($types IS NULL OR m.metier IN $types)
+      AND ($services IS NULL OR coalesce(r.responsable, 'Tous') IN $services)
+    RETURN n.nom, n.prenom, n.etage, n.chambre, type(r), r.date, r.heure, m.metier,
+    r.commentaire, r.rdv, elementId(r) as id_rdv_one, r.id_chain AS id_chain
+    ORDER BY r.date, r.heure
+"""
+
+
+def get_all_rdv_events(driver, db_name, debut=None, fin=None,
+                       etages=None, types=None, services=None):
     """
-    Récupère tous les événements de rendez-vous avec leurs propriétés.
+    Récupère les événements (rendez-vous et rappels) d'une fenêtre de dates.
 
     Args:
         driver: Objet Neo4j driver.
         db_name (str): Nom de la base Neo4j.
+        debut (date, optional): Début de la fenêtre (aujourd'hui par défaut).
+        fin (date, optional): Fin de la fenêtre, incluse (par défaut
+            aujourd'hui + HORIZON_RECURRENCES).
+        etages (list[str], optional): Etages à garder.
+        types (list[str], optional): Métiers (types de rendez-vous) à garder.
+        services (list[str], optional): Services responsables à garder
+            (les événements visibles par 'Tous' sont toujours gardés).
 
     Returns:
         list[dict]: Liste de dictionnaires représentant chaque événement.
     """
+    debut = debut or datetime.date.today()
+    fin = fin or debut + HORIZON_RECURRENCES
+    filtres = {
+        'etages': [str(e) for e in etages] if etages else None,
+        'types': list(types) if types else None,
+        'services': list(services) + ['Tous'] if services else None
+    }
     with driver.session(database=db_name) as session:
-        cypher_query = """
-        MATCH (n:Resident)-[r]->(m)
-        WHERE r.date >= date()
-        RETURN n.nom, n.prenom, n.etage, n.chambre, type(r), r.date, r.heure, m.metier,
-        r.commentaire, r.rdv, ID(r) as id_rdv_one, r.id_chain AS id_chain
-        
-        ORDER BY toString(r.date) ASC
-        """
-        ## on doit order by toString() car sans le cast, il differencie les dates et les datetime etfait son tr séparémment
-        results = session.run(cypher_query)
+        results = session.run(REQUETE_EVENEMENTS, debut=debut, fin=fin, **filtres)
         events = [
             {
                 'Nom': record['n.nom'] + ' ' + record['n.prenom'],
@@ -711,7 +945,53 @@ def get_all_rdv_events(driver, db_name):
             }
             for record in results
         ]
-    return events
+
+    def garder(occ):
+        return ((filtres['etages'] is None or str(occ['etage']) in filtres['etages'])
+                and (filtres['types'] is None or occ['metier'] in filtres['types'])
+                and (filtres['services'] is None
+                     or (occ.get('responsable') or 'Tous') in filtres['services']))
+
+    for occ in get_occurrences_recurrences(driver, debut, fin, NEO4J_DB=db_name):
+        if garder(occ):
+            events.append(_evenement_virtuel(occ, 'Rdv', occ['metier']))
+    for rappel in get_rappels_recurrences(driver, debut, fin, db_name):
+        if garder({**rappel, 'responsable': None}):
+            events.append(_evenement_virtuel(rappel, 'Rappel', 'Rappel : ' + rappel['metier']))
+    return sorted(events, key=lambda x: x['Date'])
+
+
+def evenement_calendrier(event):
+    """
+    Met un événement de get_all_rdv_events au format attendu par FullCalendar.
+    """
+    return {
+        "title": event["Nom"],
+        "start": event["Date"],
+        "description": f"{event['Rendez-vous']} ({event['Type_Evt']}) : {event['Note']}",
+        "Etage": event['Etage']
+    }
+
+
+def _evenement_virtuel(occ, type_evt, libelle):
+    """Met une occurrence de récurrence au format de get_all_rdv_events."""
+    date_fr = occ['date'].strftime('%d/%m/%Y')
+    date_iso = occ['date'].strftime('%Y-%m-%d')
+    if occ['heure']:
+        date_fr += ' ' + occ['heure'].strftime('%H:%M')
+        date_iso += 'T' + occ['heure'].strftime('%H:%M:%S')
+    return {
+        'Nom': occ['nom'] + ' ' + occ['prenom'],
+        'Etage': occ['etage'],
+        'Chambre': occ['chambre'],
+        'Date_Fr': date_fr,
+        'Date': date_iso,
+        'Rendez-vous': libelle,
+        'Note': occ['commentaire'],
+        'Type_Evt': type_evt,
+        'ID_one': occ['id'],
+        'ID_chain': occ['id_chain']
+    }
 
 
 def add_resident_to_db(driver, NEO4J_DB, nom, prenom, commentaire, sexe, etage,
@@ -750,9 +1030,19 @@ def add_resident_to_db(driver, NEO4J_DB, nom, prenom, commentaire, sexe, etage,
             pk=nom.upper().replace(' ', '-') + '_' + prenom.capitalize().replace(' ', '-') + '_' + naissance,
             nom_affichage=nom.upper() + ' ' + prenom.capitalize()
         )
+    invalider_cache(GROUPE_RESIDENTS)
+
 
 def enregistrer_valeur_selles(driver,data,NEO4J_DB='neo4j'): # on n'enregistre pas les données "Absence"
- 
+    """
+    Enregistre les selles saisies dans le popup : un noeud Selles par
+    résident, jour et moment (clé unique pk, date, moment_date), créé ou
+    mis à jour. Rejouer la même saisie ne crée donc rien de plus.
+
+    Args:
+        data (dict): {nom complet: {pk, nuit, matin, apres_midi, commentaire}} ;
+            une clé 'date' (AAAA-MM-JJ) optionnelle remplace la date du jour.
+    """
     data_f = []
     for nom_complet in data.keys():
         
@@ -764,24 +1054,78 @@ def enregistrer_valeur_selles(driver,data,NEO4J_DB='neo4j'): # on n'enregistre p
                     "prenom": prenom,
                     "moment": moment,
                     "caracteristique": data[nom_complet][moment],
-                    "note": data[nom_complet].get("note", ""),
-                    'pk': data[nom_complet].get("pk", "")
+                    "note": data[nom_complet].get("commentaire", data[nom_complet].get("note", "")),
+                    'pk': data[nom_complet].get("pk", ""),
+                    'date': data[nom_complet].get("date") or datetime.date.today().isoformat()
                 }) 
 
     with driver.session(database=NEO4J_DB) as session:
-        session.run(
-            """
-            UNWIND $data AS row
-            MATCH (n:Resident {pk: row.pk})
-            MERGE (m:Selles {
-                date: date(),
-                moment_date: row.moment,
-                commentaire: row.note
-            })
-            MERGE (m)-[r:Par ]->(n) SET r.caracteristique = row.caracteristique
-            """,
-            data=data_f
-        )
+        session.execute_write(_enregistrer_selles_tx, data_f)
+    invalider_cache(GROUPE_VERSION_SELLES, *{groupe_selles(row['pk']) for row in data_f})
+
+REQUETE_ENREGISTRER_SELLES = """
+    UNWIND $data AS row
+    MATCH (n:Resident {pk: row.pk})
+    MERGE (m:Selles {pk: row.pk, date: date(row.date), moment_date: row.moment})
+    ON CREATE SET m.create_date = datetime()
+    SET m.caracteristique = row.caracteristique,
+        m.commentaire = row.note,
+        m.maj_date = datetime()
+    MERGE (m)-[:Par]->(n)
+"""
+
+
+def _enregistrer_selles_tx(tx, data_f):
+    tx.run(REQUETE_ENREGISTRER_SELLES, data=data_f)
+    # les historiques en cache dans les autres workers portent l'ancienne version
+    incrementer_sequence(tx, SEQUENCE_SELLES)
+    jours = {}
+    for row in data_f:
+        jours.setdefault(row['date'], set()).add(row['pk'])
+    for jour, pks in jours.items():
+        maj_derniere_selle(tx, list(pks), datetime.date.fromisoformat(jour))
+
+def maj_derniere_selle(tx, pks, jour):
+    """
+    Tient à jour, dans la transaction d'enregistrement, l'état dénormalisé
+    des selles de chaque résident concerné :
+    derniere_selle_date (dernier jour avec une selle autre que 'Absence')
+    et selles_7j (jours avec selle sur les 7 derniers jours, dont la taille
+    sert de compteur glissant).
+
+    Args:
+        tx: Transaction Neo4j.
+        pks (list[str]): Résidents dont les selles du `jour` viennent d'être écrites.
+        jour (date): Jour enregistré.
+    """
+    tx.run(
+        """
+        UNWIND $pks AS pk
+        MATCH (n:Resident {pk: pk})
+        OPTIONAL MATCH (m:Selles {pk: pk, date: date($jour)})
+        WHERE m.caracteristique <> 'Absence'
+        WITH n, count(m) > 0 AS selle_du_jour
+        WITH n, selle_du_jour,
+             [d IN coalesce(n.selles_7j, []) WHERE d > date() - duration('P7D') AND d <> date($jour)] AS recentes
+        SET n.selles_7j = CASE WHEN selle_du_jour AND date($jour) > date() - duration('P7D')
+                               THEN recentes + date($jour) ELSE recentes END,
+            n.derniere_selle_date = CASE
+                WHEN selle_du_jour AND (n.derniere_selle_date IS NULL OR n.derniere_selle_date < date($jour))
+                THEN date($jour) ELSE n.derniere_selle_date END
+        WITH n, selle_du_jour
+        // correction d'une saisie : le jour n'a plus de selle, on recalcule sur l'historique
+        CALL {
+            WITH n, selle_du_jour
+            WITH n WHERE NOT selle_du_jour AND n.derniere_selle_date = date($jour)
+            OPTIONAL MATCH (p:Selles {pk: n.pk})
+            WHERE p.caracteristique <> 'Absence' AND p.date <> date($jour)
+            WITH n, max(p.date) AS precedente
+            SET n.derniere_selle_date = precedente
+        }
+        """,
+        pks=pks, jour=jour
+    )
+
 def maj_last_check_selles(driver, data, NEO4J_DB='neo4j'): 
 
     data_f = []
@@ -790,27 +1134,155 @@ def maj_last_check_selles(driver, data, NEO4J_DB='neo4j'):
         
         data_f.append({"nom": nom, "prenom": prenom, "pk":data[noms_complet]['pk'], "liste":['nuit' if data[noms_complet]['nuit']!='--' else None,'matin' if data[noms_complet]['matin']!='--' else None,'apres_midi' if data[noms_complet]['apres_midi']!='--' else None ]}) if any([valeur !='--' for valeur in (data[noms_complet]['nuit'],data[noms_complet]['matin'],data[noms_complet]['apres_midi']) ]) else None
 
+    for row in data_f:
+        row['date'] = datetime.date.today().isoformat()
     with driver.session(database=NEO4J_DB) as session:
-        session.run(
-            """
-            UNWIND $data AS row
-            MATCH (n:Resident {pk:row.pk})
-            SET n.derniere_verif_selles = date()
-            SET n.derniere_verif_selles_nuit = CASE 
-                WHEN 'nuit' in row.liste  THEN date()
-                ELSE n.derniere_verif_selles_nuit
-            END,
-            n.derniere_verif_selles_matin = CASE
-                WHEN 'matin' in row.liste THEN date()
-                ELSE n.derniere_verif_selles_matin
-            END,
-            n.derniere_verif_selles_apres_midi = CASE
-                WHEN 'apres_midi' in row.liste THEN date()
-                ELSE n.derniere_verif_selles_apres_midi
-            END
-            """,
-            data=data_f
-        )# derniere_verif_selles correspond a la derniere fois qu'on a mis a jour les selles pour la personne, mais il peut ne pas y avoir de selles enregistrées si on a verifié mais qu'elle n'a pas été a la selle ce jour, cela sert juste a verifer les oubli d'enregistrement de la part des personnes en charge
+        session.execute_write(_maj_last_check_tx, data_f)
+    # derniere_verif_selles correspond a la derniere fois qu'on a mis a jour les selles pour la personne, mais il peut ne pas y avoir de selles enregistrées si on a verifié mais qu'elle n'a pas été a la selle ce jour, cela sert juste a verifer les oubli d'enregistrement de la part des personnes en charge
+
+def _maj_last_check_tx(tx, data_f):
+    # une saisie differee (hors connexion) ne fait jamais reculer les dates de verification
+    tx.run(
+        """
+        UNWIND $data AS row
+        MATCH (n:Resident {pk:row.pk})
+        WITH n, row, date(row.date) AS jour
+        SET n.derniere_verif_selles = CASE
+            WHEN n.derniere_verif_selles IS NULL OR n.derniere_verif_selles < jour THEN jour
+            ELSE n.derniere_verif_selles
+        END
+        SET n.derniere_verif_selles_nuit = CASE 
+            WHEN 'nuit' in row.liste AND (n.derniere_verif_selles_nuit IS NULL OR n.derniere_verif_selles_nuit < jour) THEN jour
+            ELSE n.derniere_verif_selles_nuit
+        END,
+        n.derniere_verif_selles_matin = CASE
+            WHEN 'matin' in row.liste AND (n.derniere_verif_selles_matin IS NULL OR n.derniere_verif_selles_matin < jour) THEN jour
+            ELSE n.derniere_verif_selles_matin
+        END,
+        n.derniere_verif_selles_apres_midi = CASE
+            WHEN 'apres_midi' in row.liste AND (n.derniere_verif_selles_apres_midi IS NULL OR n.derniere_verif_selles_apres_midi < jour) THEN jour
+            ELSE n.derniere_verif_selles_apres_midi
+        END
+        """,
+        data=data_f
+    )
+
+# duree de conservation des cles d'idempotence des synchronisations
+DUREE_CLES_SYNC = os.getenv("SELLES_DUREE_CLES_SYNC", "P30D")
+
+def _verifier_entree_selles(entree, pks_connus, aujourdhui):
+    """
+    Returns:
+        str | None: Message d'erreur, None si l'entrée est valide.
+    """
+    if entree.get('pk') not in pks_connus:
+        return "Résident inconnu"
+    try:
+        jour = datetime.date.fromisoformat(str(entree.get('date')))
+    except ValueError:
+        return "Date invalide"
+    if jour > aujourdhui:
+        return "Date dans le futur"
+    for moment in MOMENTS_SELLES:
+        if entree.get(moment, '--') not in OPTIONS_SELLES:
+            return f"Valeur invalide pour {moment}"
+    return None
+
+def _synchroniser_selles_tx(tx, entrees):
+    resultats = [None] * len(entrees)
+
+    # cles d'idempotence : le MERGE sur la contrainte unique verrouille la cle,
+    # deux envois simultanes du meme lot ne s'appliquent donc qu'une fois
+    cles = [e['cle'] for e in entrees if e.get('cle')]
+    deja_vues = {}
+    if cles:
+        for record in tx.run("""
+            UNWIND $cles AS cle
+            MERGE (k:SyncSelles {cle: cle})
+            ON CREATE SET k.date_sync = datetime(), k._nouvelle = true
+            WITH k, k._nouvelle IS NULL AS existante
+            REMOVE k._nouvelle
+            RETURN k.cle AS cle, existante, k.statut AS statut, k.message AS message
+        """, cles=list(dict.fromkeys(cles))):
+            if record['existante']:
+                deja_vues[record['cle']] = record
+
+    pks_connus = {record['pk'] for record in tx.run(
+        "MATCH (n:Resident) WHERE n.pk IN $pks RETURN n.pk AS pk",
+        pks=list({e.get('pk') for e in entrees}))}
+    aujourdhui = datetime.date.today()
+
+    data_f, verifications, traitees = [], [], {}
+    for i, entree in enumerate(entrees):
+        cle = entree.get('cle')
+        if cle in deja_vues:
+            precedent = deja_vues[cle]
+            resultats[i] = {'cle': cle, 'statut': 'doublon',
+                            'resultat_initial': precedent['statut'], 'message': precedent['message']}
+            continue
+        if cle in traitees:
+            # meme cle plus haut dans le lot : on renvoie le resultat de la premiere
+            premiere = traitees[cle]
+            resultats[i] = {'cle': cle, 'statut': 'doublon',
+                            'resultat_initial': premiere['statut'], 'message': premiere['message']}
+            continue
+        erreur = _verifier_entree_selles(entree, pks_connus, aujourdhui)
+        resultats[i] = {'cle': cle, 'statut': 'erreur' if erreur else 'applique', 'message': erreur}
+        if cle:
+            traitees[cle] = resultats[i]
+        if erreur:
+            continue
+        jour = datetime.date.fromisoformat(str(entree['date'])).isoformat()
+        moments = [moment for moment in MOMENTS_SELLES if entree.get(moment, '--') != '--']
+        for moment in moments:
+            data_f.append({'pk': entree['pk'], 'date': jour, 'moment': moment,
+                           'caracteristique': entree[moment],
+                           'note': entree.get('commentaire') or ''})
+        if moments:
+            verifications.append({'pk': entree['pk'], 'date': jour, 'liste': moments})
+
+    # entrees appliquees dans l'ordre de la file : la derniere saisie d'un meme moment l'emporte
+    if data_f:
+        _enregistrer_selles_tx(tx, data_f)
+        _maj_last_check_tx(tx, verifications)
+
+    statuts = [{'cle': r['cle'], 'statut': r['statut'], 'message': r['message']}
+               for r in resultats if r['cle'] and r['statut'] != 'doublon']
+    if statuts:
+        tx.run("""
+            UNWIND $statuts AS s
+            MATCH (k:SyncSelles {cle: s.cle})
+            SET k.statut = s.statut, k.message = s.message
+        """, statuts=statuts)
+    tx.run("""
+        MATCH (k:SyncSelles) WHERE k.date_sync < datetime() - duration($duree)
+        WITH k LIMIT 1000
+        DELETE k
+    """, duree=DUREE_CLES_SYNC)
+    return resultats, {row['pk'] for row in data_f}
+
+def synchroniser_selles(driver, entrees, NEO4J_DB='neo4j'):
+    """
+    Applique en une seule transaction un lot de saisies de selles mises en
+    file par le navigateur (plusieurs tournées possibles, hors connexion).
+
+    Chaque entrée peut porter une clé d'idempotence 'cle' : une entrée déjà
+    reçue (renvoi après une coupure réseau) n'est pas rejouée.
+
+    Args:
+        entrees (list[dict]): {cle, pk, date (AAAA-MM-JJ), nuit, matin,
+            apres_midi, commentaire}, '--' pour un moment non observé.
+
+    Returns:
+        list[dict]: Un résultat par entrée, dans l'ordre :
+        {cle, statut ('applique' | 'doublon' | 'erreur'), message}.
+    """
+    with driver.session(database=NEO4J_DB) as session:
+        resultats, pks = session.execute_write(_synchroniser_selles_tx, entrees)
+    if pks:
+        invalider_cache(GROUPE_VERSION_SELLES, *{groupe_selles(pk) for pk in pks})
+    return resultats
+
 def selles_non_enregistrees(driver, NEO4J_DB='neo4j'):
     """
     Récupère la liste des résidents pour lesquels les selles n'ont pas été
@@ -822,13 +1294,26 @@ def selles_non_enregistrees(driver, NEO4J_DB='neo4j'):
     with driver.session(database=NEO4J_DB) as session:
         cypher_query = """
             MATCH (n:Resident)
-            WHERE n.derniere_verif_selles is null OR n.derniere_verif_selles < date()
+            WHERE n.date_depart IS NULL
+              AND (n.derniere_verif_selles is null OR n.derniere_verif_selles < date())
             RETURN n.pk AS pk, n.nom_affichage AS nom 
             ORDER BY n.nom_affichage
         """
         results = session.run(cypher_query)
         results = [dict(record) for record in results]
         return  results
+
+
+REQUETE_SELLES_DU_JOUR = """
+    MATCH (n:Resident)
+    WHERE n.date_depart IS NULL
+    OPTIONAL MATCH (m:Selles {pk: n.pk, date: date()})
+    RETURN n.nom AS nom, n.prenom AS prenom, n.pk AS pk, m.moment_date AS moment,
+           m.caracteristique AS caracteristique, m.commentaire AS commentaire, n.derniere_verif_selles_nuit, n.derniere_verif_selles_matin, n.derniere_verif_selles_apres_midi
+    ORDER BY n.nom, n.prenom, m.moment_date
+"""
+
+
 def get_selles_du_jour(driver, NEO4J_DB='neo4j'):
     """
     Récupère les enregistrements de selles pour la journée en cours.
@@ -837,16 +1322,7 @@ def get_selles_du_jour(driver, NEO4J_DB='neo4j'):
         list[dict]: Liste de dictionnaires contenant les informations des selles.
     """
     with driver.session(database=NEO4J_DB) as session:
-        cypher_query = """
-            MATCH (n:Resident)
-            OPTIONAL MATCH (m:Selles)-[r:Par]->(n)
-            WHERE n.derniere_verif_selles = date()
-            RETURN n.nom AS nom, n.prenom AS prenom, n.pk AS pk, m.moment_date AS moment,
-                   r.caracteristique AS caracteristique, m.commentaire AS commentaire, n.derniere_verif_selles_nuit, n.derniere_verif_selles_matin, n.derniere_verif_selles_apres_midi
-            ORDER BY n.nom, n.prenom, m.moment_date
-
-        """
-        results = session.run(cypher_query)
+        results = session.run(REQUETE_SELLES_DU_JOUR)
         maListe = [
             {
                 'nom': record['nom'],
@@ -861,56 +1337,209 @@ def get_selles_du_jour(driver, NEO4J_DB='neo4j'):
             } for record in results
     ]
     return maListe
-def get_plusieurs_jours_selles(driver, NEO4J_DB='neo4j'):
+OPTIONS_SELLES = ['--', 'Normale', 'Liquide', 'Mou', 'Dur', 'Absence']
+
+def lignes_tableau_selles(residents, selles_du_jour):
     """
-    Récupère les enregistrements de selles pour les derniers jours.
+    Construit les lignes du tableau de saisie des selles en une passe.
+
+    Args:
+        residents (tuple): (noms, prenoms, pks) comme renvoyé par get_residents.
+        selles_du_jour (list[dict]): Résultat de get_selles_du_jour.
 
     Returns:
-        list[dict]: Liste de dictionnaires contenant les informations des selles.
+        list[dict]: Une ligne par résident (nom_complet, safe_nom, pk, nuit,
+        matin, apres_midi, commentaire), '--' pour un moment non saisi.
+    """
+    valeurs = {}
+    commentaires = {}
+    for selle in selles_du_jour:
+        # premier enregistrement rencontre pour (pk, moment), comme l'ancien filtrage
+        valeurs.setdefault((selle['pk'], selle['moment']), selle['caracteristique'])
+        commentaires.setdefault(selle['pk'], selle['commentaire'])
+    lignes = []
+    for nom, prenom, pk in zip(*residents):
+        lignes.append({
+            'nom_complet': f"{nom.replace(' ', '-')} {prenom.replace(' ', '-')}",
+            'safe_nom': pk.replace(' ', '_'),
+            'pk': pk,
+            'nuit': valeurs.get((pk, 'nuit')) or '--',
+            'matin': valeurs.get((pk, 'matin')) or '--',
+            'apres_midi': valeurs.get((pk, 'apres_midi')) or '--',
+            'commentaire': commentaires.get(pk) or ''
+        })
+    return lignes
+
+def get_tableau_selles(driver, NEO4J_DB='neo4j'):
+    """
+    Lignes du popup de saisie des selles (voir lignes_tableau_selles).
+    """
+    return lignes_tableau_selles(get_residents(driver, NEO4J_DB),
+                                 get_selles_du_jour(driver, NEO4J_DB))
+
+MOMENTS_SELLES = ['nuit', 'matin', 'apres_midi']
+
+REQUETE_MATRICE_SELLES = """
+    MATCH (n:Resident)
+    WHERE n.date_depart IS NULL AND ($etage IS NULL OR toString(n.etage) = $etage)
+    OPTIONAL MATCH (m:Selles {pk: n.pk})
+    WHERE m.date >= date($debut) AND m.date <= date($fin)
+    RETURN n.pk AS pk, n.nom_affichage AS nom, n.chambre AS chambre,
+           m.date AS date, m.moment_date AS moment, m.caracteristique AS caracteristique
+    ORDER BY n.nom, n.prenom
+"""
+
+
+def get_matrice_selles(driver, debut, fin, etage=None, NEO4J_DB='neo4j'):
+    """
+    Matrice résidents x jours x moments des selles d'un étage, pour la
+    relève : une seule requête sur la fenêtre, pivotée avec NumPy.
+
+    Args:
+        debut (date): Premier jour (inclus).
+        fin (date): Dernier jour (inclus).
+        etage (str, optional): Etage des résidents (tous si None).
+
+    Returns:
+        dict: 'jours' (dates iso), 'moments', 'codes' (code -> caractéristique,
+        0 = non renseigné), 'residents' (pk, nom, chambre), 'valeurs'
+        (codes [résident][jour][moment]) et 'dominante' (code le plus
+        préoccupant par résident et par jour).
     """
     with driver.session(database=NEO4J_DB) as session:
-        cypher_query = """
-           MATCH (n:Resident)
-            WHERE NOT EXISTS {
-                MATCH (n)<-[r:Par]-(m:Selles)
-                WHERE r.caracteristique <> 'Absence' AND duration.between(m.date, date()).days < 2
-            }
-            OPTIONAL MATCH (n)<-[s:Par]-(m:Selles) WHERE s.caracteristique <> 'Absence'
-            WITH n,max(m.date) AS Date
-            RETURN n.nom AS Nom, n.prenom AS Prenom, n.pk AS pk, Date, duration.between(Date, date()).days as Jours
-            ORDER BY n.nom, n.prenom
+        records = session.run(REQUETE_MATRICE_SELLES, debut=debut, fin=fin, etage=etage).data()
+
+    codes = [None] + OPTIONS_SELLES[1:]
+    index_code = {car: i for i, car in enumerate(codes) if car}
+    index_code['Dure'] = index_code['Dur']
+    index_moment = {moment: i for i, moment in enumerate(MOMENTS_SELLES)}
+
+    residents, index_resident = [], {}
+    lignes, jours, moments, valeurs = [], [], [], []
+    for record in records:
+        if record['pk'] not in index_resident:
+            index_resident[record['pk']] = len(residents)
+            residents.append({'pk': record['pk'], 'nom': record['nom'], 'chambre': record['chambre']})
+        if record['date'] is None or record['moment'] not in index_moment:
+            continue
+        lignes.append(index_resident[record['pk']])
+        jours.append((record['date'].to_native() - debut).days)
+        moments.append(index_moment[record['moment']])
+        valeurs.append(index_code.get(record['caracteristique'], 0))
+
+    nb_jours = (fin - debut).days + 1
+    matrice = np.zeros((len(residents), nb_jours, len(MOMENTS_SELLES)), dtype=np.int8)
+    matrice[lignes, jours, moments] = valeurs
+
+    # priorite de chaque code (Liquide > Dur > Mou > Normale > Absence > rien)
+    priorites = np.array([0] + [PRIORITE_SELLES.get(car, 0.5) for car in codes[1:]])
+    rang = np.argmax(priorites[matrice], axis=2)
+    dominante = np.take_along_axis(matrice, rang[..., None], axis=2)[..., 0]
 
-        """
-        results = session.run(cypher_query)
+    return {
+        'jours': [(debut + datetime.timedelta(days=i)).isoformat() for i in range(nb_jours)],
+        'moments': MOMENTS_SELLES,
+        'codes': codes,
+        'residents': residents,
+        'valeurs': matrice.tolist(),
+        'dominante': dominante.tolist(),
+    }
+
+REQUETE_PLUSIEURS_JOURS_SELLES = """
+    MATCH (n:Resident)
+    WHERE n.date_depart IS NULL
+      AND (n.derniere_selle_date IS NULL OR n.derniere_selle_date < date() - duration('P1D'))
+    RETURN n.nom AS Nom, n.prenom AS Prenom, n.pk AS pk, n.derniere_selle_date AS Date,
+           duration.inDays(n.derniere_selle_date, date()).days AS Jours,
+           size([d IN coalesce(n.selles_7j, []) WHERE d > date() - duration('P7D')]) AS `Selles 7j`
+    ORDER BY n.nom, n.prenom
+"""
+
+
+def get_plusieurs_jours_selles(driver, NEO4J_DB='neo4j'):
+    """
+    Récupère les résidents sans selle (hors 'Absence') depuis au moins
+    deux jours, à partir de l'état dénormalisé tenu par
+    enregistrer_valeur_selles (voir maj_derniere_selle).
+
+    Returns:
+        pd.DataFrame: Nom, Prenom, pk, Date de la dernière selle, Jours
+        écoulés et nombre de jours avec selle sur les 7 derniers jours.
+    """
+    with driver.session(database=NEO4J_DB) as session:
+        results = session.run(REQUETE_PLUSIEURS_JOURS_SELLES)
         df = pd.DataFrame([dict(record) for record in results])
         #df['Jours'] = df['Jours'].fillna("-1")
         if not df.empty:
             df['Date'] = df['Date'].fillna("--")
             df['Jours'] = df['Jours'].astype('Int32') 
         return  df #df.fillna("--")
-def get_infos_rdv(driver,date,heure, nom_full, rdv,pk='', NEO4J_DB='neo4j'):
-    nom=nom_full.split(" ")[0]
-    prenom =nom_full.split(" ")[1]
-    #date=date+':00'
-
-    # Si la date contient 'T00', cela signifie qu'il n'y a pas d'heure réelle
-    date=date
-    heure=heure
-    
-    print(f"ma date : {date}")
-    print('get_infos_rdv : ',date, nom, prenom, rdv)
-    date_iso = datetime.datetime.strptime(date, "%d/%m/%Y").strftime("%Y-%m-%d")### reformatter la date fr en date isoo pour la BDD
-    with driver.session(database=NEO4J_DB) as session:
-        cypher_query = """
-           MATCH (n:Resident {nom:$nom, prenom:$prenom})-[r:Rdv ]->(m:Categorie {metier:$rdv}) WHERE r.date = date($date) and r.heure=localtime($heure)
-        RETURN r.lieu AS lieu, r.medecin AS medecin, r.commentaire AS commentaire, r.transport AS transport, n.deplacement AS deplacement, n.oxygen AS oxygen, n.diabete AS diabete
 
-        """
-        results = session.run(cypher_query,nom=nom,prenom=prenom,date=date_iso, heure=heure,rdv=rdv)
-        data= [dict(record) for record in results]
-        print("data sortie fonction : ",data)
-        return  data
-    
+
+def _texte_detail(valeur):
+    return valeur if valeur is not None else ''
+
+
+@en_cache(GROUPE_VERSION_RDV, TTL_VERSION_RDV)
+def get_rdv_version(driver, NEO4J_DB='neo4j'):
+    """
+    Version courante des rendez-vous, incrémentée par invalider_rdv
+    (lue en base au plus une fois par CACHE_TTL_VERSION_RDV secondes).
+    """
+    return valeur_sequence(driver, SEQUENCE_RDV, NEO4J_DB)
+
+def get_detail_rdv(driver, id_rdv, NEO4J_DB="neo4j"):
+    """
+    Détail d'un rendez-vous par son identifiant : elementId du Rdv (recherche
+    directe) ou identifiant d'occurrence de récurrence. Mis en cache par id
+    et par version des rendez-vous : une écriture faite par un autre worker
+    change la clé, la fiche imprimée (et son ETag) n'est donc jamais périmée
+    plus de CACHE_TTL_VERSION_RDV secondes.
+
+    Returns:
+        dict | None: nom_resident, Date_Fr, Heure, Rendez-vous, Transport,
+        Lieu, Medecin, Note et les attributs du résident (surcharges du
+        rendez-vous comprises) ; None si le rendez-vous n'existe pas.
+    """
+    return _detail_rdv(driver, id_rdv, get_rdv_version(driver, NEO4J_DB), NEO4J_DB)
+
+@en_cache(GROUPE_RDV, TTL_RDV)
+def _detail_rdv(driver, id_rdv, version, NEO4J_DB="neo4j"):
+    if est_id_occurrence(id_rdv):
+        rdv = get_occurrence(driver, id_rdv, NEO4J_DB)
+    else:
+        with driver.session(database=NEO4J_DB) as session:
+            record = session.run("""
+                MATCH (n:Resident)-[r:Rdv]->(m)
+                WHERE elementId(r) = $id_rdv
+                RETURN n.nom AS nom, n.prenom AS prenom, r.date AS date, r.heure AS heure,
+                       m.metier AS metier, r.transport AS transport, r.lieu AS lieu,
+                       r.medecin AS medecin, r.commentaire AS commentaire,
+                       coalesce(r.deplacement, n.deplacement) AS deplacement,
+                       coalesce(r.oxygen, n.oxygen) AS oxygen,
+                       coalesce(r.diabete, n.diabete) AS diabete
+            """, id_rdv=id_rdv).single()
+        rdv = record.data() if record else None
+        if rdv:
+            rdv['date'] = rdv['date'].to_native()
+            rdv['heure'] = rdv['heure'].to_native() if rdv['heure'] else None
+    if rdv is None:
+        return None
+    return {
+        'nom_resident': f"{rdv['nom']} {rdv['prenom']}",
+        'Date_Fr': rdv['date'].strftime('%d/%m/%Y'),
+        'Heure': rdv['heure'].strftime('%H:%M') if rdv['heure'] else '--:--',
+        'Rendez-vous': rdv['metier'],
+        'Transport': rdv['transport'] or '---',
+        'Lieu': _texte_detail(rdv['lieu']),
+        'Medecin': _texte_detail(rdv['medecin']),
+        'Note': _texte_detail(rdv['commentaire']),
+        'deplacement': rdv['deplacement'],
+        'oxygen': rdv['oxygen'],
+        'diabete': rdv['diabete'],
+    }
+
+
 def get_all_users(driver, NEO4J_DB='neo4j'):
     """
     Récupère la liste de tous les utilisateurs (username) dans la base Neo4j.
@@ -926,6 +1555,14 @@ def get_all_users(driver, NEO4J_DB='neo4j'):
         """
         results = session.run(cypher_query)
         return {record['username']:[record['role']] for record in results}
+def _update_roles_tx(tx, username, role):
+    tx.run("""
+        MATCH (n:Auth {user: $username})
+        SET n.role = $role
+    """, username=username, role=role)
+    # les sessions portant une version plus ancienne relisent leur role
+    return incrementer_sequence(tx, SEQUENCE_ROLES)
+
 def update_roles(driver,username, role, NEO4J_DB='neo4j'):
     """
     Met à jour les rôles d'un utilisateur dans la base Neo4j.
@@ -935,78 +1572,104 @@ def update_roles(driver,username, role, NEO4J_DB='neo4j'):
         roles (list[str]): Liste des rôles à attribuer.
     """
     with driver.session(database=NEO4J_DB) as session:
-        cypher_query = """
-            MATCH (n:Auth {user: $username})
-            SET n.role = $role
-        """
-        session.run(cypher_query, username=username, role=role)
+        session.execute_write(_update_roles_tx, username, role)
+    invalider_cache(GROUPE_ROLES)
 
-def supprimer_rdv(driver,id_rdv, NEO4J_DB='neo4j'):
+@en_cache(GROUPE_ROLES, TTL_ROLES)
+def get_role_version(driver, NEO4J_DB='neo4j'):
     """
-    Supprime un rendez-vous spécifique de la base Neo4j.
-
-    Args:
-        id_rdv (int): ID du rendez-vous à supprimer.
+    Version courante des rôles, incrémentée à chaque update_roles
+    (lue en base au plus une fois par CACHE_TTL_ROLES secondes).
     """
-    print("je tente de supprimer le rdv : ",id_rdv)
-    with driver.session(database=NEO4J_DB) as session:
-        cypher_query = """
-            MATCH ()-[r]->()
-            WHERE ID(r) = $id_rdv or r.id_rdv = $id_rdv
-            DELETE r
-        """
-        session.run(cypher_query, id_rdv=id_rdv)
+    return valeur_sequence(driver, SEQUENCE_ROLES, NEO4J_DB)
 
+REQUETE_ROLE = """
+    MATCH (u:Auth)
+    WHERE u.pk = $id
+    RETURN u.role AS role
+"""
 
-def supprimer_rdv_chaine(driver, id_rdv,date, NEO4J_DB='neo4j'):
-    """
-    Supprime un rendez-vous spécifique de la base Neo4j.
+# lue par verify_user_in_neo4j (routes/auth.py)
+REQUETE_UTILISATEUR = """
+    MATCH (u:Auth {user: $username})
+    RETURN u.password AS password_hash, u.pk AS id
+"""
 
-    Args:
-        id_rdv (int): ID du rendez-vous à supprimer.
-    """
-    id_rdv = int(id_rdv) if isinstance(id_rdv, str) else id_rdv
-    print("dates a supprimer : ",date)
-    if 'T' in date :
-        date =date.split("T")[0]
-        #heure=date.split("T")[1] 
-        date_iso = datetime.datetime.strptime(date, "%d/%m/%Y").strftime("%Y-%m-%d")
-    elif ' ' in date :
-        print(date)
-        date =date.split(" ")[0]
-        #heure=date.split(" ")[1] 
-        date_iso = datetime.datetime.strptime(date, "%d/%m/%Y").strftime("%Y-%m-%d")
-    else:
-        date_iso = datetime.datetime.strptime(date, "%d/%m/%Y").strftime("%Y-%m-%d")
-        #heure=None  
+
+# coche / decoche une note ou un rappel (route update_status)
+REQUETE_MAJ_STATUT = """
+    MATCH ()-[r]->()
+    WHERE elementId(r) = $rid
+    SET r.status = $status
+    RETURN elementId(r) AS id, r.status AS new_status
+"""
+
+
+def get_role(driver, user_id, NEO4J_DB='neo4j'):
+    """
+    Returns:
+        str | None: Rôle de l'utilisateur d'identifiant `user_id`.
+    """
     with driver.session(database=NEO4J_DB) as session:
-        cypher_query = """
-            MATCH (n)-[r:Rdv]->()
-            WHERE (r.id_chain = $id_rdv AND r.date >= date($date)) 
-            WITH r, ID(r) AS id_rdv_rappel
-            OPTIONAL MATCH ()-[s:Rappel]->()
-            WHERE s.id_rdv = id_rdv_rappel
-            DELETE r,s
-        """
-        session.run(cypher_query, id_rdv=id_rdv,date=date_iso)
+        result = session.run(REQUETE_ROLE, id=user_id).single()
+    return result["role"] if result else None
+
+REQUETE_IMPRESSION_SEMAINE = """
+    MATCH (n:Resident)-[r:Rdv]-(m:Categorie)
+    WHERE r.date >= date()
+    AND r.date <= date() + duration('P7D')
+    RETURN n.nom AS nom, n.chambre AS chambre, n.prenom AS prenom, m.metier AS typeRdv, r.date as date, r.heure as heure, r.medecin as nomMedecin, r.lieu AS lieu, r.commentaire AS commentaire, r.transport AS transport, coalesce(r.oxygen, n.oxygen) AS oxygene
+    ORDER BY r.debut
+"""
+
 
 def imprimerMultiJours(driver,NEO4J_DB='neo4j'):
     with driver.session(database=NEO4J_DB) as session:
-        cypher_query = """
-            MATCH (n:Resident)-[r:Rdv]-(m:Categorie)
-            WITH n, m, r, date(substring(toString(r.date), 0, 10)) AS rdvDate
-            WHERE rdvDate >= date()
-            AND rdvDate <= date() + duration('P7D')
-            RETURN n.nom AS nom, n.chambre AS chambre, n.prenom AS prenom, m.metier AS typeRdv, r.date as date, r.heure as heure, r.medecin as nomMedecin, r.lieu AS lieu, r.commentaire AS commentaire, r.transport AS transport, n.oxygen AS oxygene
-            ORDER BY rdvDate, r.date
-
-        """
-        result = session.run(cypher_query)
+        result = session.run(REQUETE_IMPRESSION_SEMAINE)
         liste_rdv = [dict(record) for record in result]
-        print("liste rdv impression : ", liste_rdv)
+    debut = datetime.date.today()
+    liste_rdv += [
+        {'nom': occ['nom'], 'chambre': occ['chambre'], 'prenom': occ['prenom'],
+         'typeRdv': occ['metier'], 'date': occ['date'], 'heure': occ['heure'],
+         'nomMedecin': occ['medecin'], 'lieu': occ['lieu'], 'commentaire': occ['commentaire'],
+         'transport': occ['transport'], 'oxygene': occ['oxygen']}
+        for occ in get_occurrences_recurrences(driver, debut, debut + datetime.timedelta(days=7),
+                                               NEO4J_DB=NEO4J_DB)
+    ]
+    liste_rdv.sort(key=lambda x: (x['date'].to_native() if hasattr(x['date'], 'to_native') else x['date'],
+                                  str(x['heure'] or '')))
     return liste_rdv
 
 
+def get_attributs_resident_rdv(driver, pk, id_rdv=None, NEO4J_DB="neo4j"):
+    """
+    Attributs actuels du résident (CHAMPS_RESIDENT_RDV), remplacés par les
+    surcharges du rendez-vous `id_rdv` quand il en porte. `id_rdv` est
+    l'elementId d'un Rdv ou un identifiant d'occurrence de récurrence ; un
+    rendez-vous d'un autre résident est ignoré.
+
+    Returns:
+        dict | None: {'deplacement', 'oxygen', 'diabete'}, None si le
+        résident n'existe pas.
+    """
+    if est_id_occurrence(id_rdv):
+        occurrence = get_occurrence(driver, id_rdv, NEO4J_DB)
+        if occurrence is not None and occurrence['pk'] == pk:
+            # surcharges de la regle deja appliquees par get_occurrence
+            return {champ: occurrence.get(champ) for champ in CHAMPS_RESIDENT_RDV}
+        id_rdv = None
+    with driver.session(database=NEO4J_DB) as session:
+        record = session.run("""
+            MATCH (n:Resident {pk: $pk})
+            OPTIONAL MATCH (n)-[r:Rdv]->()
+            WHERE elementId(r) = $id_rdv
+            RETURN coalesce(r.deplacement, n.deplacement) AS deplacement,
+                   coalesce(r.oxygen, n.oxygen) AS oxygen,
+                   coalesce(r.diabete, n.diabete) AS diabete
+        """, pk=pk, id_rdv=id_rdv).single()
+    return dict(record) if record else None
+
+
 def infosResidentRDV(driver, pks, NEO4J_DB="neo4j"):
     with driver.session(database=NEO4J_DB) as session:
         cypher_query = """
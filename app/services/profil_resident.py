@@ -0,0 +1,202 @@
+"""
+Fiche résident : propriétés et planning chargés en une requête, avec
+pagination par curseur (debut, id) des rendez-vous passés et à venir.
+
+Les relations Rdv et les occurrences des récurrences sont fusionnées dans
+le même ordre (début, id) et chaque page est coupée à `limite` lignes ; le
+curseur est la clé de la dernière ligne, relation ou occurrence. Les
+occurrences sont développées à la demande (voir iter_occurrences_resident),
+une page n'en développe donc qu'une poignée, même sur des années.
+"""
+import datetime
+import heapq
+from itertools import islice
+
+from app.services.neo4j_services import HORIZON_RECURRENCES
+from app.services.recurrences import iter_occurrences_resident, cle_occurrence
+
+
+TAILLE_PAGE_RDV = 20
+
+PASSE = 'passe'
+A_VENIR = 'a_venir'
+
+_PROJECTION_RDV = """r {.date, .heure, .debut, .transport, .commentaire, .medecin,
+                        .lieu, .piece_jointe, id: elementId(r), metier: m.metier}"""
+
+REQUETE_PROFIL = f"""
+    MATCH (n:Resident {{pk: $pk}})
+    CALL {{
+        WITH n
+        OPTIONAL MATCH (n)-[r:Rdv]->(m)
+        WHERE r.debut >= $pivot
+        WITH r, m ORDER BY r.debut ASC, elementId(r) ASC LIMIT $limite
+        RETURN collect({_PROJECTION_RDV}) AS a_venir
+    }}
+    CALL {{
+        WITH n
+        OPTIONAL MATCH (n)-[r:Rdv]->(m)
+        WHERE r.debut < $pivot
+        WITH r, m ORDER BY r.debut DESC, elementId(r) DESC LIMIT $limite
+        RETURN collect({_PROJECTION_RDV}) AS passes
+    }}
+    RETURN properties(n) AS resident, a_venir, passes
+"""
+
+_REQUETE_PAGE_RDV = """
+    MATCH (n:Resident {{pk: $pk}})-[r:Rdv]->(m)
+    WHERE {condition}
+    WITH r, m ORDER BY r.debut {ordre}, elementId(r) {ordre} LIMIT $limite
+    RETURN {projection} AS rdv
+"""
+
+# page suivante, par sens de lecture
+REQUETES_PAGE_RDV = {
+    PASSE: _REQUETE_PAGE_RDV.format(
+        condition="r.debut < $debut OR (r.debut = $debut AND elementId(r) < $id_rdv)",
+        ordre="DESC", projection=_PROJECTION_RDV),
+    A_VENIR: _REQUETE_PAGE_RDV.format(
+        condition="r.debut > $debut OR (r.debut = $debut AND elementId(r) > $id_rdv)",
+        ordre="ASC", projection=_PROJECTION_RDV),
+}
+
+
+def _ligne_rdv(id_rdv, date_rdv, heure, metier, transport, commentaire, medecin, lieu, fichier):
+    """
+    Ligne du planning au format affiché par client_file.html ('Id' n'est
+    pas affiché, il sert au détail du rendez-vous).
+    """
+    return {
+        'Date_Fr': date_rdv.strftime('%d/%m/%Y'),
+        'Date': date_rdv.strftime('%Y-%m-%d'),
+        'Heure': heure.strftime('%H:%M') if heure else '--:--',
+        'Rendez-vous': metier,
+        'Transport': transport,
+        'Note': commentaire,
+        'Medecin': medecin,
+        'Lieu': lieu,
+        'Fichier': fichier,
+        'Id': id_rdv
+    }
+
+
+def _ligne_depuis_relation(rdv):
+    return _ligne_rdv(rdv['id'], rdv['date'].to_native(),
+                      rdv['heure'].to_native() if rdv['heure'] else None,
+                      rdv['metier'], rdv['transport'], rdv['commentaire'],
+                      rdv['medecin'], rdv['lieu'], rdv['piece_jointe'])
+
+
+def _ligne_depuis_occurrence(occ):
+    return _ligne_rdv(occ['id'], occ['date'], occ['heure'], occ['metier'], occ['transport'],
+                      occ['commentaire'], occ['medecin'], occ['lieu'], occ['piece_jointe'])
+
+
+def encoder_curseur(cle):
+    debut, id_rdv = cle
+    return f"{debut.isoformat()}_{id_rdv}"
+
+
+def decoder_curseur(curseur):
+    """
+    Returns:
+        tuple: (debut (datetime), id de la ligne : elementId de la relation
+        ou identifiant d'occurrence).
+
+    Raises:
+        ValueError: Curseur mal formé.
+    """
+    debut, _, id_rdv = curseur.partition('_')
+    if not id_rdv:
+        raise ValueError(f"Curseur invalide : {curseur}")
+    return datetime.datetime.fromisoformat(debut), id_rdv
+
+
+def _cle_relation(rdv):
+    return rdv['debut'].to_native(), rdv['id']
+
+
+def _assembler_page(driver, pk, sens, relations, limite, apres, NEO4J_DB):
+    """
+    Fusionne une page de relations Rdv (limite + 1 lues pour savoir s'il
+    en reste) avec les occurrences des récurrences qui suivent `apres`,
+    et coupe le tout à `limite` lignes.
+
+    Args:
+        apres (tuple): Clé (début, id) exclue à partir de laquelle on lit ;
+            un id vide ('') part du début lui-même (inclus à venir, exclu
+            dans l'historique).
+
+    Returns:
+        tuple: (lignes dans le sens de lecture, curseur suivant ou None).
+    """
+    passe = sens == PASSE
+    debut_curseur = apres[0].date()
+    if passe:
+        occurrences = iter_occurrences_resident(driver, pk, datetime.date.min, debut_curseur,
+                                                decroissant=True, NEO4J_DB=NEO4J_DB)
+        occurrences = (occ for occ in occurrences if cle_occurrence(occ) < apres)
+    else:
+        fin = datetime.date.today() + HORIZON_RECURRENCES
+        occurrences = iter_occurrences_resident(driver, pk, debut_curseur, fin, NEO4J_DB=NEO4J_DB) \
+            if debut_curseur <= fin else iter(())
+        occurrences = (occ for occ in occurrences if cle_occurrence(occ) > apres)
+
+    fusion = heapq.merge(
+        ((_cle_relation(rdv), _ligne_depuis_relation, rdv) for rdv in relations),
+        ((cle_occurrence(occ), _ligne_depuis_occurrence, occ) for occ in occurrences),
+        key=lambda element: element[0], reverse=passe)
+    page = list(islice(fusion, limite + 1))
+    curseur = encoder_curseur(page[limite - 1][0]) if len(page) > limite else None
+    return [ligne(element) for _, ligne, element in page[:limite]], curseur
+
+
+def get_profil_resident(driver, pk, limite=TAILLE_PAGE_RDV, NEO4J_DB="neo4j"):
+    """
+    Charge la fiche d'un résident : ses propriétés et la première page
+    de rendez-vous passés et à venir, en une seule requête.
+
+    Returns:
+        dict | None: {'resident': propriétés, 'a_venir': lignes croissantes,
+        'passes': lignes décroissantes, 'curseur_a_venir', 'curseur_passe'},
+        None si le résident n'existe pas.
+    """
+    aujourdhui = datetime.date.today()
+    pivot = datetime.datetime.combine(aujourdhui, datetime.time())
+    with driver.session(database=NEO4J_DB) as session:
+        record = session.run(REQUETE_PROFIL, pk=pk, pivot=pivot, limite=limite + 1).single()
+    if record is None:
+        return None
+    a_venir, curseur_a_venir = _assembler_page(driver, pk, A_VENIR, record['a_venir'],
+                                               limite, (pivot, ''), NEO4J_DB)
+    passes, curseur_passe = _assembler_page(driver, pk, PASSE, record['passes'],
+                                            limite, (pivot, ''), NEO4J_DB)
+    return {
+        'resident': dict(record['resident']),
+        'a_venir': a_venir,
+        'passes': passes,
+        'curseur_a_venir': curseur_a_venir,
+        'curseur_passe': curseur_passe
+    }
+
+
+def get_page_rdv(driver, pk, sens, curseur, limite=TAILLE_PAGE_RDV, NEO4J_DB="neo4j"):
+    """
+    Page suivante du planning d'un résident (chargée au défilement).
+
+    Args:
+        sens (str): PASSE (plus ancien que le curseur) ou A_VENIR (plus tard).
+        curseur (str): Curseur renvoyé par la page précédente.
+
+    Returns:
+        tuple: (lignes dans le sens de lecture, curseur suivant ou None).
+
+    Raises:
+        ValueError: Sens ou curseur invalide.
+    """
+    if sens not in (PASSE, A_VENIR):
+        raise ValueError(f"Sens inconnu : {sens}")
+    debut, id_rdv = decoder_curseur(curseur)
+    with driver.session(database=NEO4J_DB) as session:
+        relations = [record['rdv'] for record in session.run(REQUETES_PAGE_RDV[sens], pk=pk, debut=debut, id_rdv=id_rdv, limite=limite + 1)]
+    return _assembler_page(driver, pk, sens, relations, limite, (debut, id_rdv), NEO4J_DB)
@@ -0,0 +1,513 @@
+"""
+Récurrences virtuelles : une règle stockée sur un noeud Recurrence,
+développée à la lecture sur la fenêtre demandée.
+
+Modèle :
+    (:Resident)-[:Planifie]->(rec:Recurrence)-[:Pour]->(:Categorie)
+
+Les annulations ponctuelles sont stockées dans rec.exceptions (liste de
+dates) ; une occurrence modifiée devient une relation Rdv concrète de la
+même chaîne (id_chain) et sa date est ajoutée aux exceptions. Les rappels
+faits sont stockés dans rec.rappels_faits et les rappels supprimés dans
+rec.rappels_supprimes ('AAAA-MM-JJ#indice', date de l'occurrence).
+"""
+import datetime
+import heapq
+
+from app.services.cache import invalider_rdv
+from app.services.utils_date import occurrences_recurrence
+
+
+PREFIXE_OCCURRENCE = 'rec'
+# attributs du resident lus a la lecture des rdv ; un rdv (ou une regle) ne
+# les porte que s'ils sont surcharges pour lui (ex. oxygene ponctuel)
+CHAMPS_RESIDENT_RDV = ('deplacement', 'oxygen', 'diabete')
+
+# en remontant le temps, les regles sont developpees par fenetres de cette taille
+FENETRE_HISTORIQUE = datetime.timedelta(days=92)
+
+
+def id_occurrence(id_rec, date_occurrence, indice_rappel=None):
+    """
+    Construit l'identifiant envoyé au front pour une occurrence virtuelle
+    (ou pour l'un de ses rappels) : rec_<elementId>_<date>[_<indice>].
+    Un elementId ne contient pas de '_', l'identifiant se redécoupe donc sur '_'.
+    """
+    id_occ = f"{PREFIXE_OCCURRENCE}_{id_rec}_{date_occurrence.isoformat()}"
+    if indice_rappel is not None:
+        id_occ += f"_{indice_rappel}"
+    return id_occ
+
+
+def est_id_occurrence(identifiant):
+    return isinstance(identifiant, str) and identifiant.startswith(PREFIXE_OCCURRENCE + '_')
+
+
+def decoder_id_occurrence(identifiant):
+    """
+    Returns:
+        tuple: (elementId du noeud Recurrence, date iso, indice du rappel ou None).
+
+    Raises:
+        ValueError: Identifiant mal formé.
+    """
+    morceaux = identifiant.split('_')
+    if len(morceaux) not in (3, 4) or morceaux[0] != PREFIXE_OCCURRENCE:
+        raise ValueError(f"Identifiant d'occurrence invalide : {identifiant}")
+    indice = int(morceaux[3]) if len(morceaux) > 3 else None
+    return morceaux[1], morceaux[2], indice
+
+
+def regle_depuis_formulaire(form, type_recurrence, rdv_debut):
+    """
+    Construit la règle d'une récurrence sans date de fin à partir
+    du formulaire de prise de rendez-vous.
+    """
+    if isinstance(rdv_debut, datetime.datetime):
+        debut, heure = rdv_debut.date(), rdv_debut.time()
+    else:
+        debut, heure = rdv_debut, None
+    return {
+        'frequence': type_recurrence,
+        'jours': form.getlist('jours[]') if type_recurrence == 'jourSpec' else [],
+        'debut': debut,
+        'heure': heure
+    }
+
+
+def _creer_recurrences_tx(tx, individu_pks, **params):
+    cypher_query = """
+    UNWIND $pks AS pk
+    MATCH (n:Resident {pk: pk})
+    MATCH (m:Categorie {metier: $metier})
+    CREATE (n)-[:Planifie]->(rec:Recurrence {
+        id_chain: $next_id,
+        frequence: $frequence,
+        jours: $jours,
+        debut: date($debut),
+        heure: localtime($heure),
+        transport: $transport,
+        lieu: $lieu,
+        commentaire: $commentaire,
+        responsable: $responsable,
+        medecin: $medecin,
+        piece_jointe: $attachment,
+        rappels_jours: $rappels_jours,
+        rappels_commentaires: $rappels_commentaires,
+        create_date: datetime()
+    })-[:Pour]->(m)
+    RETURN count(rec) AS nb
+    """
+    nb = tx.run(cypher_query, pks=individu_pks, **params).single()['nb']
+    if nb != len(individu_pks):
+        raise ValueError(f"{nb} récurrences créées sur {len(individu_pks)} attendues "
+                         "(résident ou catégorie introuvable)")
+    return nb
+
+
+def creer_recurrences(driver, data, individu_pks, next_id, NEO4J_DB="neo4j"):
+    """
+    Enregistre une récurrence sans date de fin (une règle par résident)
+    au lieu d'en créer toutes les occurrences.
+
+    Args:
+        data (dict): Dictionnaire issu de extract_form_data (clé 'regle').
+        individu_pks (list[str]): pk des résidents concernés.
+        next_id (int): Identifiant de la chaîne de rendez-vous.
+
+    Returns:
+        int: Nombre de règles créées.
+    """
+    regle = data['regle']
+    rappels = list(data['colonnes_table'].values())
+    with driver.session(database=NEO4J_DB) as session:
+        return session.execute_write(
+            _creer_recurrences_tx,
+            individu_pks,
+            metier=data['metier'],
+            next_id=next_id,
+            frequence=regle['frequence'],
+            jours=regle['jours'],
+            debut=regle['debut'],
+            heure=regle['heure'],
+            transport=data['transport'],
+            lieu=data['lieu'],
+            commentaire=data['commentaire'],
+            responsable=data['service'],
+            medecin=data['medecin'],
+            attachment=data.get('uploaded', ''),
+            rappels_jours=[int(rappel_item[2]) for rappel_item in rappels],
+            rappels_commentaires=[rappel_item[0] for rappel_item in rappels]
+        )
+
+
+def _regle_native(regle):
+    """Convertit les propriétés temporelles Neo4j d'une règle en types Python."""
+    regle = dict(regle)
+    for cle in ('debut', 'fin', 'heure', 'ancre'):
+        if regle.get(cle) is not None:
+            regle[cle] = regle[cle].to_native()
+    regle['exceptions'] = [d.to_native() for d in regle.get('exceptions') or []]
+    return regle
+
+
+def _charger_recurrences(driver, debut, fin, pk=None, NEO4J_DB="neo4j"):
+    with driver.session(database=NEO4J_DB) as session:
+        cypher_query = """
+            MATCH (n:Resident)-[:Planifie]->(rec:Recurrence)-[:Pour]->(m:Categorie)
+            WHERE ($pk IS NULL OR n.pk = $pk)
+              AND ($fin IS NULL OR rec.debut <= date($fin))
+              AND (rec.fin IS NULL OR rec.fin >= date($debut))
+            RETURN n {.nom, .prenom, .etage, .chambre, .pk, .nom_affichage,
+                      .deplacement, .oxygen, .diabete} AS resident,
+                   properties(rec) AS regle, elementId(rec) AS id_rec,
+                   m.metier AS metier, m.type AS type
+        """
+        results = session.run(cypher_query, debut=debut, fin=fin, pk=pk)
+        return [
+            (dict(record['resident']), _regle_native(record['regle']),
+             record['id_rec'], record['metier'], record['type'])
+            for record in results
+        ]
+
+
+def _occurrence(resident, regle, id_rec, metier, type_rdv, date_occ):
+    return {
+        **resident,
+        'date': date_occ,
+        'heure': regle.get('heure'),
+        'lieu': regle.get('lieu'),
+        'transport': regle.get('transport'),
+        'commentaire': regle.get('commentaire'),
+        'responsable': regle.get('responsable'),
+        'medecin': regle.get('medecin'),
+        'piece_jointe': regle.get('piece_jointe'),
+        'metier': metier,
+        'type': type_rdv,
+        'id_chain': regle.get('id_chain'),
+        'id': id_occurrence(id_rec, date_occ)
+    }
+
+
+def _avec_surcharges(resident, regle):
+    # les surcharges portees par la regle remplacent les attributs du resident
+    return {**resident, **{cle: regle[cle] for cle in CHAMPS_RESIDENT_RDV
+                           if regle.get(cle) is not None}}
+
+
+def get_occurrences_recurrences(driver, debut, fin, pk=None, NEO4J_DB="neo4j"):
+    """
+    Développe les récurrences sur la fenêtre [debut, fin].
+
+    Args:
+        debut (date): Début de la fenêtre (inclus).
+        fin (date): Fin de la fenêtre (incluse).
+        pk (str, optional): Limite aux récurrences d'un résident.
+
+    Returns:
+        list[dict]: Une entrée par occurrence, avec les champs du résident,
+        de la règle, la date, le métier et l'identifiant d'occurrence 'id'.
+    """
+    occurrences = []
+    for resident, regle, id_rec, metier, type_rdv in _charger_recurrences(
+            driver, debut, fin, pk, NEO4J_DB):
+        resident = _avec_surcharges(resident, regle)
+        for date_occ in occurrences_recurrence(regle, debut, fin):
+            occurrences.append(_occurrence(resident, regle, id_rec, metier, type_rdv, date_occ))
+    return occurrences
+
+
+def cle_occurrence(occ):
+    """Clé de tri (début, id) d'une occurrence, comme r.debut pour une relation Rdv."""
+    return datetime.datetime.combine(occ['date'], occ['heure'] or datetime.time()), occ['id']
+
+
+def _dates_decroissantes(regle, debut, fin):
+    # une fenetre a la fois : on ne developpe que ce que l'appelant consomme
+    borne = max(debut, regle['debut'])
+    while fin >= borne:
+        debut_fenetre = max(borne, fin - FENETRE_HISTORIQUE + datetime.timedelta(days=1))
+        yield from reversed(list(occurrences_recurrence(regle, debut_fenetre, fin)))
+        fin = debut_fenetre - datetime.timedelta(days=1)
+
+
+def _flux_occurrences(resident, regle, id_rec, metier, type_rdv, dates):
+    for date_occ in dates:
+        yield _occurrence(resident, regle, id_rec, metier, type_rdv, date_occ)
+
+
+def iter_occurrences_resident(driver, pk, debut, fin, decroissant=False, NEO4J_DB="neo4j"):
+    """
+    Occurrences des récurrences d'un résident sur [debut, fin], dans l'ordre
+    de cle_occurrence (décroissant si `decroissant`). Elles sont développées
+    au fur et à mesure de la lecture : l'appelant qui s'arrête après n
+    occurrences ne paie pas la fenêtre entière.
+
+    Returns:
+        iterator[dict]: Entrées comme celles de get_occurrences_recurrences.
+    """
+    flux = []
+    for resident, regle, id_rec, metier, type_rdv in _charger_recurrences(
+            driver, debut, fin, pk, NEO4J_DB):
+        dates = _dates_decroissantes(regle, debut, fin) if decroissant \
+            else occurrences_recurrence(regle, debut, fin)
+        flux.append(_flux_occurrences(_avec_surcharges(resident, regle), regle,
+                                      id_rec, metier, type_rdv, dates))
+    return heapq.merge(*flux, key=cle_occurrence, reverse=decroissant)
+
+
+def get_occurrence(driver, identifiant, NEO4J_DB="neo4j"):
+    """
+    Une occurrence virtuelle à partir de son identifiant ('rec_...').
+
+    Returns:
+        dict | None: Comme une entrée de get_occurrences_recurrences, None si
+        la règle n'existe plus ou si cette date n'en est pas une occurrence.
+    """
+    id_rec, date_iso, _ = decoder_id_occurrence(identifiant)
+    with driver.session(database=NEO4J_DB) as session:
+        record = session.run("""
+            MATCH (n:Resident)-[:Planifie]->(rec:Recurrence)-[:Pour]->(m:Categorie)
+            WHERE elementId(rec) = $id_rec
+            RETURN n {.nom, .prenom, .etage, .chambre, .pk, .nom_affichage,
+                      .deplacement, .oxygen, .diabete} AS resident,
+                   properties(rec) AS regle, m.metier AS metier, m.type AS type
+        """, id_rec=id_rec).single()
+    if record is None:
+        return None
+    regle = _regle_native(record['regle'])
+    date_occ = datetime.date.fromisoformat(date_iso)
+    if date_occ not in occurrences_recurrence(regle, date_occ, date_occ):
+        return None
+    return _occurrence(_avec_surcharges(dict(record['resident']), regle), regle,
+                       id_rec, record['metier'], record['type'], date_occ)
+
+
+def get_rappels_recurrences(driver, debut, fin, NEO4J_DB="neo4j"):
+    """
+    Développe les rappels des récurrences dont la date de rappel
+    tombe dans la fenêtre [debut, fin].
+
+    Returns:
+        list[dict]: Une entrée par rappel (date du rappel, date_evt,
+        commentaire, status, identifiant 'id', champs du résident).
+    """
+    rappels = []
+    for resident, regle, id_rec, metier, type_rdv in _charger_recurrences(
+            driver, debut, None, None, NEO4J_DB):
+        faits = set(regle.get('rappels_faits') or [])
+        supprimes = set(regle.get('rappels_supprimes') or [])
+        commentaires = regle.get('rappels_commentaires') or []
+        for indice, jours in enumerate(regle.get('rappels_jours') or []):
+            decalage = datetime.timedelta(days=jours)
+            for date_evt in occurrences_recurrence(regle, debut + decalage, fin + decalage):
+                if f"{date_evt.isoformat()}#{indice}" in supprimes:
+                    continue
+                rappels.append({
+                    **resident,
+                    'date': date_evt - decalage,
+                    'date_evt': date_evt,
+                    'heure': regle.get('heure'),
+                    'commentaire': commentaires[indice] if indice < len(commentaires) else '',
+                    'status': 0 if f"{date_evt.isoformat()}#{indice}" in faits else 1,
+                    'metier': metier,
+                    'type': type_rdv,
+                    'id_chain': regle.get('id_chain'),
+                    'id': id_occurrence(id_rec, date_evt, indice)
+                })
+    return rappels
+
+
+def annuler_occurrence(driver, identifiant, NEO4J_DB="neo4j"):
+    """
+    Annule une occurrence virtuelle en l'ajoutant aux exceptions de sa règle.
+    Pour l'identifiant d'un rappel (avec indice), seul ce rappel est
+    supprimé, l'occurrence est conservée.
+    """
+    id_rec, date_iso, indice = decoder_id_occurrence(identifiant)
+    if indice is not None:
+        with driver.session(database=NEO4J_DB) as session:
+            session.run("""
+                MATCH (rec:Recurrence) WHERE elementId(rec) = $id_rec
+                WITH rec, [x IN coalesce(rec.rappels_supprimes, []) WHERE x <> $cle] AS autres
+                SET rec.rappels_supprimes = autres + $cle
+            """, id_rec=id_rec, cle=f"{date_iso}#{indice}")
+        return
+    with driver.session(database=NEO4J_DB) as session:
+        session.run("""
+            MATCH (rec:Recurrence) WHERE elementId(rec) = $id_rec
+            SET rec.exceptions = coalesce(rec.exceptions, []) + date($date)
+        """, id_rec=id_rec, date=date_iso)
+    invalider_rdv(driver, NEO4J_DB)
+
+
+REQUETE_MATERIALISER_OCCURRENCE = """
+    MATCH (n:Resident)-[:Planifie]->(rec:Recurrence)-[:Pour]->(m:Categorie)
+    WHERE elementId(rec) = $id_rec
+    // verrou en ecriture avant de relire les exceptions : deux envois
+    // simultanes de la meme occurrence ne la materialisent qu'une fois
+    SET rec._verrou = true
+    REMOVE rec._verrou
+    WITH n, rec, m
+    WHERE NOT date($date) IN coalesce(rec.exceptions, [])
+    SET rec.exceptions = coalesce(rec.exceptions, []) + date($date)
+    CREATE (n)-[r:Rdv]->(m)
+    SET r = rec {.heure, .transport, .lieu, .commentaire, .responsable,
+                 .medecin, .id_chain, .piece_jointe,
+                 .deplacement, .oxygen, .diabete},
+        r.date = date($date),
+        r.create_date = datetime()
+    SET r += $modifications
+    SET r.debut = localdatetime({date: r.date, time: coalesce(r.heure, localtime('00:00'))})
+    // les rappels de l'occurrence deviennent des Rappel du Rdv, comme a la
+    // creation d'un rendez-vous (sauf ceux supprimes, status repris)
+    WITH n, m, r, rec, coalesce(rec.rappels_jours, []) AS jours
+    FOREACH (indice IN [i IN range(0, size(jours) - 1)
+                        WHERE NOT ($date + '#' + toString(i)) IN coalesce(rec.rappels_supprimes, [])] |
+        CREATE (n)-[:Rappel {
+            date: r.date - duration({days: jours[indice]}),
+            date_evt: r.date,
+            heure: r.heure,
+            status: CASE WHEN ($date + '#' + toString(indice)) IN coalesce(rec.rappels_faits, [])
+                         THEN 0 ELSE 1 END,
+            rdv: m.metier,
+            lieu: r.lieu,
+            transport: r.transport,
+            commentaire: coalesce(rec.rappels_commentaires[indice], ''),
+            create_date: datetime(),
+            id_chain: r.id_chain,
+            piece_jointe: r.piece_jointe,
+            id_rdv: elementId(r)
+        }]->(m)
+    )
+    RETURN elementId(r) AS id_rdv
+"""
+
+
+def _materialiser_occurrence_tx(tx, id_rec, date_iso, modifications):
+    record = tx.run(REQUETE_MATERIALISER_OCCURRENCE, id_rec=id_rec, date=date_iso,
+                    modifications=modifications).single()
+    return record['id_rdv'] if record else None
+
+
+def modifier_occurrence(driver, identifiant, modifications, NEO4J_DB="neo4j"):
+    """
+    Modifie une seule occurrence virtuelle : elle est matérialisée en
+    relation Rdv (même id_chain) portant les modifications, avec ses
+    relations Rappel, et sa date est ajoutée aux exceptions de la règle.
+
+    Un identifiant périmé (double envoi, page ancienne) ne crée rien : la
+    date doit être une occurrence de la règle qui n'est pas déjà en exception.
+
+    Args:
+        identifiant (str): Identifiant d'occurrence ('rec_...').
+        modifications (dict): Propriétés à remplacer (lieu, transport,
+            commentaire, medecin, responsable...).
+
+    Returns:
+        str | None: elementId du Rdv créé, None si l'occurrence n'existe pas
+        ou a déjà été modifiée.
+    """
+    if get_occurrence(driver, identifiant, NEO4J_DB) is None:
+        return None
+    id_rec, date_iso, _ = decoder_id_occurrence(identifiant)
+    with driver.session(database=NEO4J_DB) as session:
+        id_rdv = session.execute_write(_materialiser_occurrence_tx, id_rec, date_iso, modifications)
+    if id_rdv is not None:
+        invalider_rdv(driver, NEO4J_DB)
+    return id_rdv
+
+
+def maj_status_rappel(driver, identifiant, status, NEO4J_DB="neo4j"):
+    """
+    Coche (status 0) ou décoche (status 1) le rappel d'une occurrence virtuelle.
+    """
+    id_rec, date_iso, indice = decoder_id_occurrence(identifiant)
+    cle = f"{date_iso}#{indice}"
+    with driver.session(database=NEO4J_DB) as session:
+        session.run("""
+            MATCH (rec:Recurrence) WHERE elementId(rec) = $id_rec
+            WITH rec, [x IN coalesce(rec.rappels_faits, []) WHERE x <> $cle] AS autres
+            SET rec.rappels_faits = CASE WHEN $status = 0 THEN autres + $cle ELSE autres END
+        """, id_rec=id_rec, cle=cle, status=int(status))
+
+
+REQUETE_TRONQUER_RECURRENCES = """
+    MATCH (rec:Recurrence {id_chain: $id_chain})
+    WITH rec, date($date) - duration('P1D') AS veille
+    WITH rec, veille, veille < rec.debut AS vide
+    FOREACH (_ IN CASE WHEN vide THEN [] ELSE [1] END | SET rec.fin = veille)
+    FOREACH (_ IN CASE WHEN vide THEN [1] ELSE [] END | DETACH DELETE rec)
+"""
+
+
+def tronquer_recurrences(driver, id_chain, date_iso, NEO4J_DB="neo4j"):
+    """
+    Arrête les récurrences d'une chaîne à partir de `date_iso` (incluse) ;
+    une règle qui n'a plus d'occurrence est supprimée.
+    """
+    with driver.session(database=NEO4J_DB) as session:
+        session.run(REQUETE_TRONQUER_RECURRENCES, id_chain=id_chain, date=date_iso)
+    invalider_rdv(driver, NEO4J_DB)
+
+
+def _scinder_recurrences_tx(tx, date_iso, modifiees, scindees, patch):
+    tx.run("""
+        UNWIND $modifiees AS id_rec
+        MATCH (rec:Recurrence) WHERE elementId(rec) = id_rec
+        SET rec += $patch
+    """, modifiees=modifiees, patch=patch)
+    tx.run("""
+        UNWIND $scindees AS scission
+        MATCH (n:Resident)-[:Planifie]->(rec:Recurrence)-[:Pour]->(m:Categorie)
+        WHERE elementId(rec) = scission.id_rec
+        CREATE (n)-[:Planifie]->(suite:Recurrence)-[:Pour]->(m)
+        SET suite = properties(rec)
+        SET suite += $patch,
+            suite.debut = scission.debut,
+            suite.ancre = coalesce(rec.ancre, rec.debut),
+            suite.create_date = datetime()
+        SET rec.fin = date($date) - duration('P1D')
+    """, scindees=scindees, patch=patch, date=date_iso)
+
+
+def scinder_recurrences(driver, id_chain, date_iso, modifications, NEO4J_DB="neo4j"):
+    """
+    Applique `modifications` aux récurrences d'une chaîne à partir de
+    `date_iso` (incluse). Une règle commencée avant cette date s'arrête la
+    veille et se poursuit par une copie modifiée qui démarre à sa première
+    occurrence suivante. La copie garde en `ancre` le début de la règle
+    d'origine, dont se déduit le rythme (ex. 4e jeudi du mois) : il est
+    donc conservé même si la copie démarre sur un dernier jeudi.
+
+    Args:
+        modifications (dict): Propriétés à remplacer ('heure' en HH:MM).
+
+    Returns:
+        int: Nombre de règles modifiées ou créées.
+    """
+    coupure = datetime.date.fromisoformat(date_iso)
+    patch = dict(modifications)
+    if 'heure' in patch:
+        patch['heure'] = datetime.time.fromisoformat(patch['heure']) if patch['heure'] else None
+    modifiees, scindees = [], []
+    with driver.session(database=NEO4J_DB) as session:
+        records = session.run("""
+            MATCH (rec:Recurrence {id_chain: $id_chain})
+            WHERE rec.fin IS NULL OR rec.fin >= date($date)
+            RETURN elementId(rec) AS id_rec, properties(rec) AS regle
+        """, id_chain=id_chain, date=date_iso)
+        for record in records:
+            regle = _regle_native(record['regle'])
+            if regle['debut'] >= coupure:
+                modifiees.append(record['id_rec'])
+                continue
+            suivante = next(occurrences_recurrence(
+                regle, coupure, regle.get('fin') or coupure + datetime.timedelta(days=366)), None)
+            if suivante is not None:
+                scindees.append({'id_rec': record['id_rec'], 'debut': suivante})
+        if modifiees or scindees:
+            session.execute_write(_scinder_recurrences_tx, date_iso,
+                                  modifiees, scindees, patch)
+            invalider_rdv(driver, NEO4J_DB)
+    return len(modifiees) + len(scindees)
@@ -0,0 +1,179 @@
+"""
+Schéma Neo4j : contraintes d'unicité et index utilisés par les requêtes
+des services. Toutes les instructions sont idempotentes (IF NOT EXISTS),
+on peut donc les rejouer à chaque démarrage.
+"""
+import datetime
+
+from neo4j.exceptions import Neo4jError
+
+from app.services.migrations import migrer_au_demarrage
+
+from app.services.neo4j_services import (REQUETE_CREER_RDV, REQUETE_RDV_JOUR,
+                                         REQUETE_RAPPELS_JOUR, REQUETE_RDV_RECENTS,
+                                         REQUETE_PLUSIEURS_JOURS_SELLES,
+                                         REQUETE_ENREGISTRER_SELLES, REQUETE_SELLES_DU_JOUR,
+                                         REQUETE_MATRICE_SELLES, REQUETE_HISTORIQUE_SELLES,
+                                         REQUETE_RDV_RESIDENT, REQUETE_EVENEMENTS,
+                                         REQUETE_IMPRESSION_SEMAINE,
+                                         REQUETE_MAJ_STATUT, REQUETE_ROLE, REQUETE_UTILISATEUR,
+                                         REQUETE_AJOUT_NOTE, requete_modifier_chaine)
+from app.services.profil_resident import REQUETE_PROFIL, REQUETES_PAGE_RDV, PASSE, A_VENIR
+from app.services.recurrences import REQUETE_TRONQUER_RECURRENCES
+from app.services.sequences import REQUETE_LIRE_SEQUENCE
+from app.services.suppressions import (REQUETE_ANNULER_CHAINE, REQUETE_RDV_DEPART,
+                                       REQUETE_SUPPRIMER_RDV)
+
+
+# (nom, instruction) ; les contraintes d'unicité créent aussi l'index associé
+CONTRAINTES = [
+    ("resident_pk", "CREATE CONSTRAINT resident_pk IF NOT EXISTS FOR (n:Resident) REQUIRE n.pk IS UNIQUE"),
+    ("categorie_metier", "CREATE CONSTRAINT categorie_metier IF NOT EXISTS FOR (n:Categorie) REQUIRE n.metier IS UNIQUE"),
+    ("service_nom", "CREATE CONSTRAINT service_nom IF NOT EXISTS FOR (n:Service) REQUIRE n.nom IS UNIQUE"),
+    ("auth_user", "CREATE CONSTRAINT auth_user IF NOT EXISTS FOR (n:Auth) REQUIRE n.user IS UNIQUE"),
+    ("auth_pk", "CREATE CONSTRAINT auth_pk IF NOT EXISTS FOR (n:Auth) REQUIRE n.pk IS UNIQUE"),
+    ("selles_jour_moment", "CREATE CONSTRAINT selles_jour_moment IF NOT EXISTS FOR (n:Selles) REQUIRE (n.pk, n.date, n.moment_date) IS UNIQUE"),
+    ("sync_selles_cle", "CREATE CONSTRAINT sync_selles_cle IF NOT EXISTS FOR (n:SyncSelles) REQUIRE n.cle IS UNIQUE"),
+    ("sequence_nom", "CREATE CONSTRAINT sequence_nom IF NOT EXISTS FOR (n:Sequence) REQUIRE n.nom IS UNIQUE"),
+]
+
+# index de repli si une contrainte ne peut pas être posée (doublons existants)
+INDEX_DE_REPLI = {
+    "resident_pk": "CREATE INDEX resident_pk_idx IF NOT EXISTS FOR (n:Resident) ON (n.pk)",
+    "categorie_metier": "CREATE INDEX categorie_metier_idx IF NOT EXISTS FOR (n:Categorie) ON (n.metier)",
+    "service_nom": "CREATE INDEX service_nom_idx IF NOT EXISTS FOR (n:Service) ON (n.nom)",
+    "auth_user": "CREATE INDEX auth_user_idx IF NOT EXISTS FOR (n:Auth) ON (n.user)",
+    "auth_pk": "CREATE INDEX auth_pk_idx IF NOT EXISTS FOR (n:Auth) ON (n.pk)",
+    "selles_jour_moment": "CREATE INDEX selles_jour_moment_idx IF NOT EXISTS FOR (n:Selles) ON (n.pk, n.date, n.moment_date)",
+    "sync_selles_cle": "CREATE INDEX sync_selles_cle_idx IF NOT EXISTS FOR (n:SyncSelles) ON (n.cle)",
+    "sequence_nom": "CREATE INDEX sequence_nom_idx IF NOT EXISTS FOR (n:Sequence) ON (n.nom)",
+}
+
+INDEX = [
+    ("resident_nom_prenom", "CREATE INDEX resident_nom_prenom IF NOT EXISTS FOR (n:Resident) ON (n.nom, n.prenom)"),
+    ("resident_derniere_selle", "CREATE INDEX resident_derniere_selle IF NOT EXISTS FOR (n:Resident) ON (n.derniere_selle_date)"),
+    ("sync_selles_date", "CREATE INDEX sync_selles_date IF NOT EXISTS FOR (n:SyncSelles) ON (n.date_sync)"),
+    ("selles_date", "CREATE INDEX selles_date IF NOT EXISTS FOR (n:Selles) ON (n.date)"),
+    ("recurrence_id_chain", "CREATE INDEX recurrence_id_chain IF NOT EXISTS FOR (n:Recurrence) ON (n.id_chain)"),
+    ("rdv_date", "CREATE INDEX rdv_date IF NOT EXISTS FOR ()-[r:Rdv]-() ON (r.date)"),
+    ("rdv_debut", "CREATE INDEX rdv_debut IF NOT EXISTS FOR ()-[r:Rdv]-() ON (r.debut)"),
+    ("rdv_id_chain", "CREATE INDEX rdv_id_chain IF NOT EXISTS FOR ()-[r:Rdv]-() ON (r.id_chain)"),
+    ("rdv_create_date", "CREATE INDEX rdv_create_date IF NOT EXISTS FOR ()-[r:Rdv]-() ON (r.create_date)"),
+    ("rappel_date", "CREATE INDEX rappel_date IF NOT EXISTS FOR ()-[r:Rappel]-() ON (r.date)"),
+    ("rappel_id_rdv", "CREATE INDEX rappel_id_rdv IF NOT EXISTS FOR ()-[r:Rappel]-() ON (r.id_rdv)"),
+]
+
+
+# Requêtes des services dont le plan doit s'appuyer sur un index : ce sont
+# les constantes exécutées par les services, le rapport suit donc leurs
+# modifications. Les paramètres ne servent qu'à typer l'EXPLAIN (rien
+# n'est exécuté).
+_DATE = "2000-01-01"
+_DEBUT = datetime.datetime(2000, 1, 1)
+_FILTRES = {"etages": None, "types": None, "services": None}
+
+REQUETES_INDEXEES = {
+    "insert_rendez_vous_bulk": (
+        REQUETE_CREER_RDV,
+        {"lignes": [{"pk": "", "date": _DATE, "heure": None, "rappels": []}], "metier": "",
+         "transport": "", "lieu": "", "commentaire": "", "responsable": "", "medecin": "",
+         "next_id": 0, "attachment": ""}),
+    "get_rdv_jour": (REQUETE_RDV_JOUR, {}),
+    "get_rappels_jour": (REQUETE_RAPPELS_JOUR, {}),
+    "get_recent_rdv": (REQUETE_RDV_RECENTS, {}),
+    "get_plusieurs_jours_selles": (REQUETE_PLUSIEURS_JOURS_SELLES, {}),
+    "enregistrer_valeur_selles": (
+        REQUETE_ENREGISTRER_SELLES,
+        {"data": [{"pk": "", "date": _DATE, "moment": "", "caracteristique": "", "note": ""}]}),
+    "get_selles_du_jour": (REQUETE_SELLES_DU_JOUR, {}),
+    "get_matrice_selles": (REQUETE_MATRICE_SELLES, {"debut": _DATE, "fin": _DATE, "etage": None}),
+    "get_historique_selles": (REQUETE_HISTORIQUE_SELLES, {"pk": "", "jour": _DATE, "nb_jours": 28}),
+    "get_rendez_vous": (REQUETE_RDV_RESIDENT, {"pk": ""}),
+    "get_profil_resident": (REQUETE_PROFIL, {"pk": "", "pivot": _DEBUT, "limite": 21}),
+    "get_page_rdv (passe)": (
+        REQUETES_PAGE_RDV[PASSE], {"pk": "", "debut": _DEBUT, "id_rdv": "", "limite": 21}),
+    "get_page_rdv (a venir)": (
+        REQUETES_PAGE_RDV[A_VENIR], {"pk": "", "debut": _DEBUT, "id_rdv": "", "limite": 21}),
+    "get_all_rdv_events": (REQUETE_EVENEMENTS, {"debut": _DATE, "fin": _DATE, **_FILTRES}),
+    "imprimerMultiJours": (REQUETE_IMPRESSION_SEMAINE, {}),
+    "annuler_chaine": (REQUETE_ANNULER_CHAINE, {"id_chain": 0, "date": _DATE, "taille_lot": 1}),
+    "marquer_depart": (REQUETE_RDV_DEPART, {"pk": "", "date": _DATE, "taille_lot": 1}),
+    "supprimer_rdv": (REQUETE_SUPPRIMER_RDV, {"id_rdv": ""}),
+    "update_status": (REQUETE_MAJ_STATUT, {"rid": "", "status": 0}),
+    "modifier_chaine": (
+        requete_modifier_chaine(),
+        {"id_chain": 0, "date": _DATE, "patch": {}, "patch_rappel": {},
+         "maj_heure": False, "heure": None}),
+    "tronquer_recurrences": (REQUETE_TRONQUER_RECURRENCES, {"id_chain": 0, "date": _DATE}),
+    "incrementer_sequence": (REQUETE_LIRE_SEQUENCE, {"nom": ""}),
+    "role_required": (REQUETE_ROLE, {"id": 0}),
+    "verify_user_in_neo4j": (REQUETE_UTILISATEUR, {"username": ""}),
+    "ajout_note": (
+        REQUETE_AJOUT_NOTE,
+        {"service": "", "metier": "", "date": _DATE, "heure": "", "contenu": ""}),
+}
+
+
+def ensure_schema(driver, NEO4J_DB="neo4j"):
+    """
+    Crée (si besoin) les contraintes et index du modèle, puis rejoue les
+    migrations de données dont dépendent les requêtes (ex. r.debut des Rdv
+    créés avant son introduction, sans quoi ils disparaîtraient des fiches
+    et des impressions).
+
+    Une contrainte d'unicité impossible à poser (doublons déjà en base)
+    est remplacée par un index simple sur la même propriété.
+
+    Returns:
+        list[tuple[str, str]]: (nom, statut) pour chaque élément du schéma
+        et chaque migration.
+    """
+    rapport = []
+    with driver.session(database=NEO4J_DB) as session:
+        for nom, instruction in CONTRAINTES:
+            try:
+                session.run(instruction).consume()
+                rapport.append((nom, "contrainte"))
+            except Neo4jError as e:
+                print(f"Contrainte {nom} impossible ({e}), index simple à la place")
+                session.run(INDEX_DE_REPLI[nom]).consume()
+                rapport.append((nom, "index (doublons en base)"))
+        for nom, instruction in INDEX:
+            session.run(instruction).consume()
+            rapport.append((nom, "index"))
+    for nom, nb in migrer_au_demarrage(driver, NEO4J_DB).items():
+        rapport.append((f"migration {nom}", f"{nb} éléments migrés"))
+    return rapport
+
+
+def _operateurs(plan):
+    """Liste à plat les opérateurs d'un plan d'exécution."""
+    if not plan:
+        return []
+    operateurs = [plan.get("operatorType", "").split("@")[0]]
+    for enfant in plan.get("children", []):
+        operateurs += _operateurs(enfant)
+    return operateurs
+
+
+def rapport_plans(driver, NEO4J_DB="neo4j"):
+    """
+    Lance un EXPLAIN sur les requêtes des services et indique celles
+    dont le plan s'appuie sur un index.
+
+    Returns:
+        dict: nom de la requête -> (utilise un index (bool), opérateurs d'accès).
+    """
+    rapport = {}
+    with driver.session(database=NEO4J_DB) as session:
+        for nom, (requete, params) in REQUETES_INDEXEES.items():
+            plan = session.run("EXPLAIN " + requete, **params).consume().plan
+            operateurs = _operateurs(plan)
+            acces = [op for op in operateurs if "Index" in op or "Scan" in op or "Seek" in op]
+            rapport[nom] = (any("Index" in op for op in acces), acces)
+    return rapport
+
+
+def afficher_rapport_plans(driver, NEO4J_DB="neo4j"):
+    for nom, (indexee, acces) in rapport_plans(driver, NEO4J_DB).items():
+        print(f"{'OK ' if indexee else '-- '} {nom} : {', '.join(acces)}")
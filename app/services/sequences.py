@@ -0,0 +1,94 @@
+"""
+Séquences d'identifiants atomiques stockées dans Neo4j.
+
+Chaque séquence est un noeud (:Sequence {nom, valeur}) incrémenté sous
+verrou dans la transaction d'écriture, ce qui évite le scan
+max(...)+1 et les doublons quand deux personnes valident en même temps.
+"""
+import os
+import threading
+
+
+# Requêtes utilisées une seule fois pour amorcer une séquence
+# à partir des données déjà présentes en base.
+_AMORCES = {
+    'rdv_chain': "MATCH ()-[rel:Rdv]->() RETURN coalesce(max(rel.id_chain), 0) AS valeur",
+    'auth_pk': "MATCH (n:Auth) RETURN coalesce(max(n.pk), 0) AS valeur",
+}
+
+REQUETE_LIRE_SEQUENCE = "MATCH (s:Sequence {nom: $nom}) RETURN s.valeur AS valeur"
+
+
+def incrementer_sequence(tx, nom, taille=1):
+    """
+    Réserve `taille` valeurs consécutives dans la séquence `nom`.
+
+    A appeler dans une transaction d'écriture (session.execute_write ou
+    depuis une autre fonction de transaction).
+
+    Args:
+        tx: Transaction Neo4j.
+        nom (str): Nom de la séquence.
+        taille (int): Nombre de valeurs à réserver.
+
+    Returns:
+        int: Première valeur réservée.
+    """
+    existe = tx.run(REQUETE_LIRE_SEQUENCE, nom=nom).single()
+    if existe is None:
+        amorce = _AMORCES.get(nom)
+        valeur = tx.run(amorce).single()['valeur'] if amorce else 0
+        tx.run("MERGE (s:Sequence {nom: $nom}) ON CREATE SET s.valeur = $valeur",
+               nom=nom, valeur=valeur)
+    # on pose le verrou en ecriture avant de relire la valeur (pas de mise a jour perdue)
+    record = tx.run("""
+        MATCH (s:Sequence {nom: $nom})
+        SET s._verrou = true
+        WITH s
+        SET s.valeur = s.valeur + $taille
+        REMOVE s._verrou
+        RETURN s.valeur AS fin
+    """, nom=nom, taille=taille).single()
+    return record['fin'] - taille + 1
+
+
+def valeur_sequence(driver, nom, NEO4J_DB="neo4j"):
+    """
+    Retourne la dernière valeur attribuée par la séquence `nom`
+    (0 si la séquence n'existe pas encore).
+    """
+    with driver.session(database=NEO4J_DB) as session:
+        record = session.run(REQUETE_LIRE_SEQUENCE, nom=nom).single()
+    return record['valeur'] if record else 0
+
+
+class AllocateurSequence:
+    """
+    Distribue les valeurs d'une séquence en gardant en cache, par processus,
+    un bloc de `taille_bloc` identifiants réservés d'un coup en base.
+
+    Avec taille_bloc=1 les identifiants restent contigus ; avec un bloc
+    plus grand on évite un aller-retour par identifiant, au prix de trous
+    dans la numérotation. Le cache est remis à zéro après un fork.
+    """
+
+    def __init__(self, nom, taille_bloc=1):
+        self.nom = nom
+        self.taille_bloc = max(1, int(taille_bloc))
+        self._verrou = threading.Lock()
+        self._pid = None
+        self._prochain = 0
+        self._fin = -1
+
+    def suivant(self, driver, NEO4J_DB="neo4j"):
+        with self._verrou:
+            if self._pid != os.getpid() or self._prochain > self._fin:
+                with driver.session(database=NEO4J_DB) as session:
+                    debut = session.execute_write(incrementer_sequence,
+                                                  self.nom, self.taille_bloc)
+                self._pid = os.getpid()
+                self._prochain = debut
+                self._fin = debut + self.taille_bloc - 1
+            valeur = self._prochain
+            self._prochain += 1
+            return valeur
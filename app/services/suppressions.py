@@ -0,0 +1,227 @@
+"""
+Suppressions en cascade : un rendez-vous, une chaîne de rendez-vous à
+partir d'une date, et départ d'un résident.
+
+Les suppressions volumineuses sont faites par lots (une transaction par
+lot de TAILLE_LOT éléments au plus) : elles ne bloquent pas longtemps les
+autres écritures, et une suppression interrompue peut être relancée. Les
+rappels d'un Rdv sont retrouvés par l'index rappel_id_rdv.
+"""
+import datetime
+import os
+
+from app.services.cache import invalider_cache, invalider_rdv, GROUPE_RESIDENTS, groupe_selles
+from app.services.recurrences import (est_id_occurrence,
+                                      annuler_occurrence,
+                                      tronquer_recurrences)
+
+
+TAILLE_LOT = int(os.getenv("SUPPRESSION_TAILLE_LOT", "5000"))
+
+
+def afficher_progression(nom, total):
+    print(f"{nom} : {total} éléments supprimés")
+
+
+def _par_lots(driver, cypher_query, params, taille_lot, nom, progression, NEO4J_DB):
+    """
+    Rejoue `cypher_query` (qui supprime au plus $taille_lot éléments et
+    renvoie leur nombre dans `nb`) jusqu'à ce qu'il n'y ait plus rien à supprimer.
+
+    Args:
+        progression (callable | None): Appelée après chaque lot avec
+            (nom, total supprimé jusque-là).
+
+    Returns:
+        int: Nombre total d'éléments supprimés.
+    """
+    total = 0
+    with driver.session(database=NEO4J_DB) as session:
+        while True:
+            nb = session.execute_write(
+                lambda tx: tx.run(cypher_query, taille_lot=taille_lot, **params).single()['nb'])
+            total += nb
+            if progression:
+                progression(nom, total)
+            if nb < taille_lot:
+                return total
+
+
+# deux recherches directes : par elementId pour la relation elle-meme,
+# par l'index rappel_id_rdv pour ses rappels
+REQUETE_SUPPRIMER_RDV = """
+    CALL {
+        MATCH ()-[s:Rappel]->()
+        WHERE s.id_rdv = $id_rdv
+        DELETE s
+    }
+    CALL {
+        MATCH ()-[r]->()
+        WHERE elementId(r) = $id_rdv
+        DELETE r
+    }
+"""
+
+
+def _supprimer_rdv_tx(tx, id_rdv):
+    tx.run(REQUETE_SUPPRIMER_RDV, id_rdv=id_rdv)
+
+
+def supprimer_rdv(driver,id_rdv, NEO4J_DB='neo4j'):
+    """
+    Supprime un rendez-vous (ou un rappel, une note) et ses rappels.
+
+    Args:
+        id_rdv (str): elementId de la relation, ou identifiant d'occurrence
+            de récurrence.
+    """
+    print("je tente de supprimer le rdv : ",id_rdv)
+    if est_id_occurrence(id_rdv):
+        # occurrence (ou rappel) d'une recurrence : exception sur la regle
+        annuler_occurrence(driver, id_rdv, NEO4J_DB)
+        return
+    with driver.session(database=NEO4J_DB) as session:
+        session.execute_write(_supprimer_rdv_tx, str(id_rdv))
+    invalider_rdv(driver, NEO4J_DB)
+
+
+# Rdv d'un lot et leurs rappels (par l'index rappel_id_rdv)
+_SUPPRIMER_LOT_RDV = """
+    WITH r LIMIT $taille_lot
+    CALL {
+        WITH r
+        MATCH ()-[s:Rappel]->()
+        WHERE s.id_rdv = elementId(r)
+        DELETE s
+    }
+    DELETE r
+    RETURN count(r) AS nb
+"""
+
+REQUETE_ANNULER_CHAINE = """
+    MATCH ()-[r:Rdv]->()
+    WHERE r.id_chain = $id_chain AND r.date >= date($date)
+""" + _SUPPRIMER_LOT_RDV
+
+REQUETE_RDV_DEPART = """
+    MATCH (:Resident {pk: $pk})-[r:Rdv]->()
+    WHERE r.date >= date($date)
+""" + _SUPPRIMER_LOT_RDV
+
+
+def annuler_chaine(driver, id_chain, date_iso, taille_lot=TAILLE_LOT,
+                   progression=afficher_progression, NEO4J_DB="neo4j"):
+    """
+    Supprime les rendez-vous d'une chaîne à partir de `date_iso` (incluse),
+    leurs rappels, et arrête les récurrences de la chaîne à cette date.
+
+    Returns:
+        int: Nombre de Rdv supprimés.
+    """
+    nb = _par_lots(driver, REQUETE_ANNULER_CHAINE, {'id_chain': id_chain, 'date': date_iso},
+        taille_lot, f"Chaîne {id_chain}", progression, NEO4J_DB)
+    # tronquer_recurrences vide aussi le cache du detail des rdv
+    tronquer_recurrences(driver, id_chain, date_iso, NEO4J_DB)
+    return nb
+
+
+def supprimer_rdv_chaine(driver, id_rdv,date, NEO4J_DB='neo4j'):
+    """
+    Supprime les rendez-vous d'une chaîne à partir d'une date.
+
+    Args:
+        id_rdv (int): id_chain de la chaîne.
+        date (str): Date de début au format JJ/MM/AAAA (éventuellement
+            suivie de l'heure).
+    """
+    id_rdv = int(id_rdv) if isinstance(id_rdv, str) else id_rdv
+    print("dates a supprimer : ",date)
+    date = date.split("T")[0].split(" ")[0]
+    date_iso = datetime.datetime.strptime(date, "%d/%m/%Y").strftime("%Y-%m-%d")
+    return annuler_chaine(driver, id_rdv, date_iso, NEO4J_DB=NEO4J_DB)
+
+
+def marquer_depart(driver, pk, date_depart=None, taille_lot=TAILLE_LOT,
+                   progression=afficher_progression, NEO4J_DB="neo4j"):
+    """
+    Départ d'un résident : il est marqué parti (date_depart) et disparaît
+    des listes du service, ses récurrences s'arrêtent la veille du départ
+    et ses rendez-vous à partir de cette date sont annulés par lots.
+    L'historique (rendez-vous passés, selles) est conservé et reste
+    consultable depuis sa fiche (get_residents_chambre(partis=True)).
+
+    Args:
+        date_depart (str, optional): Date AAAA-MM-JJ (aujourd'hui par défaut).
+
+    Returns:
+        dict: Nombre de Rdv et de rappels orphelins supprimés.
+
+    Raises:
+        ValueError: Résident introuvable.
+    """
+    date_depart = date_depart or datetime.date.today().isoformat()
+    with driver.session(database=NEO4J_DB) as session:
+        trouve = session.execute_write(lambda tx: tx.run("""
+            MATCH (n:Resident {pk: $pk})
+            SET n.date_depart = date($date)
+            WITH n, date($date) - duration('P1D') AS veille
+            CALL {
+                WITH n, veille
+                MATCH (n)-[:Planifie]->(rec:Recurrence)
+                WITH rec, veille, veille < rec.debut AS vide
+                FOREACH (_ IN CASE WHEN vide THEN [] ELSE [1] END |
+                    SET rec.fin = CASE WHEN rec.fin IS NULL OR rec.fin > veille THEN veille ELSE rec.fin END)
+                FOREACH (_ IN CASE WHEN vide THEN [1] ELSE [] END | DETACH DELETE rec)
+            }
+            RETURN count(n) AS nb
+        """, pk=pk, date=date_depart).single()['nb'])
+    if not trouve:
+        raise ValueError(f"Résident {pk} introuvable")
+    invalider_cache(GROUPE_RESIDENTS)
+    nb_rdv = _par_lots(driver, REQUETE_RDV_DEPART, {'pk': pk, 'date': date_depart},
+        taille_lot, f"Rdv de {pk}", progression, NEO4J_DB)
+    nb_rappels = _par_lots(driver, """
+        MATCH (:Resident {pk: $pk})-[s:Rappel]->()
+        WHERE s.date_evt >= date($date)
+        WITH s LIMIT $taille_lot
+        DELETE s
+        RETURN count(s) AS nb
+    """, {'pk': pk, 'date': date_depart}, taille_lot, f"Rappels de {pk}", progression, NEO4J_DB)
+    invalider_rdv(driver, NEO4J_DB)
+    return {'rdv': nb_rdv, 'rappels': nb_rappels}
+
+
+def delete_resident(driver, pk, NEO4J_DB="neo4j", taille_lot=TAILLE_LOT,
+                    progression=afficher_progression):
+    """
+    Supprime définitivement un résident, son historique (relations, selles)
+    et ses récurrences, par lots.
+
+    Returns:
+        int: Nombre d'éléments supprimés.
+    """
+    params = {'pk': pk}
+    total = _par_lots(driver, """
+        MATCH (m:Selles {pk: $pk})
+        WITH m LIMIT $taille_lot
+        DETACH DELETE m
+        RETURN count(m) AS nb
+    """, params, taille_lot, f"Selles de {pk}", progression, NEO4J_DB)
+    total += _par_lots(driver, """
+        MATCH (:Resident {pk: $pk})-[:Planifie]->(rec:Recurrence)
+        WITH rec LIMIT $taille_lot
+        DETACH DELETE rec
+        RETURN count(rec) AS nb
+    """, params, taille_lot, f"Récurrences de {pk}", progression, NEO4J_DB)
+    total += _par_lots(driver, """
+        MATCH (:Resident {pk: $pk})-[r]-()
+        WITH r LIMIT $taille_lot
+        DELETE r
+        RETURN count(r) AS nb
+    """, params, taille_lot, f"Relations de {pk}", progression, NEO4J_DB)
+    with driver.session(database=NEO4J_DB) as session:
+        session.execute_write(lambda tx: tx.run(
+            "MATCH (n:Resident {pk: $pk}) DETACH DELETE n", pk=pk).consume())
+    invalider_cache(GROUPE_RESIDENTS, groupe_selles(pk))
+    invalider_rdv(driver, NEO4J_DB)
+    return total + 1
@@ -0,0 +1,127 @@
+"""
+Données de la page /journee, récupérées en parallèle.
+
+Les requêtes des widgets sont indépendantes : elles partent toutes en même
+temps (un thread par widget et par page), chacune avec son propre délai
+compté à partir du moment où elle démarre. Le nombre de requêtes en cours
+pour l'ensemble des pages est borné par un sémaphore : au-delà, une
+requête attend une place au plus le délai d'un widget. Un widget dont la
+requête échoue, n'a pas pu démarrer ou dépasse le délai est affiché vide
+au lieu de faire tomber la page.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+
+import pandas as pd
+
+from app.services.neo4j_services import (
+    selles_non_enregistrees,
+    get_plusieurs_jours_selles,
+    get_personnel,
+    get_rdv_jour,
+    get_notes_service_jour,
+    get_rappels_jour,
+    get_recent_rdv
+)
+
+
+logger = logging.getLogger(__name__)
+
+TIMEOUT_WIDGET = float(os.getenv("JOURNEE_TIMEOUT", "5"))
+
+# requetes de widgets en cours dans ce processus, toutes pages confondues ;
+# une requete qui depasse son delai garde sa place jusqu'a ce qu'elle finisse
+_requetes_en_cours = threading.BoundedSemaphore(int(os.getenv("JOURNEE_REQUETES_MAX", "16")))
+
+# nom -> (fonction(driver, NEO4J_DB), valeur de repli)
+WIDGETS_JOURNEE = {
+    'manquants': (selles_non_enregistrees, list),
+    'plusieurs_jours': (get_plusieurs_jours_selles, pd.DataFrame),
+    'liste_service': (get_personnel, list),
+    'rdv': (get_rdv_jour, pd.DataFrame),
+    'notes_service': (get_notes_service_jour, pd.DataFrame),
+    'rappels': (get_rappels_jour, pd.DataFrame),
+    'recent_rdv': (get_recent_rdv, lambda: ([], [], [])),
+}
+
+
+class WidgetSature(Exception):
+    """Pas de place pour lancer la requête d'un widget dans le délai."""
+
+
+def _lancer(fonction, driver, NEO4J_DB, timeout, demarrage):
+    # demarrage['debut'] : instant ou la requete part (None si elle ne part pas)
+    if not _requetes_en_cours.acquire(timeout=timeout):
+        demarrage['pret'].set()
+        raise WidgetSature(f"plus de {timeout}s d'attente d'une place")
+    try:
+        demarrage['debut'] = time.monotonic()
+        demarrage['pret'].set()
+        return fonction(driver, NEO4J_DB)
+    finally:
+        _requetes_en_cours.release()
+
+
+def executer_en_parallele(driver, widgets, NEO4J_DB="neo4j", timeout=TIMEOUT_WIDGET):
+    """
+    Lance les requêtes `widgets` en parallèle.
+
+    Args:
+        widgets (dict): nom -> (fonction(driver, NEO4J_DB), fabrique de la valeur de repli).
+        timeout (float): Délai maximal de chaque requête à partir de son
+            démarrage (et de l'attente d'une place), en secondes.
+
+    Returns:
+        tuple: (dict nom -> résultat, liste des widgets en repli).
+    """
+    pool = ThreadPoolExecutor(max_workers=len(widgets), thread_name_prefix="journee")
+    lancees = {}
+    for nom, (fonction, _) in widgets.items():
+        demarrage = {'pret': threading.Event(), 'debut': None}
+        lancees[nom] = (pool.submit(_lancer, fonction, driver, NEO4J_DB, timeout, demarrage),
+                        demarrage)
+    # on n'attend pas les requetes hors delai : leurs threads finissent seuls
+    pool.shutdown(wait=False)
+    resultats, en_echec = {}, []
+    for nom, (future, demarrage) in lancees.items():
+        try:
+            demarrage['pret'].wait()
+            reste = None
+            if demarrage['debut'] is not None:
+                reste = max(0, demarrage['debut'] + timeout - time.monotonic())
+            resultats[nom] = future.result(timeout=reste)
+        except FuturesTimeout:
+            logger.warning("Widget %s : délai de %ss dépassé", nom, timeout)
+            resultats[nom] = widgets[nom][1]()
+            en_echec.append(nom)
+        except Exception as e:
+            logger.warning("Widget %s indisponible : %s", nom, e)
+            resultats[nom] = widgets[nom][1]()
+            en_echec.append(nom)
+    return resultats, en_echec
+
+
+def get_donnees_journee(driver, NEO4J_DB="neo4j", timeout=TIMEOUT_WIDGET):
+    """
+    Rassemble les données du tableau de bord /journee.
+
+    Returns:
+        dict: Variables du template recap_jour.html ('indisponibles' liste
+        les widgets dont la requête a échoué).
+    """
+    r, en_echec = executer_en_parallele(driver, WIDGETS_JOURNEE, NEO4J_DB, timeout)
+    nouveau_rdv, nom_resident, date_heure = r['recent_rdv']
+    return {
+        'rdv': r['rdv'],
+        'notes': pd.concat([r['notes_service'], r['rappels']], ignore_index=True),
+        'manquants': [x['nom'] for x in r['manquants']],
+        'plusieurs_jours': r['plusieurs_jours'],
+        'liste_service': r['liste_service'],
+        'nouveau_rdv': nouveau_rdv,
+        'nom_resident': nom_resident,
+        'date_heure': date_heure,
+        'indisponibles': en_echec,
+    }
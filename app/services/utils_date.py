@@ -1,6 +1,7 @@
 from dateutil.rrule import rrule, DAILY, WEEKLY, MONTHLY
 from datetime import date, timedelta, datetime, time
 import calendar
+import numpy as np
 
 
 def generate_dates(start, end, frequency):
@@ -35,24 +36,18 @@ def is_last_weekday_of_month(d):
 def get_nth_weekday_of_month(year, month, weekday, n):
     """Retourne la date du n-ième `weekday` dans un
     mois donné (si elle existe)"""
-    count = 0
-    for day in range(1, calendar.monthrange(year, month)[1] + 1):
-        current = date(year, month, day)
-        if current.weekday() == weekday:
-            count += 1
-            if count == n:
-                return current
-    return None
+    decalage = (weekday - date(year, month, 1).weekday()) % 7
+    jour = 1 + decalage + 7 * (n - 1)
+    if jour > calendar.monthrange(year, month)[1]:
+        return None
+    return date(year, month, jour)
 
 
 def get_last_weekday_of_month(year, month, weekday):
     """Retourne la date du dernier `weekday` dans un mois donné"""
     last_day = calendar.monthrange(year, month)[1]
-    for day in range(last_day, 0, -1):
-        current = date(year, month, day)
-        if current.weekday() == weekday:
-            return current
-    return None
+    recul = (date(year, month, last_day).weekday() - weekday) % 7
+    return date(year, month, last_day - recul)
 
 
 def get_weekday_occurrence(d):
@@ -61,59 +56,52 @@ def get_weekday_occurrence(d):
     return ((d.day - 1) // 7) + 1
 
 
-from datetime import datetime
-
-def generate_smart_weekday_recurrence(start_date, end_date):
+def iter_smart_weekday_recurrence(start_date, end_date, window_start=None):
     """
-    Génére une récurrence mensuelle intelligente (ex: 2e mardi de chaque mois)
-    entre `start_date` et `end_date`, en conservant uniquement l'heure et les minutes.
-
-    Args:
-        start_date (datetime): Date/heure de début.
-        end_date (datetime): Date/heure de fin.
-
-    Returns:
-        list[datetime]: Liste des datetimes générés.
+    Version générateur de generate_smart_weekday_recurrence : produit les
+    occurrences au fil de l'eau, un calcul en temps constant par mois.
+    `window_start` permet de sauter directement au mois de début d'une
+    fenêtre (le rang du jour reste celui de start_date).
     """
     weekday = start_date.weekday()
     is_last = is_last_weekday_of_month(start_date)
     nth = get_weekday_occurrence(start_date)
-
-    recurrence = []
-
-    current_year = start_date.year
-    current_month = start_date.month
-
-    # Extraire heure et minute depuis start_date
-    hour = start_date.hour
-    minute = start_date.minute
-
-    while True:
-        if datetime(current_year, current_month, 1) > end_date:
-            break
-
+    avec_heure = isinstance(start_date, datetime)
+    heure = time(start_date.hour, start_date.minute) if avec_heure else None
+
+    # index absolu du mois (annee * 12 + mois) pour avancer sans branche
+    mois = start_date.year * 12 + start_date.month - 1
+    if window_start is not None:
+        mois = max(mois, window_start.year * 12 + window_start.month - 1)
+    mois_fin = end_date.year * 12 + end_date.month - 1
+    while mois <= mois_fin:
+        year, month = divmod(mois, 12)
+        month += 1
         if is_last:
-            base_date = get_last_weekday_of_month(current_year,
-                                                  current_month, weekday)
+            base_date = get_last_weekday_of_month(year, month, weekday)
         else:
-            base_date = get_nth_weekday_of_month(current_year, 
-                                                 current_month, weekday, nth)
+            base_date = get_nth_weekday_of_month(year, month, weekday, nth)
 
         if base_date:
-            date_part = base_date.isoformat()  # Ex: '2025-08-20'
-            time_part = f"{hour:02}:{minute:02}"
-            recur_date = datetime.fromisoformat(f"{date_part}T{time_part}")
-
+            recur_date = datetime.combine(base_date, heure) if avec_heure else base_date
             if start_date <= recur_date <= end_date:
-                recurrence.append(recur_date)
+                yield recur_date
+        mois += 1
 
-        current_month += 1
-        if current_month > 12:
-            current_month = 1
-            current_year += 1
 
-    return recurrence
+def generate_smart_weekday_recurrence(start_date, end_date):
+    """
+    Génére une récurrence mensuelle intelligente (ex: 2e mardi de chaque mois)
+    entre `start_date` et `end_date`, en conservant uniquement l'heure et les minutes.
 
+    Args:
+        start_date (datetime): Date/heure de début.
+        end_date (datetime): Date/heure de fin.
+
+    Returns:
+        list[datetime]: Liste des datetimes générés.
+    """
+    return list(iter_smart_weekday_recurrence(start_date, end_date))
 
 
 def generate_day_recurrence(start_date, end_date, weekday):
@@ -145,6 +133,53 @@ def generate_day_recurrence(start_date, end_date, weekday):
     return recurrence
 
 
+JOURS_SEMAINE = {
+    'lundi': 0, 'mardi': 1, 'mercredi': 2, 'jeudi': 3,
+    'vendredi': 4, 'samedi': 5, 'dimanche': 6
+}
+
+
+def _weekday_numbers(weekday_names):
+    return sorted({JOURS_SEMAINE[w.lower()] for w in weekday_names
+                   if w and w.lower() in JOURS_SEMAINE})
+
+
+def multi_days_recurrence_array(start_date, end_date, weekday_names):
+    """
+    Calcule en bloc (NumPy) les jours compris entre start_date et end_date
+    inclus dont le jour de semaine est dans weekday_names.
+
+    Returns:
+        numpy.ndarray: Tableau datetime64[D] trié.
+    """
+    weekdays = _weekday_numbers(weekday_names)
+    debut = np.datetime64(_as_date(start_date), 'D')
+    fin = np.datetime64(_as_date(end_date), 'D')
+    if not weekdays or debut > fin:
+        return np.array([], dtype='datetime64[D]')
+    jours = np.arange(debut, fin + 1, dtype='datetime64[D]')
+    # le 1970-01-01 (jour 0) etait un jeudi (weekday 3)
+    jours_semaine = (jours.astype(np.int64) + 3) % 7
+    return jours[np.isin(jours_semaine, weekdays)]
+
+
+def iter_multi_days_recurrence(start_date, end_date, weekday_names):
+    """
+    Version générateur de generate_multi_days_recurrence : avance semaine
+    par semaine au lieu de jour par jour.
+    """
+    weekdays = _weekday_numbers(weekday_names)
+    if not weekdays:
+        return
+    lundi = start_date - timedelta(days=start_date.weekday())
+    while lundi <= end_date:
+        for wd in weekdays:
+            cur = lundi + timedelta(days=wd)
+            if start_date <= cur <= end_date:
+                yield cur
+        lundi += timedelta(weeks=1)
+
+
 def generate_multi_days_recurrence(start_date, end_date, weekday_names):
     """
     Génère toutes les dates correspondant à un ou plusieurs jours de semaine fixes (ex lundi, mardi..)
@@ -152,23 +187,69 @@ def generate_multi_days_recurrence(start_date, end_date, weekday_names):
     Args:
         start_date (date): Date de début.
         end_date (date): Date de fin.
-        weekday_names (list[int]): Jour de semaine (0=lundi, ..., 6=dimanche)
+        weekday_names (list[str]): Noms des jours ('lundi', ..., 'dimanche')
 
-    Retourne une liste de datetimes entre start_date et end_date inclus si le jour est dans weekday_names.
+    Retourne une liste de dates (ou de datetimes, avec l'heure de start_date)
+    entre start_date et end_date inclus si le jour est dans weekday_names.
     """
-    mapping = {
-        'lundi': 0, 'mardi': 1, 'mercredi': 2, 'jeudi': 3,
-        'vendredi': 4, 'samedi': 5, 'dimanche': 6
-    }
-    weekdays = {mapping[w.lower()] for w in weekday_names if w and w.lower() in mapping}
-    dates = []
-    # normaliser début/fin en datetime (déjà fait en extract_form_data)
-    cur = start_date
-    # on parcourt jour par jour
-    while cur <= end_date:
-        if cur.weekday() in weekdays:
-            dates.append(cur)
-        cur = cur + timedelta(days=1)
-    return dates
+    jours = multi_days_recurrence_array(start_date, end_date, weekday_names).tolist()
+    if isinstance(start_date, datetime):
+        dates = [datetime.combine(j, start_date.time()) for j in jours]
+        return [d for d in dates if start_date <= d <= end_date]
+    return jours
 
 
+def _as_date(d):
+    return d.date() if isinstance(d, datetime) else d
+
+
+def occurrences_recurrence(regle, debut, fin):
+    """
+    Développe paresseusement une règle de récurrence sur une fenêtre.
+
+    Args:
+        regle (dict): Règle stockée sur un noeud Recurrence :
+            - frequence (str): 'jour', 'semaine', 'mois' ou 'jourSpec'.
+            - debut (date): Première occurrence de la règle.
+            - ancre (date, optional): Date qui fixe le rythme (rang du jour
+              dans le mois, pas de 1 ou 7 jours) ; `debut` par défaut. Une
+              règle scindée garde l'ancre de la règle d'origine.
+            - fin (date | None): Dernière date possible (None = sans fin).
+            - jours (list[str]): Jours de semaine pour 'jourSpec'.
+            - exceptions (list[date]): Occurrences annulées ou déplacées.
+        debut (date): Début de la fenêtre demandée (inclus).
+        fin (date): Fin de la fenêtre demandée (incluse).
+
+    Yields:
+        date: Les occurrences de la règle comprises dans la fenêtre.
+    """
+    debut_regle = regle['debut']
+    ancre = regle.get('ancre') or debut_regle
+    borne_debut = max(debut, debut_regle)
+    borne_fin = min(fin, regle['fin']) if regle.get('fin') else fin
+    if borne_debut > borne_fin:
+        return
+    exceptions = set(regle.get('exceptions') or [])
+    frequence = regle['frequence']
+
+    if frequence == 'jourSpec':
+        dates = iter_multi_days_recurrence(borne_debut, borne_fin,
+                                           regle.get('jours') or [])
+    elif frequence == 'mois':
+        # le rang du jour (ex: 2e mardi) se deduit de l'ancre de la regle,
+        # on ne parcourt que les mois de la fenetre
+        dates = (d.date() for d in iter_smart_weekday_recurrence(
+            datetime.combine(ancre, time()),
+            datetime.combine(borne_fin, time()),
+            window_start=borne_debut))
+    else:
+        # pas fixe : on saute directement a la premiere occurrence de la fenetre
+        pas = 1 if frequence == 'jour' else 7
+        retard = (borne_debut - ancre).days
+        premier = ancre + timedelta(days=-(-retard // pas) * pas)
+        dates = (premier + timedelta(days=i * pas)
+                 for i in range((borne_fin - premier).days // pas + 1))
+
+    for d in dates:
+        if d >= borne_debut and d not in exceptions:
+            yield d
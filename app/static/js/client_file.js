@@ -147,17 +147,7 @@
         const popup = document.getElementById('impressionPopup');
         if (popup) popup.style.display = 'flex';
         if (!iframe) return;
-        fetch('/popup_row_pdf', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify(dataToSend)
-        })
-        .then(res => res.blob())
-        .then(blob => {
-            const url = URL.createObjectURL(blob);
-            iframe.src = url;
-        })
-        .catch(() => { iframe.srcdoc = "<p style='color:red'>Erreur lors de la génération du PDF.</p>"; });
+        window.chargerFichePdf(iframe, dataToSend);
     };
 
     window.openRowPopupAlt = function(rowData) {
@@ -179,7 +169,7 @@
                 if (match) diabete = match[1];
             }
         }
-        const dataToSend = Object.assign({}, rowData, { nom_resident: nomResident, oxygen: oxygen, diabete: diabete });
+        const dataToSend = Object.assign({}, rowData, { nom_resident: nomResident, oxygen: oxygen, diabete: diabete, pk: (window.clientFileConfig || {}).pk });
         const popup = document.getElementById('rowPopupOverlayAlt');
         const content = document.getElementById('rowPopupContentAlt');
         if (content) content.innerHTML = 'Chargement...';
@@ -293,22 +283,31 @@
     window.closeImpressionPopup = closeImpressionPopup;
     window.printIframe = printIframe;
 
-    // DF / row-level PDF flow (keeps separate modal 'impressionPopupDF' if present)
-    window.openImpressionPopupDF = function(rowData) {
-        var popup = document.getElementById('impressionPopupDF') || document.getElementById('impressionPopup');
-        var iframe = document.getElementById('pdfIframe');
-        if (popup) popup.style.display = 'flex';
-        if (!iframe) return;
+    // Fiche PDF d'une ligne : par id (GET, revalidee par ETag) si la ligne en a un
+    window.chargerFichePdf = function(iframe, data) {
+        if (data && data.Id) {
+            iframe.src = '/popup_row_pdf?id=' + encodeURIComponent(data.Id);
+            return;
+        }
         fetch('/popup_row_pdf', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify(rowData || {})
+            body: JSON.stringify(data || {})
         })
         .then(function(res){ return res.blob(); })
         .then(function(blob){ var url = URL.createObjectURL(blob); iframe.src = url; })
         .catch(function(err){ console.error(err); iframe.srcdoc = "<p style='color:red'>Erreur lors de la génération du PDF.</p>"; });
     };
 
+    // DF / row-level PDF flow (keeps separate modal 'impressionPopupDF' if present)
+    window.openImpressionPopupDF = function(rowData) {
+        var popup = document.getElementById('impressionPopupDF') || document.getElementById('impressionPopup');
+        var iframe = document.getElementById('pdfIframe');
+        if (popup) popup.style.display = 'flex';
+        if (!iframe) return;
+        window.chargerFichePdf(iframe, rowData);
+    };
+
     window.closeImpressionPopupDF = function() {
         var popup = document.getElementById('impressionPopupDF') || document.getElementById('impressionPopup');
         if (popup) popup.style.display = 'none';
@@ -380,7 +379,7 @@
                     const response = await fetch("/delete_resident", { method: "POST", body: formData });
                     const data = await response.json();
                     if (data.success) {
-                        showPopup("✅ Résident supprimé avec succès !", "success");
+                        showPopup(formData.get("supprimer_historique") ? "✅ Résident supprimé avec succès !" : "✅ Départ du résident enregistré.", "success");
                         departPopup.style.display = "none";
                         this.reset();
                     } else {
@@ -475,14 +474,14 @@ if (showBtn) {
             const carte = document.querySelector('.fiche-carte .client-list') || document.querySelector('.fiche-carte');
             if (carte) { const titre = carte.querySelector('div[style*="font-size: 1.5em"]'); if (titre) nomResident = titre.textContent.trim(); const oxyDiv = Array.from(carte.querySelectorAll('div')).find(div => div.textContent && div.textContent.includes('O₂')); if (oxyDiv) { const match = oxyDiv.textContent.match(/O₂\s*:\s*(Oui|Non)/i); if (match) oxygen = match[1]; } const diabDiv = Array.from(carte.querySelectorAll('div')).find(div => div.textContent && div.textContent.includes('Diabète')); if (diabDiv) { const match = diabDiv.textContent.match(/Diabète\s*:\s*(Oui|Non)/i); if (match) diabete = match[1]; } }
             const dataToSend = Object.assign({}, rowData, { nom_resident: nomResident, oxygen: oxygen, diabete: diabete });
-            const iframe = document.getElementById('pdfIframe'); if (!iframe) return; document.getElementById('impressionPopup').style.display = 'flex'; fetch('/popup_row_pdf', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(dataToSend) }).then(res => res.blob()).then(blob => { const url = URL.createObjectURL(blob); iframe.src = url; }).catch(()=>{ iframe.srcdoc = "<p style='color:red'>Erreur lors de la génération du PDF.</p>"; });
+            const iframe = document.getElementById('pdfIframe'); if (!iframe) return; document.getElementById('impressionPopup').style.display = 'flex'; window.chargerFichePdf(iframe, dataToSend);
         };
 
         window.openRowPopupAlt = function(rowData) {
             let nomResident = '', oxygen = '', diabete = '';
             const carte = document.querySelector('.fiche-carte .client-list') || document.querySelector('.fiche-carte');
             if (carte) { const titre = carte.querySelector('div[style*="font-size: 1.5em"]'); if (titre) nomResident = titre.textContent.trim(); const oxyDiv = Array.from(carte.querySelectorAll('div')).find(div => div.textContent && div.textContent.includes('O₂')); if (oxyDiv) { const match = oxyDiv.textContent.match(/O₂\s*:\s*(Oui|Non)/i); if (match) oxygen = match[1]; } const diabDiv = Array.from(carte.querySelectorAll('div')).find(div => div.textContent && div.textContent.includes('Diabète')); if (diabDiv) { const match = diabDiv.textContent.match(/Diabète\s*:\s*(Oui|Non)/i); if (match) diabete = match[1]; } }
-            const dataToSend = Object.assign({}, rowData, { nom_resident: nomResident, oxygen: oxygen, diabete: diabete });
+            const dataToSend = Object.assign({}, rowData, { nom_resident: nomResident, oxygen: oxygen, diabete: diabete, pk: (window.clientFileConfig || {}).pk });
             const popup = document.getElementById('rowPopupOverlayAlt'); const content = document.getElementById('rowPopupContentAlt'); if (!popup || !content) return; content.innerHTML = 'Chargement...'; popup.style.display = 'flex'; fetch('/popup_row_alt', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(dataToSend) }).then(r => r.text()).then(html => { content.innerHTML = html; }).catch(()=>{ content.innerHTML = '<div style="color:red;">Erreur de chargement.</div>'; });
         };
         window.closeRowPopupAlt = function() { const p = document.getElementById('rowPopupOverlayAlt'); if (p) p.style.display = 'none'; };
@@ -499,6 +498,7 @@ if (showBtn) {
         document.querySelectorAll('.dots-btn-alt[data-row-alt]').forEach(btn => { btn.addEventListener('click', function(e) { e.stopPropagation(); try { const rowData = JSON.parse(this.getAttribute('data-row-alt')); openRowPopupAlt(rowData); } catch (err) { alert('Erreur lors de l\'ouverture de la fiche (alt) : données invalides.'); } }); });
 
         // Calendar (use cfg.nodes if provided)
+        let calendrierResident = null;
         (function initCalendar() {
             const calendarEl = document.getElementById('calendar');
             const rawEvents = Array.isArray(cfg.nodes) ? cfg.nodes : [];
@@ -520,9 +520,71 @@ if (showBtn) {
                     }
                 });
                 calendar.render();
+                calendrierResident = calendar;
             }
         })();
 
+        // Planning paginé : l'historique plus ancien se charge en remontant
+        // (avec la case Historique), les rdv suivants en descendant
+        function lierBoutonsLignes(rows) {
+            rows.forEach(tr => {
+                tr.querySelectorAll('.dots-btn[data-row]').forEach(btn => { btn.addEventListener('click', function(e) { e.stopPropagation(); try { const rowData = JSON.parse(this.getAttribute('data-row')); if (typeof openImpressionPopupDF === 'function') openImpressionPopupDF(rowData); else openPDFPopup(rowData); } catch (err) { alert('Erreur lors de l\'ouverture de la fiche : données invalides.'); } }); });
+                tr.querySelectorAll('.dots-btn-alt[data-row-alt]').forEach(btn => { btn.addEventListener('click', function(e) { e.stopPropagation(); try { const rowData = JSON.parse(this.getAttribute('data-row-alt')); openRowPopupAlt(rowData); } catch (err) { alert('Erreur lors de l\'ouverture de la fiche (alt) : données invalides.'); } }); });
+            });
+        }
+
+        const curseurs = { passe: cfg.curseurPasse || null, a_venir: cfg.curseurAVenir || null };
+        const enCours = { passe: false, a_venir: false };
+        const sentinelles = { passe: document.getElementById('sentinelleHistorique'), a_venir: document.getElementById('sentinelleAVenir') };
+
+        function majSentinelles() {
+            if (sentinelles.passe) sentinelles.passe.style.display = (historiqueMode && curseurs.passe) ? '' : 'none';
+            if (sentinelles.a_venir) sentinelles.a_venir.textContent = curseurs.a_venir ? 'Chargement des rendez-vous suivants…' : '';
+        }
+
+        function chargerPageRdv(sens) {
+            const table = document.getElementById('planningTable');
+            if (!table || !cfg.pk || !curseurs[sens] || enCours[sens]) return;
+            enCours[sens] = true;
+            const params = new URLSearchParams({ pk: cfg.pk, sens: sens, curseur: curseurs[sens] });
+            fetch(cfg.urlPageRdv + '?' + params.toString(), { headers: { 'X-Requested-With': 'XMLHttpRequest' } })
+                .then(r => { if (!r.ok) throw new Error(r.status); return r.json(); })
+                .then(data => {
+                    const tbody = table.querySelector('tbody');
+                    const modele = document.createElement('tbody');
+                    modele.innerHTML = data.html;
+                    const rows = Array.from(modele.children);
+                    if (sens === 'passe') {
+                        // page en ordre decroissant : la plus recente juste au-dessus des lignes affichees
+                        const hauteur = table.offsetHeight;
+                        rows.forEach(tr => tbody.insertBefore(tr, tbody.firstChild));
+                        window.scrollBy(0, table.offsetHeight - hauteur);
+                    } else {
+                        rows.forEach(tr => tbody.appendChild(tr));
+                    }
+                    lierBoutonsLignes(rows);
+                    filterPlanningRows(historiqueMode);
+                    if (calendrierResident) {
+                        (data.nodes || []).forEach(ev => calendrierResident.addEvent({ title: ev['Rendez-vous'] || 'Rendez-vous', start: ev.Date || null, description: ev['Note'] || '<Aucun commentaire>' }));
+                    }
+                    curseurs[sens] = data.curseur || null;
+                })
+                .catch(() => { curseurs[sens] = null; })
+                .finally(() => { enCours[sens] = false; majSentinelles(); });
+        }
+
+        if ('IntersectionObserver' in window) {
+            const observateur = new IntersectionObserver(entries => {
+                entries.forEach(entry => {
+                    if (!entry.isIntersecting) return;
+                    chargerPageRdv(entry.target === sentinelles.passe ? 'passe' : 'a_venir');
+                });
+            });
+            Object.values(sentinelles).forEach(el => { if (el) observateur.observe(el); });
+        }
+        if (historiqueCheckbox) historiqueCheckbox.addEventListener('change', majSentinelles);
+        majSentinelles();
+
         // Format naissance if provided
         try {
             const naissanceStr = cfg.naissance || '';
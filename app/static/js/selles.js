@@ -14,13 +14,79 @@ function closeSellesPopup() {
     document.getElementById('sellesPopup').style.display = 'none';
 }
 
+// File locale des saisies : conservée tant que le serveur ne les a pas reçues
+// (wifi instable), renvoyée avec la même clé pour ne jamais être appliquée deux fois.
+const CLE_FILE_SELLES = 'selles_file_attente';
+
+function lireFileSelles() {
+    try {
+        return JSON.parse(localStorage.getItem(CLE_FILE_SELLES)) || [];
+    } catch (e) {
+        return [];
+    }
+}
+
+function ecrireFileSelles(file) {
+    localStorage.setItem(CLE_FILE_SELLES, JSON.stringify(file));
+}
+
+function nouvelleCleSelles() {
+    if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+    return Date.now().toString(36) + '-' + Math.random().toString(36).slice(2);
+}
+
+function dateLocaleIso() {
+    const d = new Date();
+    return `${d.getFullYear()}-${String(d.getMonth() + 1).padStart(2, '0')}-${String(d.getDate()).padStart(2, '0')}`;
+}
+
+let envoiSellesEnCours = null;
+
+// session expirée : login_required redirige vers la page de connexion (fetch suit la redirection)
+class SessionExpiree extends Error {}
+
+function estSessionExpiree(response) {
+    return response.status === 401
+        || (response.redirected && new URL(response.url).pathname.startsWith('/auth/login'));
+}
+
+function envoyerFileSelles() {
+    if (envoiSellesEnCours) return envoiSellesEnCours;
+    const file = lireFileSelles();
+    if (file.length === 0) return Promise.resolve({ envoyees: 0, erreurs: [] });
+
+    envoiSellesEnCours = fetch("/selles/sync", {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'X-Requested-With': 'XMLHttpRequest'
+        },
+        body: JSON.stringify({ entrees: file })
+    })
+    .then(response => {
+        if (estSessionExpiree(response)) throw new SessionExpiree();
+        if (!response.ok) throw new Error('HTTP ' + response.status);
+        return response.json();
+    })
+    .then(result => {
+        // on ne retire que les entrées traitées ; celles ajoutées pendant l'envoi restent
+        const traitees = new Set(result.resultats.map(r => r.cle));
+        ecrireFileSelles(lireFileSelles().filter(e => !traitees.has(e.cle)));
+        const erreurs = result.resultats.filter(r => r.statut === 'erreur'
+            || (r.statut === 'doublon' && r.resultat_initial === 'erreur'));
+        return { envoyees: traitees.size, erreurs: erreurs };
+    })
+    .finally(() => { envoiSellesEnCours = null; });
+    return envoiSellesEnCours;
+}
+
 function enregistre_selles() {
     const lignes = document.querySelectorAll('#sellesPopupContent tbody tr');
-    const data = {};
+    const jour = dateLocaleIso();
+    const file = lireFileSelles();
 
     lignes.forEach(row => {
         
-        const nom = row.querySelector('td:first-child').innerText.trim();
         const pk = row.querySelector('td:last-child').innerText.trim();
         const safe_nom = pk.replace(/ /g, "_");
 
@@ -29,30 +95,41 @@ function enregistre_selles() {
         const apres_midi = document.getElementById(`${safe_nom}-apres_midi-select`).value;
         const note = row.querySelector('input[type="text"]').value;
 
-        data[nom] = {
+        if (nuit === '--' && matin === '--' && apres_midi === '--') return;
+        file.push({
+            cle: nouvelleCleSelles(),
             pk: pk,
+            date: jour,
             nuit: nuit,
             matin: matin,
             apres_midi: apres_midi,
             commentaire: note
-        };
+        });
     });
+    ecrireFileSelles(file);
 
-    fetch("/enregistre_selles", {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json',
-            'X-Requested-With': 'XMLHttpRequest'
-        },
-        body: JSON.stringify(data)
-    })
-    .then(response => response.json())
+    envoyerFileSelles()
     .then(result => {
-        alert(result.message);
+        if (result.erreurs.length > 0) {
+            alert('Saisies refusées : ' + result.erreurs.map(r => r.message).join(', '));
+        } else {
+            alert('Données enregistrées avec succès');
+        }
         closeSellesPopup();
     })
     .catch(error => {
         console.error('Erreur:', error);
-        alert("Erreur lors de l'enregistrement");
+        if (error instanceof SessionExpiree) {
+            alert(`Session expirée : reconnectez-vous, ${lireFileSelles().length} saisie(s) en attente seront envoyées ensuite`);
+            closeSellesPopup();
+            return;
+        }
+        alert(`Hors connexion : ${lireFileSelles().length} saisie(s) en attente, envoi automatique au retour du réseau`);
+        closeSellesPopup();
     });
 }
+
+// renvoi de la file au retour du réseau, au chargement et périodiquement
+window.addEventListener('online', () => envoyerFileSelles().catch(() => {}));
+document.addEventListener('DOMContentLoaded', () => envoyerFileSelles().catch(() => {}));
+setInterval(() => { if (navigator.onLine) envoyerFileSelles().catch(() => {}); }, 30000);
@@ -0,0 +1,133 @@
+"""
+Benchmark du contrôle de rôle (role_required) : une requête Auth par appel
+protégé (version d'origine) contre le rôle porté par la session, tamponné
+par role_version. La base est simulée par un driver qui ajoute une latence
+fixe à chaque aller-retour et compte les requêtes.
+
+    python -m benchmarks.bench_auth [--appels N] [--latence-ms L]
+"""
+import argparse
+import time
+from collections import Counter
+from functools import wraps
+
+from flask import Flask, redirect, session
+
+from app.routes import auth
+from app.services.cache import GROUPE_ROLES, invalider_cache
+from app.services.neo4j_services import REQUETE_ROLE
+from app.services.sequences import REQUETE_LIRE_SEQUENCE
+
+
+ROLE = 'admin'
+VERSION_ROLES = 3
+
+
+class _Resultat:
+    def __init__(self, record):
+        self._record = record
+
+    def single(self):
+        return self._record
+
+
+class DriverSimule:
+    """Répond à REQUETE_ROLE et REQUETE_LIRE_SEQUENCE après `latence` secondes."""
+
+    def __init__(self, latence):
+        self.latence = latence
+        self.requetes = Counter()
+
+    def session(self, database=None):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, requete, **params):
+        time.sleep(self.latence)
+        if requete == REQUETE_ROLE:
+            self.requetes['role'] += 1
+            return _Resultat({'role': ROLE})
+        if requete == REQUETE_LIRE_SEQUENCE:
+            self.requetes['role_version'] += 1
+            return _Resultat({'valeur': VERSION_ROLES})
+        raise AssertionError(f"requête inattendue : {requete}")
+
+
+def role_required_origine(*required_role):
+    """role_required d'origine : le rôle est relu en base à chaque appel."""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if "user_id" not in session:
+                return redirect("/auth/login")
+            with auth.driver.session(database=auth.NEO4J_DB) as neo_session:
+                result = neo_session.run(REQUETE_ROLE, id=session["user_id"]).single()
+                if not result or result["role"] not in required_role:
+                    return redirect("/auth/unauthorized")
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+
+def _application():
+    app = Flask(__name__)
+    app.secret_key = 'benchmark'
+
+    @app.route('/origine')
+    @role_required_origine(ROLE)
+    def origine():
+        return 'ok'
+
+    @app.route('/session')
+    @auth.role_required(ROLE)
+    def par_session():
+        return 'ok'
+
+    return app
+
+
+def _mesurer(app, driver, chemin, appels, avant_appel=None):
+    """Durée moyenne (en ms) d'un appel protégé et requêtes émises par appel."""
+    invalider_cache(GROUPE_ROLES)
+    driver.requetes.clear()
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+    debut = time.perf_counter()
+    for _ in range(appels):
+        if avant_appel:
+            avant_appel()
+        assert client.get(chemin).status_code == 200
+    duree = (time.perf_counter() - debut) / appels * 1000
+    return duree, {nom: n / appels for nom, n in sorted(driver.requetes.items())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--appels', type=int, default=500)
+    parser.add_argument('--latence-ms', type=float, default=2.0)
+    args = parser.parse_args()
+    driver = DriverSimule(args.latence_ms / 1000)
+    auth.driver = driver
+    app = _application()
+    cas = [
+        ("origine (rôle relu à chaque appel)", '/origine', None),
+        ("session, version en cache", '/session', None),
+        # pire cas : le TTL de role_version expire entre chaque appel
+        ("session, version relue à chaque appel", '/session',
+         lambda: invalider_cache(GROUPE_ROLES)),
+    ]
+    print(f"{'cas':<40} {'ms / appel':>11} requêtes / appel")
+    for nom, chemin, avant_appel in cas:
+        duree, requetes = _mesurer(app, driver, chemin, args.appels, avant_appel)
+        detail = ', '.join(f"{cle}={n:.3f}" for cle, n in requetes.items())
+        print(f"{nom:<40} {duree:>11.3f} {detail}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Benchmark du popup de saisie des selles (GET /enregistre_selles) : ancienne
+construction (masques pandas par résident et par moment, HTML concaténé)
+contre lignes_tableau_selles + templates/selles_popup.html, sur des
+données synthétiques de 50, 200 et 1000 résidents.
+
+    python -m benchmarks.bench_selles_popup [--repetitions N]
+"""
+import argparse
+import random
+import timeit
+
+import pandas as pd
+from flask import Flask, render_template
+
+from app.services.neo4j_services import lignes_tableau_selles, OPTIONS_SELLES
+
+
+TAILLES = (50, 200, 1000)
+MOMENTS = ['nuit', 'matin', 'apres_midi']
+
+
+def donnees_synthetiques(nb_residents, graine=0):
+    """(noms, prenoms, pks) et lignes de get_selles_du_jour pour `nb_residents`."""
+    rng = random.Random(graine)
+    aujourdhui = pd.Timestamp.today().normalize()
+    noms, prenoms, pks, selles = [], [], [], []
+    for i in range(nb_residents):
+        nom, prenom, pk = f"NOM{i:04d}", f"Prenom {i}", f"NOM{i:04d}_Prenom_{i}"
+        noms.append(nom)
+        prenoms.append(prenom)
+        pks.append(pk)
+        verifs = {m: aujourdhui if rng.random() < 0.5 else None for m in MOMENTS}
+        saisis = [m for m in MOMENTS if rng.random() < 0.6]
+        for moment in saisis or [None]:
+            selles.append({
+                'nom': nom, 'prenom': prenom, 'pk': pk, 'moment': moment,
+                'caracteristique': rng.choice(OPTIONS_SELLES[1:]) if moment else None,
+                'commentaire': f"note {i}" if moment and rng.random() < 0.3 else None,
+                **verifs,
+            })
+    return (noms, prenoms, pks), selles
+
+
+def popup_origine(residents, selles_du_jour):
+    """Ancienne construction du popup (sans les print du DataFrame)."""
+    df_selles_du_jour = pd.DataFrame(selles_du_jour)
+    aujourdhui = pd.Timestamp.today().normalize()
+    cols_dates = ['nuit', 'matin', 'apres_midi']
+    df_selles_du_jour[cols_dates] = df_selles_du_jour[cols_dates].where(
+        df_selles_du_jour[cols_dates] == aujourdhui, None)
+    for col in cols_dates:
+        df_none = df_selles_du_jour[df_selles_du_jour[col].isna()].copy()
+        df_none["caracteristique"] = "--"
+        df_none["moment"] = col
+        df_selles_du_jour = pd.concat([df_selles_du_jour, df_none], ignore_index=True)
+    noms, prenoms, pks = residents
+
+    def options_html(selected_value):
+        return '\n'.join([
+            f'<option value="{opt}"{" selected" if opt == selected_value else ""}>{opt}</option>'
+            for opt in OPTIONS_SELLES
+        ])
+
+    def get_val(pk, moment):
+        val = df_selles_du_jour.loc[
+            (df_selles_du_jour['pk'] == pk) & (df_selles_du_jour['moment'] == moment),
+            'caracteristique'
+        ].values
+        return val[0] if len(val) > 0 else "--"
+
+    table_html = '<table><tbody>'
+    for nom, prenom, pk in zip(noms, prenoms, pks):
+        valeur_nuit = get_val(pk, 'nuit')
+        valeur_matin = get_val(pk, 'matin')
+        valeur_apres_midi = get_val(pk, 'apres_midi')
+        commentaire = df_selles_du_jour.loc[
+            (df_selles_du_jour['nom'] == nom) & (df_selles_du_jour['prenom'] == prenom),
+            'commentaire'
+        ].values
+        commentaire = commentaire[0] if len(commentaire) > 0 else ""
+        commentaire = commentaire if commentaire is not None else ""
+        nom_complet = f"{nom.replace(' ', '-')} {prenom.replace(' ', '-')}"
+        safe_nom = pk.replace(' ', '_')
+        table_html += f'''
+        <tr>
+            <td>{nom_complet}</td>
+            <td><select id="{safe_nom}-nuit-select">{options_html(valeur_nuit)}</select></td>
+            <td><select id="{safe_nom}-matin-select">{options_html(valeur_matin)}</select></td>
+            <td><select id="{safe_nom}-apres_midi-select">{options_html(valeur_apres_midi)}</select></td>
+            <td><input type="text" value="{commentaire}" placeholder="Note..."></td>
+            <td style="display:none;">{pk}</td>
+        </tr>
+        '''
+    return table_html + '</tbody></table>'
+
+
+def popup_nouveau(residents, selles_du_jour):
+    return render_template('selles_popup.html',
+                           lignes=lignes_tableau_selles(residents, selles_du_jour),
+                           options=OPTIONS_SELLES)
+
+
+def _mesurer(fonction, repetitions):
+    """Meilleur temps d'un appel (en ms) sur `repetitions` séries."""
+    nombre, _ = timeit.Timer(fonction).autorange()
+    meilleur = min(timeit.Timer(fonction).repeat(repeat=repetitions, number=nombre))
+    return meilleur / nombre * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repetitions', type=int, default=3)
+    args = parser.parse_args()
+    flask_app = Flask('app')
+    with flask_app.app_context():
+        # premier rendu : compilation du template, hors mesure
+        popup_nouveau(*donnees_synthetiques(1))
+        print(f"{'résidents':>10} {'origine (ms)':>13} {'nouveau (ms)':>13} {'gain':>7}")
+        for taille in TAILLES:
+            residents, selles = donnees_synthetiques(taille)
+            t_origine = _mesurer(lambda: popup_origine(residents, selles), args.repetitions)
+            t_nouveau = _mesurer(lambda: popup_nouveau(residents, selles), args.repetitions)
+            print(f"{taille:>10} {t_origine:>13.1f} {t_nouveau:>13.1f} {t_origine / t_nouveau:>6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
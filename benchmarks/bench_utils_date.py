@@ -0,0 +1,73 @@
+"""
+Benchmark du moteur de récurrence de utils_date contre les implémentations
+d'origine (tests/reference_utils_date.py), sur des horizons de plusieurs
+années.
+
+    python -m benchmarks.bench_utils_date [--repetitions N]
+"""
+import argparse
+import timeit
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from app.services import utils_date
+from tests import reference_utils_date as reference
+
+
+HORIZONS_ANS = (1, 5, 10, 30)
+JOURS = ['lundi', 'mercredi', 'vendredi']
+
+
+def _mesurer(fonction, repetitions):
+    """Meilleur temps d'un appel (en ms) sur `repetitions` séries."""
+    nombre, _ = timeit.Timer(fonction).autorange()
+    meilleur = min(timeit.Timer(fonction).repeat(repeat=repetitions, number=nombre))
+    return meilleur / nombre * 1000
+
+
+def _cas(ans):
+    debut = date(2025, 1, 6)
+    fin = debut + timedelta(days=365 * ans)
+    debut_h = datetime(2025, 1, 14, 10, 30)
+    fin_h = debut_h + timedelta(days=365 * ans)
+    regle = {'frequence': 'jourSpec', 'debut': debut, 'fin': None,
+             'jours': JOURS, 'exceptions': []}
+    return [
+        ("jours de semaine (liste)",
+         lambda: reference.generate_multi_days_recurrence(debut, fin, JOURS),
+         lambda: utils_date.generate_multi_days_recurrence(debut, fin, JOURS)),
+        ("jours de semaine (tableau NumPy)",
+         lambda: reference.generate_multi_days_recurrence(debut, fin, JOURS),
+         lambda: utils_date.multi_days_recurrence_array(debut, fin, JOURS)),
+        ("jours de semaine (générateur)",
+         lambda: reference.generate_multi_days_recurrence(debut, fin, JOURS),
+         lambda: list(utils_date.iter_multi_days_recurrence(debut, fin, JOURS))),
+        ("n-ième jour du mois",
+         lambda: reference.generate_smart_weekday_recurrence(debut_h, fin_h),
+         lambda: utils_date.generate_smart_weekday_recurrence(debut_h, fin_h)),
+        ("règle jourSpec, dernier mois de l'horizon",
+         lambda: [d for d in reference.generate_multi_days_recurrence(debut, fin, JOURS)
+                  if d > fin - timedelta(days=31)],
+         lambda: list(utils_date.occurrences_recurrence(regle, fin - timedelta(days=30), fin))),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repetitions', type=int, default=5)
+    args = parser.parse_args()
+    print(f"{'cas':<42} {'horizon':>8} {'origine (ms)':>13} {'nouveau (ms)':>13} {'gain':>7}")
+    for ans in HORIZONS_ANS:
+        for nom, origine, nouveau in _cas(ans):
+            resultat = nouveau()
+            resultat = resultat.tolist() if isinstance(resultat, np.ndarray) else resultat
+            assert resultat == origine(), nom
+            t_origine = _mesurer(origine, args.repetitions)
+            t_nouveau = _mesurer(nouveau, args.repetitions)
+            print(f"{nom:<42} {ans:>6} an {t_origine:>13.3f} {t_nouveau:>13.3f} "
+                  f"{t_origine / t_nouveau:>6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,7 @@
-from neo4j import GraphDatabase
 import time
 import os
+from app.services.neo4j_driver import configurer, get_driver
+from app.services.schema import ensure_schema, afficher_rapport_plans
 
 uri = os.environ.get("NEO4J_URI", "bolt://neo4j:7687")
 user = os.environ.get("NEO4J_USER", "neo4j")
@@ -54,12 +55,18 @@ CREATE (:Service {nom: catego});
 
         
 if __name__ == "__main__":
-    driver = GraphDatabase.driver(uri, auth=(user, password))
+    configurer(NEO4J_URI=uri, NEO4J_USER=user, NEO4J_PASSWORD=password)
+    driver = get_driver()
     if wait_for_neo4j(driver):
         if is_db_empty(driver):
             print("Base vide, insertion des données initiales...")
             init_db(driver)
         else:
             print("Base déjà remplie, rien à faire.")
+        print("Vérification des contraintes et index...")
+        for nom, statut in ensure_schema(driver):
+            print(f"  {nom} : {statut}")
+        print("Requêtes des services appuyées sur un index :")
+        afficher_rapport_plans(driver)
     else:
         print("Échec de connexion à Neo4j.")
@@ -0,0 +1,107 @@
+"""
+Implémentations d'origine de app/services/utils_date.py (boucles jour par
+jour, aller-retour par des chaînes ISO), gardées telles quelles comme
+référence pour les tests d'équivalence et les benchmarks.
+"""
+from datetime import date, timedelta, datetime
+import calendar
+
+
+def is_last_weekday_of_month(d):
+    """Retourne True si la date `d` est le dernier jour de semaine
+     de ce type dans son mois"""
+    next_week = d + timedelta(days=7)
+    return next_week.month != d.month and next_week.weekday() == d.weekday()
+
+
+def get_nth_weekday_of_month(year, month, weekday, n):
+    """Retourne la date du n-ième `weekday` dans un
+    mois donné (si elle existe)"""
+    count = 0
+    for day in range(1, calendar.monthrange(year, month)[1] + 1):
+        current = date(year, month, day)
+        if current.weekday() == weekday:
+            count += 1
+            if count == n:
+                return current
+    return None
+
+
+def get_last_weekday_of_month(year, month, weekday):
+    """Retourne la date du dernier `weekday` dans un mois donné"""
+    last_day = calendar.monthrange(year, month)[1]
+    for day in range(last_day, 0, -1):
+        current = date(year, month, day)
+        if current.weekday() == weekday:
+            return current
+    return None
+
+
+def get_weekday_occurrence(d):
+    """Retourne combien de fois ce jour de
+    semaine est déjà apparu dans le mois"""
+    return ((d.day - 1) // 7) + 1
+
+
+def generate_smart_weekday_recurrence(start_date, end_date):
+    """
+    Génére une récurrence mensuelle intelligente (ex: 2e mardi de chaque mois)
+    entre `start_date` et `end_date`, en conservant uniquement l'heure et les minutes.
+    """
+    weekday = start_date.weekday()
+    is_last = is_last_weekday_of_month(start_date)
+    nth = get_weekday_occurrence(start_date)
+
+    recurrence = []
+
+    current_year = start_date.year
+    current_month = start_date.month
+
+    # Extraire heure et minute depuis start_date
+    hour = start_date.hour
+    minute = start_date.minute
+
+    while True:
+        if datetime(current_year, current_month, 1) > end_date:
+            break
+
+        if is_last:
+            base_date = get_last_weekday_of_month(current_year,
+                                                  current_month, weekday)
+        else:
+            base_date = get_nth_weekday_of_month(current_year,
+                                                 current_month, weekday, nth)
+
+        if base_date:
+            date_part = base_date.isoformat()  # Ex: '2025-08-20'
+            time_part = f"{hour:02}:{minute:02}"
+            recur_date = datetime.fromisoformat(f"{date_part}T{time_part}")
+
+            if start_date <= recur_date <= end_date:
+                recurrence.append(recur_date)
+
+        current_month += 1
+        if current_month > 12:
+            current_month = 1
+            current_year += 1
+
+    return recurrence
+
+
+def generate_multi_days_recurrence(start_date, end_date, weekday_names):
+    """
+    Génère toutes les dates correspondant à un ou plusieurs jours de semaine fixes (ex lundi, mardi..)
+    """
+    mapping = {
+        'lundi': 0, 'mardi': 1, 'mercredi': 2, 'jeudi': 3,
+        'vendredi': 4, 'samedi': 5, 'dimanche': 6
+    }
+    weekdays = {mapping[w.lower()] for w in weekday_names if w and w.lower() in mapping}
+    dates = []
+    cur = start_date
+    # on parcourt jour par jour
+    while cur <= end_date:
+        if cur.weekday() in weekdays:
+            dates.append(cur)
+        cur = cur + timedelta(days=1)
+    return dates
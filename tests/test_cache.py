@@ -0,0 +1,83 @@
+"""
+Cache en mémoire des données de référence (CacheTTL, en_cache) :
+expiration, éviction LRU et invalidation par groupe, sur une horloge
+simulée.
+"""
+import pytest
+
+from app.services import cache as module_cache
+from app.services.cache import CacheTTL, en_cache
+
+
+class Horloge:
+    def __init__(self):
+        self.t = 1000.0
+
+    def __call__(self):
+        return self.t
+
+
+@pytest.fixture
+def horloge(monkeypatch):
+    h = Horloge()
+    monkeypatch.setattr(module_cache.time, 'monotonic', h)
+    return h
+
+
+def test_expiration(horloge):
+    cache = CacheTTL()
+    cache.ecrire('a', 1, ttl=10)
+    horloge.t += 10
+    assert cache.lire('a') == (True, 1)
+    horloge.t += 0.001
+    assert cache.lire('a') == (False, None)
+    # l'entree perimee est retiree au passage
+    assert cache.stats()['entrees'] == 0
+
+
+def test_eviction_lru(horloge):
+    cache = CacheTTL(taille_max=3)
+    for cle in 'abc':
+        cache.ecrire(cle, cle.upper(), ttl=60)
+    cache.lire('a')              # 'b' devient la moins recemment utilisee
+    cache.ecrire('d', 'D', ttl=60)
+    assert cache.lire('b') == (False, None)
+    assert [cache.lire(c)[0] for c in 'acd'] == [True, True, True]
+    cache.ecrire('c', 'C2', ttl=60)  # reecriture : pas d'eviction
+    stats = cache.stats()
+    assert (stats['entrees'], stats['evictions']) == (3, 1)
+    assert (stats['hits'], stats['misses'], stats['taux_hit']) == (4, 1, 0.8)
+
+
+def test_invalider_par_groupe(horloge):
+    cache = CacheTTL()
+    cache.ecrire('a', 1, ttl=60, groupe='g1')
+    cache.ecrire('b', 2, ttl=60, groupe='g2')
+    cache.ecrire('c', 3, ttl=60)
+    cache.invalider('g1')
+    assert [cache.lire(c)[0] for c in 'abc'] == [False, True, True]
+    cache.invalider()
+    assert cache.stats()['entrees'] == 0
+
+
+def test_en_cache(horloge, monkeypatch):
+    monkeypatch.setattr(module_cache, 'cache_reference', CacheTTL())
+    appels = []
+
+    @en_cache(lambda pk: f"test:{pk}", ttl=60)
+    def lecture(driver, pk):
+        appels.append(pk)
+        return [pk]
+
+    resultat = lecture('driver', 'x')
+    resultat.append('modifie')   # l'appelant recoit une copie
+    assert lecture('autre driver', 'x') == ['x']
+    lecture(None, 'y')
+    assert appels == ['x', 'y']
+    module_cache.invalider_cache('test:x')
+    lecture(None, 'x')
+    lecture(None, 'y')
+    assert appels == ['x', 'y', 'x']
+    horloge.t += 61
+    lecture(None, 'y')
+    assert appels == ['x', 'y', 'x', 'y']
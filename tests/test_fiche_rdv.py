@@ -0,0 +1,51 @@
+"""
+Fiche de rendez-vous : contenu normalisé, empreinte et cache des PDF
+borné en octets (CachePDF).
+"""
+from app.services.fiche_rdv import CachePDF, contenu_fiche, empreinte_fiche, SANS_TRANSPORT
+
+
+def test_eviction_bornee_en_octets():
+    cache = CachePDF(octets_max=10)
+    cache.ecrire('a', b'aaaa')
+    cache.ecrire('b', b'bbbb')
+    assert cache.lire('a') == b'aaaa'   # 'b' devient la moins recemment lue
+    cache.ecrire('c', b'cccc')
+    assert cache.lire('b') is None
+    assert cache.lire('a') == b'aaaa' and cache.lire('c') == b'cccc'
+    stats = cache.stats()
+    assert (stats['entrees'], stats['octets'], stats['evictions']) == (2, 8, 1)
+
+    # un PDF plus gros que tout le cache n'est pas gardé et ne vide rien
+    cache.ecrire('gros', b'x' * 11)
+    assert cache.lire('gros') is None
+    assert cache.stats()['octets'] == 8
+
+    # une réécriture remplace l'entrée sans compter deux fois ses octets
+    cache.ecrire('a', b'aa')
+    assert cache.stats()['octets'] == 6
+    cache.ecrire('d', b'dddd')
+    assert cache.stats()['evictions'] == 1
+
+
+def test_plusieurs_evictions():
+    cache = CachePDF(octets_max=10)
+    for cle in 'abcde':
+        cache.ecrire(cle, b'xx')
+    cache.ecrire('f', b'y' * 9)
+    assert [cache.lire(c) for c in 'abcde'] == [None] * 5
+    stats = cache.stats()
+    assert (stats['entrees'], stats['octets'], stats['evictions']) == (1, 9, 5)
+
+
+def test_empreinte_stable():
+    data = {'nom_resident': ' DUPONT Jean ', 'Date_Fr': '01/03/2026', 'Heure': '10:00',
+            'Rendez-vous': 'Cardiologue', 'Medecin': None, 'Transport': '', 'Lieu': 'CHU',
+            'Note': '', 'id': 'ignoré'}
+    contenu = contenu_fiche(data)
+    assert contenu['nom_resident'] == 'DUPONT Jean'
+    assert contenu['Medecin'] == '' and contenu['Transport'] == SANS_TRANSPORT
+    assert 'id' not in contenu
+    # les champs non imprimés ne changent pas l'empreinte, les autres oui
+    assert empreinte_fiche(contenu) == empreinte_fiche(contenu_fiche(dict(data, id='autre')))
+    assert empreinte_fiche(contenu) != empreinte_fiche(contenu_fiche(dict(data, Heure='11:00')))
@@ -0,0 +1,33 @@
+"""
+Curseurs de pagination du profil résident : aller-retour encodage /
+décodage, l'id de la ligne pouvant être un identifiant d'occurrence.
+"""
+import datetime
+
+import pytest
+
+from app.services.profil_resident import decoder_curseur, encoder_curseur
+from app.services.recurrences import id_occurrence
+
+
+ELEMENT_ID = '4:6d7c1a6e-0b1f-4c2e-9a4b-3f2d1e0c9b8a:42'
+JOUR = datetime.date(2026, 4, 23)
+
+
+@pytest.mark.parametrize('id_rdv', [
+    '5:6d7c1a6e-0b1f-4c2e-9a4b-3f2d1e0c9b8a:7',   # elementId de relation
+    id_occurrence(ELEMENT_ID, JOUR),              # contient des '_'
+    id_occurrence(ELEMENT_ID, JOUR, 1),
+])
+def test_curseur_aller_retour(id_rdv):
+    cle = (datetime.datetime(2026, 4, 23, 14, 30), id_rdv)
+    curseur = encoder_curseur(cle)
+    assert decoder_curseur(curseur) == cle
+    assert decoder_curseur(encoder_curseur(decoder_curseur(curseur))) == cle
+
+
+@pytest.mark.parametrize('curseur', ['', '2026-04-23T14:30:00', '2026-04-23T14:30:00_',
+                                     'demain_4:abc:1'])
+def test_curseur_invalide(curseur):
+    with pytest.raises(ValueError):
+        decoder_curseur(curseur)
@@ -0,0 +1,34 @@
+"""
+Identifiants d'occurrences virtuelles (rec_<elementId>_<date>[_<indice>]) :
+aller-retour encodage / décodage.
+"""
+import datetime
+
+import pytest
+
+from app.services.recurrences import decoder_id_occurrence, est_id_occurrence, id_occurrence
+
+
+ELEMENT_ID = '4:6d7c1a6e-0b1f-4c2e-9a4b-3f2d1e0c9b8a:42'
+JOUR = datetime.date(2026, 4, 23)
+
+
+@pytest.mark.parametrize('indice', [None, 0, 3])
+def test_id_occurrence_aller_retour(indice):
+    identifiant = id_occurrence(ELEMENT_ID, JOUR, indice)
+    assert est_id_occurrence(identifiant)
+    assert decoder_id_occurrence(identifiant) == (ELEMENT_ID, '2026-04-23', indice)
+
+
+@pytest.mark.parametrize('identifiant', [
+    '4:abc:1', 'rec_4:abc:1', 'occ_4:abc:1_2026-04-23', 'rec_4:abc:1_2026-04-23_x',
+    'rec_4:abc:1_2026-04-23_1_2',
+])
+def test_id_occurrence_invalide(identifiant):
+    with pytest.raises(ValueError):
+        decoder_id_occurrence(identifiant)
+
+
+def test_est_id_occurrence():
+    assert not est_id_occurrence(ELEMENT_ID)
+    assert not est_id_occurrence(None)
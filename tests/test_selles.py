@@ -0,0 +1,100 @@
+"""
+Tableaux de selles calculés en Python : lignes du popup de saisie
+(lignes_tableau_selles) et matrice de la relève (get_matrice_selles, sur
+un driver simulé).
+"""
+import datetime
+
+from app.services.neo4j_services import (get_matrice_selles, lignes_tableau_selles,
+                                         MOMENTS_SELLES, OPTIONS_SELLES)
+
+
+class _Date:
+    def __init__(self, valeur):
+        self.valeur = valeur
+
+    def to_native(self):
+        return self.valeur
+
+
+class DriverSimule:
+    def __init__(self, records):
+        self.records = records
+
+    def session(self, database=None):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, requete, **params):
+        return self
+
+    def data(self):
+        return self.records
+
+
+DEBUT = datetime.date(2026, 3, 1)
+
+
+def _selle(pk, jour, moment, caracteristique, nom='NOM', chambre='1'):
+    return {'pk': pk, 'nom': nom, 'chambre': chambre,
+            'date': _Date(DEBUT + datetime.timedelta(days=jour)) if jour is not None else None,
+            'moment': moment, 'caracteristique': caracteristique}
+
+
+def test_lignes_tableau_selles():
+    residents = (['DE LA TOUR', 'B'], ['Anne Marie', 'C'], ['pk 1', 'pk2'])
+    selles_du_jour = [
+        {'pk': 'pk 1', 'moment': 'matin', 'caracteristique': 'Dur', 'commentaire': 'note'},
+        # seul le premier enregistrement d'un (pk, moment) compte
+        {'pk': 'pk 1', 'moment': 'matin', 'caracteristique': 'Liquide', 'commentaire': 'autre'},
+        {'pk': 'pk 1', 'moment': None, 'caracteristique': None, 'commentaire': None},
+    ]
+    premier, second = lignes_tableau_selles(residents, selles_du_jour)
+    assert premier == {'nom_complet': 'DE-LA-TOUR Anne-Marie', 'safe_nom': 'pk_1', 'pk': 'pk 1',
+                       'nuit': '--', 'matin': 'Dur', 'apres_midi': '--', 'commentaire': 'note'}
+    assert (second['nuit'], second['matin'], second['apres_midi'], second['commentaire']) == \
+        ('--', '--', '--', '')
+
+
+def test_matrice_pivot():
+    fin = DEBUT + datetime.timedelta(days=2)
+    matrice = get_matrice_selles(DriverSimule([
+        _selle('a', 0, 'nuit', 'Normale'),
+        _selle('a', 2, 'apres_midi', 'Dure'),      # ancien libelle, meme code que 'Dur'
+        _selle('b', None, None, None, nom='SANS'),  # resident sans selle sur la fenetre
+        _selle('a', 1, 'soir', 'Liquide'),         # moment hors matrice : ignore
+    ]), DEBUT, fin)
+    codes = matrice['codes']
+    assert codes[0] is None and codes[1:] == OPTIONS_SELLES[1:]
+    assert matrice['jours'] == ['2026-03-01', '2026-03-02', '2026-03-03']
+    assert matrice['moments'] == MOMENTS_SELLES
+    assert [r['pk'] for r in matrice['residents']] == ['a', 'b']
+    a, b = matrice['valeurs']
+    assert a[0] == [codes.index('Normale'), 0, 0]
+    assert a[1] == [0, 0, 0]
+    assert a[2] == [0, 0, codes.index('Dur')]
+    assert b == [[0, 0, 0]] * 3
+
+
+def test_matrice_dominante_par_priorite():
+    # un jour par combinaison, au plus une caracteristique par moment
+    journees = [
+        (['Absence'], 'Absence'),
+        (['Absence', 'Normale'], 'Normale'),
+        (['Normale', 'Mou', 'Absence'], 'Mou'),
+        (['Mou', 'Dur', 'Normale'], 'Dur'),
+        (['Dur', 'Liquide', 'Mou'], 'Liquide'),
+        ([], None),
+    ]
+    records = [_selle('a', jour, MOMENTS_SELLES[rang], car)
+               for jour, (caracteristiques, _) in enumerate(journees)
+               for rang, car in enumerate(caracteristiques)]
+    fin = DEBUT + datetime.timedelta(days=len(journees) - 1)
+    matrice = get_matrice_selles(DriverSimule(records), DEBUT, fin)
+    codes = matrice['codes']
+    assert [codes[c] for c in matrice['dominante'][0]] == [attendu for _, attendu in journees]
@@ -0,0 +1,89 @@
+"""
+Départ d'un résident et suppressions par lots (app/services/suppressions.py),
+sur un driver simulé qui rejoue des nombres d'éléments supprimés par lot.
+"""
+import pytest
+
+from app.services import suppressions
+
+
+class _Resultat:
+    def __init__(self, nb):
+        self.nb = nb
+
+    def single(self):
+        return {'nb': self.nb}
+
+
+class DriverSimule:
+    """
+    Chaque requête reçoit le prochain nombre de sa file (`lots`, indexé par
+    un extrait du texte de la requête) ; 0 quand la file est vide.
+    """
+
+    def __init__(self, lots):
+        self.lots = {cle: list(nbs) for cle, nbs in lots.items()}
+        self.requetes = []
+
+    def session(self, database=None):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute_write(self, fonction):
+        return fonction(self)
+
+    def run(self, requete, **params):
+        self.requetes.append((requete, params))
+        for cle, nbs in self.lots.items():
+            if cle in requete:
+                return _Resultat(nbs.pop(0) if nbs else 0)
+        return _Resultat(0)
+
+
+@pytest.fixture(autouse=True)
+def sans_cache(monkeypatch):
+    invalidations = []
+    monkeypatch.setattr(suppressions, 'invalider_rdv', lambda driver, NEO4J_DB: invalidations.append('rdv'))
+    monkeypatch.setattr(suppressions, 'invalider_cache', lambda *groupes: invalidations.extend(groupes))
+    return invalidations
+
+
+@pytest.mark.parametrize('lots, total, nb_lots', [
+    ([5, 5, 2], 12, 3),
+    ([5, 5, 0], 10, 3),   # multiple exact de la taille du lot : un lot vide de plus
+    ([0], 0, 1),
+])
+def test_par_lots(lots, total, nb_lots):
+    driver = DriverSimule({'DELETE': lots})
+    progression = []
+    assert suppressions._par_lots(driver, "MATCH (x) DELETE x RETURN count(x) AS nb", {}, 5, 'test',
+                                  lambda nom, n: progression.append(n), 'neo4j') == total
+    assert len(driver.requetes) == nb_lots
+    assert all(params['taille_lot'] == 5 for _, params in driver.requetes)
+    assert progression[-1] == total
+
+
+def test_marquer_depart(sans_cache):
+    driver = DriverSimule({
+        'SET n.date_depart': [1],
+        '-[r:Rdv]->()': [3, 1],
+        '-[s:Rappel]->()': [2],
+    })
+    assert suppressions.marquer_depart(driver, 'pk1', '2026-03-01', taille_lot=3, progression=None) == \
+        {'rdv': 4, 'rappels': 2}
+    requete, params = driver.requetes[0]
+    assert 'date_depart' in requete and params == {'pk': 'pk1', 'date': '2026-03-01'}
+    # le resident n'est pas supprime : seuls ses rdv a partir du depart le sont
+    assert not any('DETACH DELETE n' in requete for requete, _ in driver.requetes)
+    assert all(params.get('date') == '2026-03-01' for _, params in driver.requetes)
+    assert 'rdv' in sans_cache and suppressions.GROUPE_RESIDENTS in sans_cache
+
+
+def test_marquer_depart_resident_inconnu():
+    with pytest.raises(ValueError):
+        suppressions.marquer_depart(DriverSimule({'SET n.date_depart': [0]}), 'inconnu', progression=None)
@@ -0,0 +1,46 @@
+"""
+Résultats de _synchroniser_selles_tx (file de saisies hors connexion), sur
+une transaction simulée : seule la lecture des résidents connus répond.
+"""
+import datetime
+
+import pytest
+
+from app.services import neo4j_services
+
+
+class TransactionSimulee:
+    def __init__(self, pks_connus):
+        self.pks_connus = pks_connus
+
+    def run(self, requete, **params):
+        if 'RETURN n.pk AS pk' in requete:
+            return [{'pk': pk} for pk in self.pks_connus]
+        return []
+
+
+@pytest.fixture
+def sans_ecriture(monkeypatch):
+    ecrits = []
+    monkeypatch.setattr(neo4j_services, '_enregistrer_selles_tx', lambda tx, data_f: ecrits.extend(data_f))
+    monkeypatch.setattr(neo4j_services, '_maj_last_check_tx', lambda tx, verifications: None)
+    return ecrits
+
+
+def _entree(cle, pk, **moments):
+    return {'cle': cle, 'pk': pk, 'date': datetime.date.today().isoformat(), **moments}
+
+
+def test_doublon_dans_le_lot_reprend_le_resultat_de_la_premiere(sans_ecriture):
+    resultats, pks = neo4j_services._synchroniser_selles_tx(TransactionSimulee(['a']), [
+        _entree('k1', 'inconnu', nuit='Dur'),
+        _entree('k1', 'inconnu', nuit='Dur'),
+        _entree('k2', 'a', matin='Normale'),
+        _entree('k2', 'a', matin='Normale'),
+    ])
+    assert [r['statut'] for r in resultats] == ['erreur', 'doublon', 'applique', 'doublon']
+    assert resultats[1]['resultat_initial'] == 'erreur'
+    assert resultats[1]['message'] == resultats[0]['message']
+    assert resultats[3]['resultat_initial'] == 'applique'
+    # la seconde saisie de k2 n'est pas rejouee
+    assert len(sans_ecriture) == 1 and pks == {'a'}
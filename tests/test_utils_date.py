@@ -0,0 +1,160 @@
+"""
+Tests d'équivalence du moteur de récurrence de utils_date avec les
+implémentations d'origine (tests/reference_utils_date.py), sur des
+entrées tirées au hasard (graine fixe, donc reproductibles).
+"""
+import random
+from datetime import date, datetime, time, timedelta
+
+import numpy as np
+import pytest
+
+from app.services import utils_date
+from tests import reference_utils_date as reference
+
+
+GRAINES = range(10)
+TIRAGES = 200
+JOURS = list(utils_date.JOURS_SEMAINE)
+
+
+def _date_au_hasard(rng, debut=date(1990, 1, 1), etendue=365 * 60):
+    return debut + timedelta(days=rng.randrange(etendue))
+
+
+def _datetime_au_hasard(rng):
+    return datetime.combine(_date_au_hasard(rng),
+                            time(rng.randrange(24), rng.randrange(60)))
+
+
+def _jours_au_hasard(rng):
+    noms = rng.sample(JOURS, rng.randrange(len(JOURS) + 1))
+    # majuscules et valeurs vides sont acceptees (et ignorees) par l'original
+    return [nom.capitalize() if rng.random() < 0.2 else nom for nom in noms] \
+        + ([''] if rng.random() < 0.1 else [])
+
+
+@pytest.mark.parametrize('graine', GRAINES)
+def test_nth_et_dernier_jour_du_mois(graine):
+    rng = random.Random(graine)
+    for _ in range(TIRAGES):
+        year, month = rng.randrange(1900, 2200), rng.randrange(1, 13)
+        weekday, n = rng.randrange(7), rng.randrange(1, 6)
+        assert utils_date.get_nth_weekday_of_month(year, month, weekday, n) == \
+            reference.get_nth_weekday_of_month(year, month, weekday, n)
+        assert utils_date.get_last_weekday_of_month(year, month, weekday) == \
+            reference.get_last_weekday_of_month(year, month, weekday)
+
+
+@pytest.mark.parametrize('graine', GRAINES)
+def test_smart_weekday_recurrence(graine):
+    rng = random.Random(graine)
+    for _ in range(TIRAGES):
+        debut = _datetime_au_hasard(rng)
+        fin = debut + timedelta(days=rng.randrange(-40, 365 * 5), minutes=rng.randrange(-60, 60))
+        assert utils_date.generate_smart_weekday_recurrence(debut, fin) == \
+            reference.generate_smart_weekday_recurrence(debut, fin)
+
+
+@pytest.mark.parametrize('graine', GRAINES)
+def test_smart_weekday_recurrence_fenetre(graine):
+    rng = random.Random(graine)
+    for _ in range(TIRAGES):
+        debut = _datetime_au_hasard(rng)
+        fin = debut + timedelta(days=rng.randrange(365 * 5))
+        fenetre = debut + timedelta(days=rng.randrange(-60, 365 * 5))
+        attendu = [d for d in reference.generate_smart_weekday_recurrence(debut, fin)
+                   if (d.year, d.month) >= (fenetre.year, fenetre.month)]
+        assert list(utils_date.iter_smart_weekday_recurrence(debut, fin, window_start=fenetre)) \
+            == attendu
+
+
+@pytest.mark.parametrize('graine', GRAINES)
+def test_multi_days_recurrence(graine):
+    rng = random.Random(graine)
+    for _ in range(TIRAGES):
+        debut = _date_au_hasard(rng)
+        fin = debut + timedelta(days=rng.randrange(-10, 365 * 3))
+        jours = _jours_au_hasard(rng)
+        attendu = reference.generate_multi_days_recurrence(debut, fin, jours)
+        assert utils_date.generate_multi_days_recurrence(debut, fin, jours) == attendu
+        assert list(utils_date.iter_multi_days_recurrence(debut, fin, jours)) == attendu
+        tableau = utils_date.multi_days_recurrence_array(debut, fin, jours)
+        assert tableau.dtype == np.dtype('datetime64[D]')
+        assert tableau.tolist() == attendu
+
+
+@pytest.mark.parametrize('graine', GRAINES)
+def test_multi_days_recurrence_avec_heure(graine):
+    rng = random.Random(graine)
+    for _ in range(TIRAGES):
+        debut = _datetime_au_hasard(rng)
+        fin = debut + timedelta(days=rng.randrange(365), minutes=rng.randrange(-120, 120))
+        jours = _jours_au_hasard(rng)
+        assert utils_date.generate_multi_days_recurrence(debut, fin, jours) == \
+            reference.generate_multi_days_recurrence(debut, fin, jours)
+
+
+def _occurrences_attendues(regle, debut, fin):
+    """Développement naïf d'une règle, jour par jour, avec les fonctions d'origine."""
+    borne_fin = min(fin, regle['fin']) if regle.get('fin') else fin
+    frequence = regle['frequence']
+    if frequence == 'mois':
+        candidates = {d.date() for d in reference.generate_smart_weekday_recurrence(
+            datetime.combine(regle['debut'], time()), datetime.combine(borne_fin, time()))}
+    elif frequence == 'jourSpec':
+        candidates = set(reference.generate_multi_days_recurrence(
+            regle['debut'], borne_fin, regle['jours']))
+    else:
+        pas = 1 if frequence == 'jour' else 7
+        candidates = {regle['debut'] + timedelta(days=i * pas)
+                      for i in range((borne_fin - regle['debut']).days // pas + 1)}
+    return sorted(d for d in candidates
+                  if debut <= d <= borne_fin and d not in regle['exceptions'])
+
+
+@pytest.mark.parametrize('graine', GRAINES)
+def test_occurrences_recurrence(graine):
+    rng = random.Random(graine)
+    for _ in range(TIRAGES):
+        debut_regle = _date_au_hasard(rng, date(2015, 1, 1), 365 * 10)
+        regle = {
+            'frequence': rng.choice(['jour', 'semaine', 'mois', 'jourSpec']),
+            'debut': debut_regle,
+            'fin': debut_regle + timedelta(days=rng.randrange(365 * 4)) if rng.random() < 0.5 else None,
+            'jours': _jours_au_hasard(rng),
+            'exceptions': [debut_regle + timedelta(days=rng.randrange(365 * 2))
+                           for _ in range(rng.randrange(10))],
+        }
+        debut = debut_regle + timedelta(days=rng.randrange(-400, 365 * 3))
+        fin = debut + timedelta(days=rng.randrange(-5, 400))
+        assert list(utils_date.occurrences_recurrence(regle, debut, fin)) == \
+            _occurrences_attendues(regle, debut, fin)
+
+
+def test_regle_scindee_garde_le_rang_du_mois():
+    # 4e jeudi ; la copie demarre le 26/02/2026, qui est aussi le dernier jeudi
+    regle = {'frequence': 'mois', 'debut': date(2026, 1, 22), 'fin': None,
+             'jours': [], 'exceptions': []}
+    copie = {**regle, 'debut': date(2026, 2, 26), 'ancre': date(2026, 1, 22)}
+    assert list(utils_date.occurrences_recurrence(copie, date(2026, 2, 1), date(2026, 5, 31))) == \
+        [date(2026, 2, 26), date(2026, 3, 26), date(2026, 4, 23), date(2026, 5, 28)]
+
+
+@pytest.mark.parametrize('graine', GRAINES)
+def test_regle_scindee_meme_occurrences(graine):
+    # la copie d'une regle scindee (voir scinder_recurrences) continue la regle d'origine
+    rng = random.Random(graine)
+    for _ in range(TIRAGES):
+        debut_regle = _date_au_hasard(rng, date(2015, 1, 1), 365 * 10)
+        regle = {'frequence': rng.choice(['jour', 'semaine', 'mois', 'jourSpec']),
+                 'debut': debut_regle, 'fin': None,
+                 'jours': _jours_au_hasard(rng), 'exceptions': []}
+        coupure = debut_regle + timedelta(days=rng.randrange(1, 365 * 2))
+        fin = coupure + timedelta(days=rng.randrange(365 * 2))
+        suivante = next(utils_date.occurrences_recurrence(regle, coupure, fin), None)
+        if suivante is None:
+            continue
+        copie = {**regle, 'debut': suivante, 'ancre': regle['debut']}
+        assert list(utils_date.occurrences_recurrence(copie, coupure, fin)) == \
+            list(utils_date.occurrences_recurrence(regle, coupure, fin))